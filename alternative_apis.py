@@ -1,12 +1,93 @@
 import asyncio
 import aiohttp
+import contextvars
 import json
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import sqlite3
 import os
-from typing import Dict, List, Optional, Callable
+from typing import Dict, List, Optional, Callable, Tuple
 import time
+from collections import deque
+from rate_limiter import ProviderRateLimiter
+from write_behind import WriteBehindQueue
+from price_consensus import PriceConsensusEngine
+
+# المصادر التي رفض محدد المعدل طلباتها داخل استدعاء fetch_from_source الحالي
+_rate_limited_sources: contextvars.ContextVar = contextvars.ContextVar('rate_limited_sources', default=None)
+
+class ProviderStats:
+    """
+    إحصائيات متحركة لزمن الاستجابة ونسبة الأخطاء لمصدر واحد
+    """
+    
+    def __init__(self, window: int = 50, alpha: float = 0.2):
+        self.alpha = alpha
+        self.outcomes = deque(maxlen=window)
+        self.avg_latency = None
+        self.rate_limited = 0
+    
+    def record_success(self, response_time: float):
+        """تسجيل طلب ناجح"""
+        self.outcomes.append(True)
+        if self.avg_latency is None:
+            self.avg_latency = response_time
+        else:
+            self.avg_latency = self.alpha * response_time + (1 - self.alpha) * self.avg_latency
+    
+    def record_error(self):
+        """تسجيل طلب فاشل"""
+        self.outcomes.append(False)
+    
+    def record_timeout(self, elapsed: float):
+        """تسجيل طلب أُلغي بعد انتهاء الميزانية الزمنية (خطأ بزمن استجابة يساوي الميزانية)"""
+        self.outcomes.append(False)
+        if self.avg_latency is None:
+            self.avg_latency = elapsed
+        else:
+            self.avg_latency = self.alpha * elapsed + (1 - self.alpha) * self.avg_latency
+    
+    def record_rate_limited(self):
+        """تسجيل طلب تم تخطيه بسبب حد المعدل (لا يحتسب كخطأ من المصدر)"""
+        self.rate_limited += 1
+    
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'avg_latency': self.avg_latency,
+            'error_rate': self.error_rate,
+            'samples': len(self.outcomes),
+            'rate_limited': self.rate_limited
+        }
+
+class LatestPriceCache:
+    """
+    ذاكرة مؤقتة لآخر سعر لكل (أصل، مصدر) مع طابعه الزمني
+    """
+    
+    def __init__(self):
+        self._by_asset: Dict[str, Dict[str, Dict]] = {}
+    
+    def update(self, record: Dict, ts: int):
+        """تحديث آخر سعر للمصدر إذا كان أحدث من المخزن"""
+        sources = self._by_asset.setdefault(record.get('asset_name'), {})
+        current = sources.get(record.get('source'))
+        
+        if current is None or current['ts'] <= ts:
+            sources[record.get('source')] = dict(record, ts=ts)
+    
+    def get_latest(self, asset_name: str, min_ts: int = 0) -> List[Dict]:
+        """آخر الأسعار للأصل من جميع المصادر، الأحدث أولاً"""
+        records = [
+            record for record in self._by_asset.get(asset_name, {}).values()
+            if record['ts'] > min_ts
+        ]
+        return sorted(records, key=lambda record: record['ts'], reverse=True)
 
 class AlternativeAPIManager:
     """
@@ -16,9 +97,24 @@ class AlternativeAPIManager:
     def __init__(self):
         self.apis = {}
         self.db_path = 'alternative_apis_data.db'
+        # مدة الاحتفاظ بالأسعار في الجدول الرئيسي قبل نقلها إلى الأرشيف
+        self.retention_days = 7
+        self.retention_interval = 3600  # تشغيل مهمة الأرشفة كل ساعة على الأكثر
+        self.last_retention_run = 0
+        self._retention_task = None
         self.setup_database()
         self.setup_logging()
+        self.writer = WriteBehindQueue(self.db_path, logger=self.logger)
+        self.price_cache = LatestPriceCache()
+        # السعر المركب عبر المصادر، يُحدَّث مع وصول كل سعر
+        self.consensus = PriceConsensusEngine()
         self.setup_apis()
+        self.setup_rate_limiters()
+        self.provider_stats = {source: ProviderStats() for source in self.apis}
+        # زمن الاستجابة المفترض لمصدر بدون قياسات بعد (بالثواني)
+        self.default_latency = 1.0
+        # وزن نسبة الأخطاء عند ترتيب المصادر
+        self.error_penalty = 4.0
     
     def setup_logging(self):
         """إعداد نظام السجلات"""
@@ -53,9 +149,52 @@ class AlternativeAPIManager:
                 low_24h REAL,
                 market_cap REAL,
                 response_time REAL,
-                is_valid BOOLEAN DEFAULT 1
+                is_valid BOOLEAN DEFAULT 1,
+                ts INTEGER
+            )
+        ''')
+        
+        # ترقية الجداول القديمة: عمود الطابع الزمني الرقمي (ثوانٍ منذ epoch)
+        cursor.execute("PRAGMA table_info(api_prices)")
+        columns = [row[1] for row in cursor.fetchall()]
+        if 'ts' not in columns:
+            cursor.execute('ALTER TABLE api_prices ADD COLUMN ts INTEGER')
+            cursor.execute('''
+                UPDATE api_prices
+                SET ts = CAST(strftime('%s', timestamp) AS INTEGER)
+                WHERE ts IS NULL
+            ''')
+        
+        # فهرس لعمليات البحث حسب الأصل والوقت
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_api_prices_asset_ts
+            ON api_prices (asset_name, ts)
+        ''')
+        
+        # أرشيف الأسعار القديمة (يتم نقلها بواسطة archive_old_prices)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS api_prices_archive (
+                id INTEGER PRIMARY KEY,
+                timestamp DATETIME,
+                source TEXT NOT NULL,
+                asset_name TEXT NOT NULL,
+                price REAL NOT NULL,
+                bid_price REAL,
+                ask_price REAL,
+                volume REAL,
+                change_24h REAL,
+                high_24h REAL,
+                low_24h REAL,
+                market_cap REAL,
+                response_time REAL,
+                is_valid BOOLEAN DEFAULT 1,
+                ts INTEGER
             )
         ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_api_prices_archive_asset_ts
+            ON api_prices_archive (asset_name, ts)
+        ''')
         
         # جدول إحصائيات الأداء
         cursor.execute('''
@@ -70,6 +209,17 @@ class AlternativeAPIManager:
             )
         ''')
         
+        # جدول حالة حدود المعدل (للحفاظ على الحصص بعد إعادة التشغيل)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS api_rate_limits (
+                source TEXT NOT NULL,
+                window TEXT NOT NULL,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (source, window)
+            )
+        ''')
+        
         conn.commit()
         conn.close()
     
@@ -80,9 +230,10 @@ class AlternativeAPIManager:
         self.apis['alphavantage'] = {
             'base_url': 'https://www.alphavantage.co/query',
             'api_key': 'demo',  # يجب استبدالها بمفتاح حقيقي
-            'rate_limit': 5,  # 5 طلبات في الدقيقة
-            'last_request': 0,
+            'rate_limits': {'minute': 5, 'day': 500},  # 5 طلبات في الدقيقة و500 في اليوم
+            'burst': 5,
             'supported_assets': ['EURUSD', 'GBPUSD', 'USDJPY', 'AUDUSD', 'USDCAD'],
+            'max_batch_size': 1,  # لا يدعم أكثر من زوج في الطلب الواحد
             'priority': 1
         }
         
@@ -90,9 +241,10 @@ class AlternativeAPIManager:
         self.apis['fixer'] = {
             'base_url': 'http://data.fixer.io/api/latest',
             'api_key': 'demo',  # يجب استبدالها بمفتاح حقيقي
-            'rate_limit': 100,  # 100 طلب في الشهر للحساب المجاني
-            'last_request': 0,
+            'rate_limits': {'month': 100},  # 100 طلب في الشهر للحساب المجاني
+            'burst': 3,  # عدم استنزاف الحصة الشهرية دفعة واحدة
             'supported_assets': ['EUR', 'GBP', 'USD', 'JPY', 'AUD', 'CAD'],
+            'max_batch_size': None,  # طلب واحد يغطي جميع العملات
             'priority': 2
         }
         
@@ -100,19 +252,22 @@ class AlternativeAPIManager:
         self.apis['coingecko'] = {
             'base_url': 'https://api.coingecko.com/api/v3',
             'api_key': None,  # مجاني بدون مفتاح
-            'rate_limit': 50,  # 50 طلب في الدقيقة
-            'last_request': 0,
+            'rate_limits': {'minute': 50},  # 50 طلب في الدقيقة
+            'burst': 10,
             'supported_assets': ['bitcoin', 'ethereum', 'litecoin', 'ripple'],
+            'max_batch_size': 250,
             'priority': 3
         }
         
         # Yahoo Finance (غير رسمي)
         self.apis['yahoo'] = {
             'base_url': 'https://query1.finance.yahoo.com/v8/finance/chart',
+            'quote_url': 'https://query1.finance.yahoo.com/v7/finance/quote',
             'api_key': None,
-            'rate_limit': 2000,  # حد عالي
-            'last_request': 0,
+            'rate_limits': {'minute': 2000},  # حد عالي
+            'burst': 50,
             'supported_assets': ['EURUSD=X', 'GBPUSD=X', 'USDJPY=X', 'BTC-USD', 'ETH-USD'],
+            'max_batch_size': 50,
             'priority': 4
         }
         
@@ -120,32 +275,105 @@ class AlternativeAPIManager:
         self.apis['binance'] = {
             'base_url': 'https://api.binance.com/api/v3',
             'api_key': None,
-            'rate_limit': 1200,  # 1200 طلب في الدقيقة
-            'last_request': 0,
+            'rate_limits': {'second': 20, 'minute': 1200},  # 1200 طلب في الدقيقة
+            'burst': 20,
             'supported_assets': ['BTCUSDT', 'ETHUSDT', 'ADAUSDT', 'DOTUSDT'],
+            'max_batch_size': 100,
             'priority': 5
         }
     
-    async def check_rate_limit(self, source: str) -> bool:
-        """فحص حدود معدل الطلبات"""
-        api_config = self.apis.get(source)
-        if not api_config:
+    def setup_rate_limiters(self):
+        """إعداد دلو رموز لكل مصدر واستعادة الحصص المحفوظة"""
+        # الأولوية الأصغر تحصل على الرموز أولاً
+        self.default_asset_priority = 5
+        self.asset_priorities = {
+            'EURUSD': 0,
+            'GBPUSD': 0,
+            'USDJPY': 1
+        }
+        # أقصى انتظار مقبول قبل تخطي الطلب (بالثواني)
+        self.max_rate_limit_wait = 30
+        
+        self.rate_limiters = {
+            source: ProviderRateLimiter(source, config['rate_limits'], config.get('burst'))
+            for source, config in self.apis.items()
+        }
+        
+        self.load_rate_limit_state()
+    
+    def load_rate_limit_state(self):
+        """استعادة حالة حدود المعدل من قاعدة البيانات"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('SELECT source, window, tokens, updated_at FROM api_rate_limits')
+            rows = cursor.fetchall()
+            conn.close()
+            
+            states: Dict[str, Dict] = {}
+            for source, window, tokens, updated_at in rows:
+                states.setdefault(source, {})[window] = {'tokens': tokens, 'updated_at': updated_at}
+            
+            for source, state in states.items():
+                if source in self.rate_limiters:
+                    self.rate_limiters[source].load_state(state)
+        
+        except Exception as e:
+            self.logger.error(f"خطأ في استعادة حالة حدود المعدل: {e}")
+    
+    def save_rate_limit_state(self):
+        """حفظ حالة حدود المعدل في قاعدة البيانات"""
+        try:
+            rows = [
+                (source, window, state['tokens'], state['updated_at'])
+                for source, limiter in self.rate_limiters.items()
+                for window, state in limiter.get_state().items()
+            ]
+            
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT OR REPLACE INTO api_rate_limits (source, window, tokens, updated_at)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+            conn.commit()
+            conn.close()
+        
+        except Exception as e:
+            self.logger.error(f"خطأ في حفظ حالة حدود المعدل: {e}")
+    
+    def get_asset_priority(self, asset: str) -> int:
+        """أولوية الأصل في الحصول على رموز الطلبات"""
+        return self.asset_priorities.get(asset, self.default_asset_priority)
+    
+    async def check_rate_limit(self, source: str, priority: Optional[int] = None) -> bool:
+        """
+        فحص حدود معدل الطلبات
+        
+        ينتظر حتى يتوفر رمز لدى المصدر، ويعيد False إذا كان الانتظار
+        أطول من الحد المقبول (مثلاً عند نفاد الحصة الشهرية)
+        """
+        limiter = self.rate_limiters.get(source)
+        if not limiter:
             return False
         
-        current_time = time.time()
-        time_since_last = current_time - api_config['last_request']
-        min_interval = 60 / api_config['rate_limit']  # الحد الأدنى بين الطلبات
+        if priority is None:
+            priority = self.default_asset_priority
         
-        if time_since_last < min_interval:
-            await asyncio.sleep(min_interval - time_since_last)
+        allowed = await limiter.acquire(priority, self.max_rate_limit_wait)
+        if not allowed:
+            self.logger.warning(f"تم تخطي طلب {source}: تم بلوغ حد المعدل")
+            refused = _rate_limited_sources.get()
+            if refused is not None:
+                refused.add(source)
         
-        api_config['last_request'] = time.time()
-        return True
+        return allowed
     
-    async def fetch_alphavantage_data(self, symbol: str) -> Optional[Dict]:
+    async def fetch_alphavantage_data(self, symbol: str, priority: Optional[int] = None) -> Optional[Dict]:
         """جلب البيانات من Alpha Vantage"""
         try:
-            await self.check_rate_limit('alphavantage')
+            if not await self.check_rate_limit('alphavantage', priority):
+                return None
             
             params = {
                 'function': 'CURRENCY_EXCHANGE_RATE',
@@ -180,15 +408,32 @@ class AlternativeAPIManager:
         
         return None
     
-    async def fetch_fixer_data(self, base_currency: str = 'USD') -> Optional[Dict]:
-        """جلب البيانات من Fixer.io"""
+    async def fetch_fixer_data(self, base_currency: str = 'USD',
+                               pairs: Optional[List[str]] = None,
+                               priority: Optional[int] = None) -> Optional[List[Dict]]:
+        """
+        جلب البيانات من Fixer.io
+        
+        عند تمرير pairs يتم جلب جميع العملات المطلوبة في طلب واحد ثم
+        حساب السعر المتقاطع لكل زوج (مثل EURUSD) كسجل مستقل
+        """
         try:
-            await self.check_rate_limit('fixer')
+            if not await self.check_rate_limit('fixer', priority):
+                return None
+            
+            if pairs:
+                currencies = sorted({
+                    currency for pair in pairs for currency in (pair[:3], pair[3:])
+                    if currency != base_currency
+                })
+                symbols = ','.join(currencies)
+            else:
+                symbols = 'EUR,GBP,JPY,AUD,CAD'
             
             params = {
                 'access_key': self.apis['fixer']['api_key'],
                 'base': base_currency,
-                'symbols': 'EUR,GBP,JPY,AUD,CAD'
+                'symbols': symbols
             }
             
             async with aiohttp.ClientSession() as session:
@@ -203,6 +448,9 @@ class AlternativeAPIManager:
                             rates = data['rates']
                             results = []
                             
+                            if pairs:
+                                return self._split_fixer_pairs(rates, base_currency, pairs, response_time)
+                            
                             for currency, rate in rates.items():
                                 results.append({
                                     'source': 'fixer',
@@ -220,10 +468,33 @@ class AlternativeAPIManager:
         
         return None
     
-    async def fetch_coingecko_data(self, coin_ids: List[str]) -> Optional[List[Dict]]:
+    def _split_fixer_pairs(self, rates: Dict, base_currency: str,
+                           pairs: List[str], response_time: float) -> List[Dict]:
+        """تحويل أسعار Fixer (مقابل عملة الأساس) إلى سجل لكل زوج مطلوب"""
+        rates = dict(rates)
+        rates[base_currency] = 1.0
+        results = []
+        
+        for pair in pairs:
+            base, quote = pair[:3], pair[3:]
+            if base not in rates or quote not in rates or not rates[base]:
+                continue
+            
+            results.append({
+                'source': 'fixer',
+                'asset_name': pair,
+                'price': float(rates[quote]) / float(rates[base]),
+                'response_time': response_time,
+                'timestamp': datetime.now()
+            })
+        
+        return results
+    
+    async def fetch_coingecko_data(self, coin_ids: List[str], priority: Optional[int] = None) -> Optional[List[Dict]]:
         """جلب البيانات من CoinGecko"""
         try:
-            await self.check_rate_limit('coingecko')
+            if not await self.check_rate_limit('coingecko', priority):
+                return None
             
             ids_str = ','.join(coin_ids)
             url = f"{self.apis['coingecko']['base_url']}/simple/price"
@@ -264,10 +535,11 @@ class AlternativeAPIManager:
         
         return None
     
-    async def fetch_yahoo_data(self, symbol: str) -> Optional[Dict]:
+    async def fetch_yahoo_data(self, symbol: str, priority: Optional[int] = None) -> Optional[Dict]:
         """جلب البيانات من Yahoo Finance"""
         try:
-            await self.check_rate_limit('yahoo')
+            if not await self.check_rate_limit('yahoo', priority):
+                return None
             
             url = f"{self.apis['yahoo']['base_url']}/{symbol}"
             params = {
@@ -304,10 +576,71 @@ class AlternativeAPIManager:
         
         return None
     
-    async def fetch_binance_data(self, symbol: str) -> Optional[Dict]:
+    async def fetch_yahoo_batch(self, symbols: List[str], priority: Optional[int] = None) -> Optional[List[Dict]]:
+        """جلب أسعار عدة رموز من Yahoo Finance في طلب واحد"""
+        try:
+            if not await self.check_rate_limit('yahoo', priority):
+                return None
+            
+            params = {'symbols': ','.join(symbols)}
+            
+            async with aiohttp.ClientSession() as session:
+                start_time = time.time()
+                async with session.get(self.apis['yahoo']['quote_url'], params=params) as response:
+                    response_time = time.time() - start_time
+                    
+                    if response.status == 200:
+                        data = await response.json()
+                        quotes = data.get('quoteResponse', {}).get('result') or []
+                        results = []
+                        
+                        for quote in quotes:
+                            if quote.get('regularMarketPrice') is None:
+                                continue
+                            
+                            results.append({
+                                'source': 'yahoo',
+                                'asset_name': quote['symbol'],
+                                'price': float(quote['regularMarketPrice']),
+                                'bid_price': float(quote.get('bid') or 0),
+                                'ask_price': float(quote.get('ask') or 0),
+                                'high_24h': float(quote.get('regularMarketDayHigh') or 0),
+                                'low_24h': float(quote.get('regularMarketDayLow') or 0),
+                                'volume': float(quote.get('regularMarketVolume') or 0),
+                                'change_24h': float(quote.get('regularMarketChangePercent') or 0),
+                                'response_time': response_time,
+                                'timestamp': datetime.now()
+                            })
+                        
+                        return results
+        
+        except Exception as e:
+            self.logger.error(f"خطأ في جلب بيانات Yahoo المجمعة: {e}")
+            await self.log_api_error('yahoo', str(e))
+        
+        return None
+    
+    def _parse_binance_ticker(self, data: Dict, response_time: float) -> Dict:
+        """تحويل استجابة ticker/24hr من Binance إلى سجل موحد"""
+        return {
+            'source': 'binance',
+            'asset_name': data['symbol'],
+            'price': float(data['lastPrice']),
+            'bid_price': float(data['bidPrice']),
+            'ask_price': float(data['askPrice']),
+            'high_24h': float(data['highPrice']),
+            'low_24h': float(data['lowPrice']),
+            'volume': float(data['volume']),
+            'change_24h': float(data['priceChangePercent']),
+            'response_time': response_time,
+            'timestamp': datetime.now()
+        }
+    
+    async def fetch_binance_data(self, symbol: str, priority: Optional[int] = None) -> Optional[Dict]:
         """جلب البيانات من Binance"""
         try:
-            await self.check_rate_limit('binance')
+            if not await self.check_rate_limit('binance', priority):
+                return None
             
             url = f"{self.apis['binance']['base_url']}/ticker/24hr"
             params = {'symbol': symbol}
@@ -320,19 +653,7 @@ class AlternativeAPIManager:
                     if response.status == 200:
                         data = await response.json()
                         
-                        return {
-                            'source': 'binance',
-                            'asset_name': symbol,
-                            'price': float(data['lastPrice']),
-                            'bid_price': float(data['bidPrice']),
-                            'ask_price': float(data['askPrice']),
-                            'high_24h': float(data['highPrice']),
-                            'low_24h': float(data['lowPrice']),
-                            'volume': float(data['volume']),
-                            'change_24h': float(data['priceChangePercent']),
-                            'response_time': response_time,
-                            'timestamp': datetime.now()
-                        }
+                        return self._parse_binance_ticker(data, response_time)
         
         except Exception as e:
             self.logger.error(f"خطأ في جلب بيانات Binance: {e}")
@@ -340,24 +661,251 @@ class AlternativeAPIManager:
         
         return None
     
-    async def fetch_all_data(self, assets: List[str]) -> List[Dict]:
-        """جلب البيانات من جميع المصادر المتاحة"""
+    async def fetch_binance_batch(self, symbols: List[str], priority: Optional[int] = None) -> Optional[List[Dict]]:
+        """جلب بيانات عدة رموز من Binance في طلب واحد"""
+        try:
+            if not await self.check_rate_limit('binance', priority):
+                return None
+            
+            url = f"{self.apis['binance']['base_url']}/ticker/24hr"
+            # يتوقع Binance مصفوفة JSON بدون مسافات
+            params = {'symbols': json.dumps(symbols, separators=(',', ':'))}
+            
+            async with aiohttp.ClientSession() as session:
+                start_time = time.time()
+                async with session.get(url, params=params) as response:
+                    response_time = time.time() - start_time
+                    
+                    if response.status == 200:
+                        data = await response.json()
+                        
+                        return [self._parse_binance_ticker(ticker, response_time) for ticker in data]
+        
+        except Exception as e:
+            self.logger.error(f"خطأ في جلب بيانات Binance المجمعة: {e}")
+            await self.log_api_error('binance', str(e))
+        
+        return None
+    
+    def route_asset(self, asset: str) -> List[Tuple[str, str]]:
+        """
+        تحديد المصادر المناسبة لأصل معين
+        
+        يعيد قائمة من (المصدر، رمز الأصل لدى المصدر)
+        """
+        routes = []
+        
+        if asset in ['EURUSD', 'GBPUSD', 'USDJPY']:
+            routes.append(('alphavantage', asset))
+            routes.append(('yahoo', f'{asset}=X'))
+            routes.append(('fixer', asset))
+        
+        elif asset.endswith('USDT'):
+            routes.append(('binance', asset))
+        
+        elif asset.lower() in ['bitcoin', 'ethereum', 'litecoin']:
+            routes.append(('coingecko', asset.lower()))
+        
+        return routes
+    
+    def canonical_asset_name(self, asset_name: str) -> str:
+        """توحيد اسم الأصل بين المصادر (مثلاً EURUSD=X لدى Yahoo يصبح EURUSD)"""
+        if asset_name and asset_name.endswith('=X'):
+            return asset_name[:-2]
+        return asset_name
+    
+    def get_consensus_price(self, asset_name: str) -> Optional[Dict]:
+        """
+        السعر المركب للأصل من جميع المصادر الحديثة
+        
+        يتضمن نطاق الثقة والمصادر المستبعدة كقيم شاذة
+        """
+        try:
+            return self.consensus.compute(self.canonical_asset_name(asset_name))
+        
+        except Exception as e:
+            self.logger.error(f"خطأ في حساب السعر المركب: {e}")
+            return None
+    
+    def group_assets_by_provider(self, assets: List[str]) -> Dict[str, List[str]]:
+        """تجميع الأصول حسب المصدر مع إزالة التكرار والحفاظ على الترتيب"""
+        groups: Dict[str, List[str]] = {}
+        
+        for asset in assets:
+            for source, symbol in self.route_asset(asset):
+                symbols = groups.setdefault(source, [])
+                if symbol not in symbols:
+                    symbols.append(symbol)
+        
+        return groups
+    
+    def _chunk_symbols(self, source: str, symbols: List[str]) -> List[List[str]]:
+        """تقسيم الرموز إلى دفعات حسب الحد الأقصى لكل طلب لدى المصدر"""
+        batch_size = self.apis[source].get('max_batch_size')
+        if not batch_size:
+            return [symbols]
+        
+        return [symbols[i:i + batch_size] for i in range(0, len(symbols), batch_size)]
+    
+    def build_batch_tasks(self, assets: List[str]) -> List:
+        """إنشاء أقل عدد ممكن من الطلبات لتغطية جميع الأصول"""
         tasks = []
         
+        # أولوية كل رمز هي أعلى أولوية بين الأصول التي تحتاجه
+        symbol_priorities: Dict[Tuple[str, str], int] = {}
         for asset in assets:
-            # تحديد المصادر المناسبة لكل أصل
-            if asset in ['EURUSD', 'GBPUSD', 'USDJPY']:
-                tasks.append(self.fetch_alphavantage_data(asset))
-                tasks.append(self.fetch_yahoo_data(f'{asset}=X'))
+            for route in self.route_asset(asset):
+                symbol_priorities[route] = min(
+                    symbol_priorities.get(route, self.default_asset_priority),
+                    self.get_asset_priority(asset)
+                )
+        
+        for source, symbols in self.group_assets_by_provider(assets).items():
+            for batch in self._chunk_symbols(source, symbols):
+                priority = min(symbol_priorities[(source, symbol)] for symbol in batch)
+                tasks.append(self.fetch_from_source(source, batch, priority))
+        
+        return tasks
+    
+    async def fetch_from_source(self, source: str, symbols: List[str],
+                                priority: Optional[int] = None) -> List[Dict]:
+        """
+        جلب دفعة رموز من مصدر واحد مع تحديث إحصائيات الأداء
+        """
+        start_time = time.time()
+        refused = set()
+        _rate_limited_sources.set(refused)
+        
+        if source == 'alphavantage':
+            # لا يوفر Alpha Vantage نقطة نهاية متعددة الرموز
+            results = await asyncio.gather(*[
+                self.fetch_alphavantage_data(symbol, priority=priority) for symbol in symbols
+            ])
+        elif source == 'fixer':
+            results = await self.fetch_fixer_data(pairs=symbols, priority=priority)
+        elif source == 'coingecko':
+            results = await self.fetch_coingecko_data(symbols, priority=priority)
+        elif source == 'yahoo':
+            results = await self.fetch_yahoo_batch(symbols, priority=priority)
+        elif source == 'binance':
+            results = await self.fetch_binance_batch(symbols, priority=priority)
+        else:
+            results = None
+        
+        records = [record for record in (results or []) if record]
+        stats = self.provider_stats.get(source)
+        
+        if stats is not None:
+            if records:
+                response_time = records[0].get('response_time') or (time.time() - start_time)
+                stats.record_success(response_time)
+            elif source in refused:
+                stats.record_rate_limited()
+            else:
+                stats.record_error()
+        
+        return records
+    
+    def has_quota(self, source: str, max_wait: float = 0.0) -> bool:
+        """هل يمكن إرسال طلب للمصدر خلال max_wait ثانية دون تجاوز حدوده"""
+        limiter = self.rate_limiters.get(source)
+        return limiter is not None and limiter.estimated_wait() <= max_wait
+    
+    def rank_sources(self, sources: List[str]) -> List[str]:
+        """
+        ترتيب المصادر حسب زمن الاستجابة المتحرك ونسبة الأخطاء
+        
+        تُستخدم الأولوية الثابتة لفض التعادل وللمصادر التي لم تُقس بعد
+        """
+        def score(source: str) -> Tuple[float, int]:
+            stats = self.provider_stats.get(source)
+            latency = self.default_latency
+            error_rate = 0.0
             
-            elif asset.endswith('USDT'):
-                tasks.append(self.fetch_binance_data(asset))
+            if stats is not None and stats.avg_latency is not None:
+                latency = stats.avg_latency
+            if stats is not None:
+                error_rate = stats.error_rate
             
-            elif asset.lower() in ['bitcoin', 'ethereum', 'litecoin']:
-                tasks.append(self.fetch_coingecko_data([asset.lower()]))
+            return latency * (1 + self.error_penalty * error_rate), self.apis.get(source, {}).get('priority', 999)
         
-        # إضافة بيانات Fixer للعملات الرئيسية
-        tasks.append(self.fetch_fixer_data())
+        return sorted(sources, key=score)
+    
+    def get_provider_stats(self) -> Dict[str, Dict]:
+        """إحصائيات الأداء الحالية لكل مصدر"""
+        return {source: stats.to_dict() for source, stats in self.provider_stats.items()}
+    
+    async def resolve_price(self, asset: str, top_n: int = 2,
+                            latency_budget: float = 2.0) -> Optional[Dict]:
+        """
+        الحصول على سعر مباشر بإرسال طلبات متوازية لأسرع N مصادر
+        
+        يعيد أول استجابة صالحة خلال الميزانية الزمنية ويلغي باقي الطلبات.
+        المصادر التي لن يتوفر لها رمز خلال الميزانية يتم تخطيها حتى لا تستهلك
+        الطلبات الاحتياطية حصتها (مثل الحصة الشهرية لـ Fixer)
+        """
+        routes = dict(self.route_asset(asset))
+        if not routes:
+            return None
+        
+        available = [source for source in routes if self.has_quota(source, latency_budget)]
+        if not available:
+            self.logger.warning(f"لا توجد مصادر بحصة متاحة للأصل {asset}")
+            return None
+        
+        ranked = self.rank_sources(available)[:top_n]
+        priority = min(self.get_asset_priority(asset), 0)
+        
+        tasks = {
+            asyncio.create_task(self.fetch_from_source(source, [routes[source]], priority)): source
+            for source in ranked
+        }
+        pending = set(tasks)
+        deadline = time.time() + latency_budget
+        winner = None
+        
+        try:
+            while pending and winner is None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    
+                    for record in task.result():
+                        if record.get('price') and record['price'] > 0:
+                            winner = dict(record, asset_name=asset)
+                            break
+                    
+                    if winner is not None:
+                        break
+        
+        finally:
+            for task in pending:
+                task.cancel()
+                
+                # الطلبات التي لم تكتمل خلال الميزانية تحتسب كمهلة منتهية
+                stats = self.provider_stats.get(tasks[task])
+                if winner is None and stats is not None:
+                    stats.record_timeout(latency_budget)
+        
+        if winner is None:
+            self.logger.warning(f"لم يتم الحصول على سعر {asset} خلال {latency_budget} ثانية")
+            return None
+        
+        await self.save_api_data(winner)
+        return winner
+    
+    async def fetch_all_data(self, assets: List[str]) -> List[Dict]:
+        """جلب البيانات من جميع المصادر المتاحة"""
+        # طلب واحد لكل دفعة من الرموز لدى كل مصدر
+        tasks = self.build_batch_tasks(assets)
         
         # تنفيذ جميع المهام بشكل متزامن
         results = await asyncio.gather(*tasks, return_exceptions=True)
@@ -377,19 +925,36 @@ class AlternativeAPIManager:
             if data:
                 await self.save_api_data(data)
         
+        # حفظ الحصص المستهلكة حتى لا تضيع عند إعادة التشغيل
+        await asyncio.to_thread(self.save_rate_limit_state)
+        
+        self.schedule_retention()
+        
         return all_data
     
     async def save_api_data(self, data: Dict):
-        """حفظ البيانات في قاعدة البيانات"""
+        """
+        حفظ البيانات في قاعدة البيانات
+        
+        يتم وضع الصف في طابور الكتابة المؤجلة ولا تنتظر حلقة الأحداث SQLite
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            ts = self._to_epoch(data.get('timestamp'))
+            self.price_cache.update(data, ts)
             
-            cursor.execute('''
+            if data.get('price') is not None:
+                self.consensus.update(
+                    self.canonical_asset_name(data.get('asset_name')),
+                    data.get('source'),
+                    float(data['price']),
+                    ts
+                )
+            
+            self.writer.enqueue('''
                 INSERT INTO api_prices 
                 (source, asset_name, price, bid_price, ask_price, volume, 
-                 change_24h, high_24h, low_24h, market_cap, response_time)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                 change_24h, high_24h, low_24h, market_cap, response_time, ts)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 data.get('source'),
                 data.get('asset_name'),
@@ -401,13 +966,9 @@ class AlternativeAPIManager:
                 data.get('high_24h'),
                 data.get('low_24h'),
                 data.get('market_cap'),
-                data.get('response_time')
+                data.get('response_time'),
+                ts
             ))
-            
-            conn.commit()
-            conn.close()
-            
-            self.logger.info(f"تم حفظ بيانات {data.get('asset_name')} من {data.get('source')}")
         
         except Exception as e:
             self.logger.error(f"خطأ في حفظ بيانات API: {e}")
@@ -415,48 +976,126 @@ class AlternativeAPIManager:
     async def log_api_error(self, source: str, error: str):
         """تسجيل أخطاء API"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            self.writer.enqueue('''
                 INSERT INTO api_performance (source, response_time, success_rate, error_count, last_error)
                 VALUES (?, ?, ?, ?, ?)
             ''', (source, 0, 0, 1, error))
-            
-            conn.commit()
-            conn.close()
         
         except Exception as e:
             self.logger.error(f"خطأ في تسجيل خطأ API: {e}")
     
-    def get_best_price(self, asset_name: str, max_age_minutes: int = 5) -> Optional[Dict]:
-        """الحصول على أفضل سعر من المصادر المختلفة"""
+    def _to_epoch(self, timestamp) -> int:
+        """تحويل الطابع الزمني إلى ثوانٍ منذ epoch"""
+        if isinstance(timestamp, datetime):
+            return int(timestamp.timestamp())
+        if isinstance(timestamp, (int, float)):
+            return int(timestamp)
+        return int(time.time())
+    
+    def _format_timestamp(self, ts: int) -> str:
+        """تنسيق الطابع الزمني بنفس صيغة عمود timestamp في قاعدة البيانات (UTC)"""
+        return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    
+    def archive_old_prices(self, retention_days: Optional[int] = None) -> int:
+        """
+        نقل الأسعار الأقدم من مدة الاحتفاظ إلى جدول الأرشيف
+        
+        يعيد عدد الصفوف المنقولة
+        """
+        if retention_days is None:
+            retention_days = self.retention_days
+        
+        cutoff = int(time.time()) - retention_days * 86400
+        
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn = sqlite3.connect(self.db_path, timeout=30)
             cursor = conn.cursor()
             
-            # البحث عن أحدث الأسعار
             cursor.execute('''
-                SELECT source, price, bid_price, ask_price, timestamp, response_time
+                INSERT INTO api_prices_archive
+                SELECT id, timestamp, source, asset_name, price, bid_price, ask_price, volume,
+                       change_24h, high_24h, low_24h, market_cap, response_time, is_valid, ts
                 FROM api_prices
-                WHERE asset_name = ? 
-                AND datetime(timestamp) > datetime('now', '-{} minutes')
-                ORDER BY timestamp DESC
-            '''.format(max_age_minutes), (asset_name,))
+                WHERE ts < ?
+            ''', (cutoff,))
+            cursor.execute('DELETE FROM api_prices WHERE ts < ?', (cutoff,))
+            archived = cursor.rowcount
             
-            results = cursor.fetchall()
+            conn.commit()
             conn.close()
             
+            if archived:
+                self.logger.info(f"تم نقل {archived} سعر إلى الأرشيف")
+            
+            return archived
+        
+        except Exception as e:
+            self.logger.error(f"خطأ في أرشفة الأسعار القديمة: {e}")
+            return 0
+    
+    def schedule_retention(self):
+        """تشغيل مهمة الأرشفة في الخلفية إذا حان وقتها"""
+        if time.time() - self.last_retention_run < self.retention_interval:
+            return
+        if self._retention_task is not None and not self._retention_task.done():
+            return
+        
+        self.last_retention_run = time.time()
+        self._retention_task = asyncio.create_task(asyncio.to_thread(self.archive_old_prices))
+    
+    async def flush_pending_writes(self):
+        """انتظار كتابة جميع الصفوف المعلقة إلى قاعدة البيانات"""
+        await self.writer.flush()
+    
+    async def close(self):
+        """كتابة الصفوف المعلقة وإيقاف العامل الخلفي"""
+        await self.writer.close()
+        await asyncio.to_thread(self.save_rate_limit_state)
+    
+    def get_best_price(self, asset_name: str, max_age_minutes: int = 5) -> Optional[Dict]:
+        """
+        الحصول على أفضل سعر من المصادر المختلفة
+        
+        يتم الرد من الذاكرة المؤقتة لآخر الأسعار، ولا يُستخدم SQLite إلا عند
+        عدم توفر أسعار حديثة في الذاكرة (مثلاً بعد إعادة التشغيل)
+        """
+        try:
+            cutoff = int(time.time()) - max_age_minutes * 60
+            cached = self.price_cache.get_latest(asset_name, cutoff)
+            
+            if cached:
+                results = [
+                    (record['source'], record['price'], record.get('bid_price'), record.get('ask_price'),
+                     self._format_timestamp(record['ts']), record.get('response_time'))
+                    for record in cached
+                ]
+            else:
+                conn = sqlite3.connect(self.db_path)
+                cursor = conn.cursor()
+                
+                # البحث عن أحدث الأسعار (شرط قابل للاستفادة من الفهرس)
+                cursor.execute('''
+                    SELECT source, price, bid_price, ask_price, timestamp, response_time
+                    FROM api_prices
+                    WHERE asset_name = ? 
+                    AND ts > ?
+                    ORDER BY ts DESC
+                ''', (asset_name, cutoff))
+                
+                results = cursor.fetchall()
+                conn.close()
+            
             if not results:
                 return None
             
-            # اختيار أفضل سعر بناءً على الأولوية والجودة
+            # اختيار أفضل سعر بناءً على ترتيب المصادر حسب الأداء الفعلي
+            source_ranks = {source: rank for rank, source in enumerate(self.rank_sources(list(self.apis)))}
             best_price = None
             best_priority = float('inf')
             
             for result in results:
                 source = result[0]
-                api_priority = self.apis.get(source, {}).get('priority', 999)
+                api_priority = source_ranks.get(source, 999)
                 
                 if api_priority < best_priority:
                     best_priority = api_priority
@@ -475,9 +1114,30 @@ class AlternativeAPIManager:
             self.logger.error(f"خطأ في الحصول على أفضل سعر: {e}")
             return None
     
-    def get_price_comparison(self, asset_name: str, max_age_minutes: int = 5) -> List[Dict]:
-        """مقارنة الأسعار من مصادر مختلفة"""
+    def get_price_comparison(self, asset_name: str, max_age_minutes: int = 5,
+                             include_history: bool = False) -> List[Dict]:
+        """
+        مقارنة الأسعار من مصادر مختلفة
+        
+        بشكل افتراضي يعيد آخر سعر لكل مصدر من الذاكرة المؤقتة، ومع
+        include_history يعيد جميع الأسعار خلال الفترة من قاعدة البيانات
+        """
         try:
+            cutoff = int(time.time()) - max_age_minutes * 60
+            
+            if not include_history:
+                cached = self.price_cache.get_latest(asset_name, cutoff)
+                if cached:
+                    return [
+                        {
+                            'source': record['source'],
+                            'price': record['price'],
+                            'timestamp': self._format_timestamp(record['ts']),
+                            'response_time': record.get('response_time')
+                        }
+                        for record in cached
+                    ]
+            
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
@@ -485,9 +1145,9 @@ class AlternativeAPIManager:
                 SELECT source, price, timestamp, response_time
                 FROM api_prices
                 WHERE asset_name = ? 
-                AND datetime(timestamp) > datetime('now', '-{} minutes')
-                ORDER BY timestamp DESC
-            '''.format(max_age_minutes), (asset_name,))
+                AND ts > ?
+                ORDER BY ts DESC
+            ''', (asset_name, cutoff))
             
             results = cursor.fetchall()
             conn.close()
@@ -516,14 +1176,30 @@ async def main():
     
     print(f"تم جلب {len(data)} عنصر بيانات")
     
+    # انتظار كتابة البيانات المعلقة قبل القراءة من قاعدة البيانات
+    await api_manager.flush_pending_writes()
+    
     # الحصول على أفضل سعر لـ EUR/USD
     best_price = api_manager.get_best_price('EURUSD')
     if best_price:
         print(f"أفضل سعر لـ EUR/USD: {best_price['price']} من {best_price['source']}")
     
+    # سعر مباشر من أسرع مصدرين
+    live_price = await api_manager.resolve_price('EURUSD', top_n=2, latency_budget=2.0)
+    if live_price:
+        print(f"السعر المباشر لـ EUR/USD: {live_price['price']} من {live_price['source']}")
+    
     # مقارنة الأسعار
     comparison = api_manager.get_price_comparison('EURUSD')
     print(f"مقارنة أسعار EUR/USD من {len(comparison)} مصدر")
+    
+    # السعر المركب من جميع المصادر
+    consensus = api_manager.get_consensus_price('EURUSD')
+    if consensus:
+        print(f"السعر المركب لـ EUR/USD: {consensus['price']} "
+              f"({consensus['lower']} - {consensus['upper']})، مصادر شاذة: {consensus['outliers']}")
+    
+    await api_manager.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
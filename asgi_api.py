@@ -0,0 +1,438 @@
+"""
+نسخة ASGI من خوادم الإشارات (enhanced_api و simple_signal_api) في عملية واحدة
+
+يتم تركيبها على تطبيق FastAPI الرئيسي (main.app) بجانب مسارات / و /ws عبر
+install و lifespan، فيعمل كل شيء في نفس عملية uvicorn main:app:
+
+- مسارات enhanced_api على نفس المسارات الأصلية (/api/...)
+- مسارات simple_signal_api تحت البادئة /simple (/simple/api/signal/EURUSD)
+- بث الإشارات عبر Server-Sent Events على /api/stream/{pair}
+
+يتم استخدام نفس منطق المسارات ونفس صيغة JSON، مع تنفيذ التحليل الثقيل
+في مجمع خيوط منفصل وقفل لكل زوج لأن معالجات الأزواج ليست آمنة للخيوط
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import numpy as np
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware.sessions import SessionMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+import enhanced_api
+import simple_signal_api
+
+# مجمع خيوط للعمليات الحسابية حتى لا تتوقف حلقة الأحداث
+executor = ThreadPoolExecutor(max_workers=int(os.environ.get('ANALYSIS_WORKERS', '4')))
+
+# قفل لكل زوج: طلبات الأزواج المختلفة تعمل بالتوازي
+pair_locks = {pair: asyncio.Lock() for pair in enhanced_api.processors}
+
+
+def _json_default(value):
+    """تحويل أنواع numpy كما يفعل jsonify في Flask"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class CompatJSONResponse(JSONResponse):
+    """استجابة JSON متوافقة مع مخرجات Flask (تدعم numpy و NaN)"""
+    
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=_json_default).encode('utf-8')
+
+
+async def run_for_pair(pair: str, func, *args):
+    """تنفيذ دالة ثقيلة في مجمع الخيوط مع قفل الزوج"""
+    loop = asyncio.get_running_loop()
+    async with pair_locks[pair]:
+        return await loop.run_in_executor(executor, func, *args)
+
+
+def error_response(error: Exception, pair: str) -> CompatJSONResponse:
+    return CompatJSONResponse({'error': str(error), 'pair': pair}, status_code=500)
+
+
+class SignalBroadcaster:
+    """
+    بث إشارات زوج واحد لجميع المشتركين
+    
+    يتم حساب التحليل مرة واحدة فقط لكل شمعة جديدة مهما كان عدد المشتركين،
+    ولا يتم الإرسال إلا عند تغير الإشارة. يعمل البث فقط عند وجود مشتركين
+    """
+    
+    def __init__(self, pair: str, poll_interval: float = 5.0, queue_size: int = 10):
+        self.pair = pair
+        self.poll_interval = poll_interval
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.last_candle = None
+        self.last_fingerprint = None
+        self.last_event = None
+        self._task = None
+    
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        
+        # المشترك الجديد يستلم آخر إشارة فوراً
+        if self.last_event is not None:
+            queue.put_nowait(self.last_event)
+        
+        self.subscribers.add(queue)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        
+        return queue
+    
+    def unsubscribe(self, queue: asyncio.Queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            self.stop()
+    
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+    
+    def _publish(self, event: str):
+        for queue in self.subscribers:
+            # المشترك البطيء يفقد أقدم إشارة بدلاً من إيقاف البث
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            try:
+                candle = await loop.run_in_executor(executor, enhanced_api.get_latest_candle_key, self.pair)
+                
+                if candle != self.last_candle:
+                    result = await run_for_pair(self.pair, enhanced_api.build_comprehensive_analysis, self.pair)
+                    self.last_candle = candle
+                    
+                    fingerprint = enhanced_api.signal_fingerprint(result)
+                    if fingerprint != self.last_fingerprint:
+                        self.last_fingerprint = fingerprint
+                        self.last_event = json.dumps(result, default=_json_default)
+                        self._publish(self.last_event)
+            
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ خطأ في بث إشارات {self.pair}: {e}")
+            
+            await asyncio.sleep(self.poll_interval)
+
+broadcasters = {pair: SignalBroadcaster(pair) for pair in enhanced_api.processors}
+
+# رسالة keep-alive حتى لا يغلق الوكيل الاتصال الخامل
+heartbeat_interval = 15
+
+
+# ========== مسارات enhanced_api ==========
+
+enhanced_router = APIRouter()
+
+def get_session_pair(request: Request) -> str:
+    """الزوج المختار في جلسة المستخدم الحالي"""
+    return enhanced_api.resolve_preferred_pair(request.session.get('pair'))
+
+def unsupported_pair(pair: str) -> CompatJSONResponse:
+    return CompatJSONResponse({
+        'error': f'الزوج {pair} غير متاح',
+        'pair': pair
+    }, status_code=400)
+
+@enhanced_router.get('/api/pairs')
+async def get_available_pairs(request: Request):
+    """الحصول على الأزواج المتاحة"""
+    return CompatJSONResponse({
+        'pairs': list(enhanced_api.processors.keys()),
+        'current_pair': get_session_pair(request)
+    })
+
+@enhanced_router.post('/api/pair/select')
+async def select_pair(request: Request):
+    """اختيار زوج للتحليل (تفضيل خاص بجلسة المستخدم)"""
+    data = await request.json()
+    pair = data.get('pair', 'EURUSD')
+    
+    if pair in enhanced_api.processors:
+        request.session['pair'] = pair
+        return CompatJSONResponse({
+            'success': True,
+            'selected_pair': pair,
+            'message': f'تم اختيار الزوج {pair} بنجاح'
+        })
+    
+    return CompatJSONResponse({
+        'success': False,
+        'error': f'الزوج {pair} غير متاح'
+    }, status_code=400)
+
+# المسارات الخاصة بزوج محدد: /api/{pair}/...
+
+@enhanced_router.get('/api/{pair}/analysis')
+async def get_pair_analysis(pair: str):
+    """الحصول على التحليل الشامل للزوج"""
+    if pair not in enhanced_api.processors:
+        return unsupported_pair(pair)
+    
+    try:
+        result = await run_for_pair(pair, enhanced_api.build_comprehensive_analysis, pair)
+        return CompatJSONResponse(result)
+    
+    except Exception as e:
+        return error_response(e, pair)
+
+@enhanced_router.get('/api/{pair}/indicators')
+async def get_pair_indicators(pair: str):
+    """الحصول على المؤشرات الفنية المحسنة للزوج"""
+    if pair not in enhanced_api.processors:
+        return unsupported_pair(pair)
+    
+    try:
+        result = await run_for_pair(pair, enhanced_api.build_indicators, pair)
+        return CompatJSONResponse(result)
+    
+    except Exception as e:
+        return error_response(e, pair)
+
+@enhanced_router.get('/api/{pair}/stability/report')
+async def get_pair_stability_report(pair: str):
+    """الحصول على تقرير الاستقرار للزوج"""
+    if pair not in enhanced_api.processors:
+        return unsupported_pair(pair)
+    
+    try:
+        result = await run_for_pair(pair, enhanced_api.build_stability_report, pair)
+        return CompatJSONResponse(result)
+    
+    except Exception as e:
+        return error_response(e, pair)
+
+@enhanced_router.get('/api/{pair}/signals/history')
+async def get_pair_signals_history(pair: str):
+    """الحصول على تاريخ الإشارات للزوج"""
+    if pair not in enhanced_api.processors:
+        return unsupported_pair(pair)
+    
+    try:
+        return CompatJSONResponse(enhanced_api.build_signals_history(pair))
+    
+    except Exception as e:
+        return error_response(e, pair)
+
+@enhanced_router.get('/api/{pair}/performance')
+async def get_pair_performance_metrics(pair: str):
+    """الحصول على مقاييس الأداء للزوج"""
+    if pair not in enhanced_api.processors:
+        return unsupported_pair(pair)
+    
+    try:
+        return CompatJSONResponse(enhanced_api.build_performance_metrics(pair))
+    
+    except Exception as e:
+        return error_response(e, pair)
+
+@enhanced_router.post('/api/{pair}/config/update')
+async def update_pair_configuration(pair: str, request: Request):
+    """تحديث إعدادات معالج الزوج"""
+    if pair not in enhanced_api.processors:
+        return unsupported_pair(pair)
+    
+    try:
+        data = await request.json()
+        
+        async with pair_locks[pair]:
+            result = enhanced_api.apply_config_update(pair, data)
+        
+        return CompatJSONResponse(result)
+    
+    except Exception as e:
+        return CompatJSONResponse({
+            'success': False,
+            'error': str(e)
+        }, status_code=500)
+
+# المسارات القديمة تستخدم الزوج المختار في الجلسة
+
+@enhanced_router.get('/api/analysis/comprehensive')
+async def get_comprehensive_analysis(request: Request):
+    """الحصول على التحليل الشامل للزوج المختار"""
+    return await get_pair_analysis(get_session_pair(request))
+
+@enhanced_router.get('/api/indicators')
+async def get_indicators(request: Request):
+    """الحصول على المؤشرات الفنية المحسنة"""
+    return await get_pair_indicators(get_session_pair(request))
+
+@enhanced_router.get('/api/stability/report')
+async def get_stability_report(request: Request):
+    """الحصول على تقرير الاستقرار"""
+    return await get_pair_stability_report(get_session_pair(request))
+
+@enhanced_router.get('/api/signals/history')
+async def get_signals_history(request: Request):
+    """الحصول على تاريخ الإشارات"""
+    return await get_pair_signals_history(get_session_pair(request))
+
+@enhanced_router.get('/api/performance')
+async def get_performance_metrics(request: Request):
+    """الحصول على مقاييس الأداء"""
+    return await get_pair_performance_metrics(get_session_pair(request))
+
+@enhanced_router.post('/api/config/update')
+async def update_configuration(request: Request):
+    """تحديث إعدادات النظام"""
+    return await update_pair_configuration(get_session_pair(request), request)
+
+@enhanced_router.get('/api/stream/{pair}')
+async def stream_signals(pair: str):
+    """بث الإشارات المستقرة للزوج عبر Server-Sent Events عند تغيرها فقط"""
+    if pair not in broadcasters:
+        return CompatJSONResponse({
+            'error': f'الزوج {pair} غير متاح',
+            'pair': pair
+        }, status_code=400)
+    
+    broadcaster = broadcasters[pair]
+    
+    async def events():
+        # الاشتراك داخل المولد حتى يرتبط إلغاؤه بعمر المولد نفسه (إذا انقطع
+        # الاتصال قبل بدء المولد لا يتم الاشتراك أصلاً)
+        queue = broadcaster.subscribe()
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), heartbeat_interval)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                
+                yield f'event: signal\ndata: {data}\n\n'
+        finally:
+            broadcaster.unsubscribe(queue)
+    
+    return StreamingResponse(events(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@enhanced_router.get('/api/health')
+async def health_check(request: Request):
+    """فحص صحة النظام"""
+    return CompatJSONResponse(enhanced_api.build_health_status(get_session_pair(request)))
+
+
+# ========== مسارات simple_signal_api ==========
+
+simple_router = APIRouter()
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """مطابقة ترويسة If-None-Match مع ETag (مقارنة ضعيفة كما يشترط RFC 9110)"""
+    if not header:
+        return False
+    
+    for token in header.split(','):
+        token = token.strip()
+        if token == '*':
+            return True
+        if token.startswith('W/'):
+            token = token[2:]
+        if token.strip('"') == etag:
+            return True
+    
+    return False
+
+@simple_router.get('/api/signal/{pair}')
+async def get_signal(pair: str, request: Request):
+    """الحصول على إشارة التداول للزوج المحدد"""
+    try:
+        snapshot = simple_signal_api.refresher.snapshot
+        if pair not in snapshot.prices:
+            return CompatJSONResponse({"error": "زوج غير مدعوم"}, status_code=400)
+        
+        etag = simple_signal_api.signal_etag(snapshot, pair)
+        headers = {'ETag': f'W/"{etag}"'}
+        if _etag_matches(request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=headers)
+        
+        return CompatJSONResponse(simple_signal_api.build_signal_payload(snapshot, pair), headers=headers)
+    
+    except Exception as e:
+        return CompatJSONResponse({
+            "success": False,
+            "error": str(e)
+        }, status_code=500)
+
+@simple_router.get('/api/price/{pair}')
+async def get_price(pair: str):
+    """الحصول على السعر الحقيقي للزوج"""
+    try:
+        snapshot = simple_signal_api.refresher.snapshot
+        if pair not in snapshot.prices:
+            return CompatJSONResponse({"error": "زوج غير مدعوم"}, status_code=400)
+        
+        return CompatJSONResponse(simple_signal_api.build_price_payload(snapshot, pair))
+    
+    except Exception as e:
+        return CompatJSONResponse({"error": str(e)}, status_code=500)
+
+@simple_router.get('/api/prices')
+async def get_all_prices():
+    """الحصول على جميع الأسعار"""
+    try:
+        return CompatJSONResponse(simple_signal_api.build_prices_payload(simple_signal_api.refresher.snapshot))
+    
+    except Exception as e:
+        return CompatJSONResponse({"error": str(e)}, status_code=500)
+
+@simple_router.get('/api/health')
+async def simple_health_check():
+    """فحص صحة النظام"""
+    return CompatJSONResponse(simple_signal_api.build_health_payload(simple_signal_api.refresher.snapshot))
+
+
+# ========== إعداد التطبيق ==========
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    simple_signal_api.refresher.start()
+    yield
+    for broadcaster in broadcasters.values():
+        broadcaster.stop()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def install(app: FastAPI):
+    """إضافة مسارات الإشارات والوسائط اللازمة لها إلى تطبيق قائم (main.app)"""
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=['*'],
+        allow_credentials=True,
+        allow_methods=['*'],
+        allow_headers=['*'],
+        expose_headers=['ETag']
+    )
+    # الجلسة تحفظ الزوج المفضل لكل مستخدم فقط (نفس مفتاح نسخة Flask، انظر enhanced_api.load_secret_key)
+    app.add_middleware(SessionMiddleware, secret_key=enhanced_api.app.secret_key)
+    app.include_router(enhanced_router)
+    app.include_router(simple_router, prefix='/simple')
+
+# لتشغيله محليا (نفس تطبيق النشر)
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("main:app", host="0.0.0.0", port=5000)
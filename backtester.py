@@ -0,0 +1,255 @@
+"""
+اختبار إشارات TechnicalAnalysisEngine تاريخياً كصفقات خيارات ثنائية
+
+كل إشارة call/put يتم تقييمها عند كل مدة من مدد TradeDuration: سعر الدخول هو
+إغلاق شمعة الإشارة، وسعر الخروج هو إغلاق آخر شمعة عند وقت الانتهاء أو قبله.
+يتم إيجاد شموع الخروج عبر np.searchsorted على الطوابع الزمنية (بدون حلقات على
+الإشارات)، وتحسب النتائج بنسبة العائد لكل أصل (عمود Asset.payout).
+
+- evaluate_trades: صفقة لكل (إشارة، مدة) مع الربح بوحدة رهان واحدة
+- summarize: نسبة الفوز والعائد المتوقع وأقصى تراجع لكل مجموعة
+- backtest: الاثنان معاً
+"""
+
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from technical_analysis import SignalResult
+from trade_duration_analyzer import TradeDuration
+
+DURATION_UNITS = {
+    'm': 60,
+    'h': 3600
+}
+
+# الأصل المستخدم عندما لا تحتوي البيانات على عمود asset
+DEFAULT_ASSET = 'default'
+
+
+def duration_seconds(duration: Union[TradeDuration, str]) -> int:
+    """مدة الصفقة بالثواني ('5m' أو TradeDuration.FIVE_MINUTES)"""
+    value = duration.value if isinstance(duration, TradeDuration) else duration
+    return int(value[:-1]) * DURATION_UNITS[value[-1]]
+
+
+def _to_ns(timestamps) -> np.ndarray:
+    """الطوابع الزمنية كأعداد صحيحة بالنانوثانية (بتوقيت UTC للطوابع ذات المنطقة الزمنية)"""
+    index = pd.DatetimeIndex(timestamps)
+    if index.tz is not None:
+        index = index.tz_convert(None)
+    return index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+
+def _payout_lookup(payouts) -> Dict[str, float]:
+    """
+    نسبة العائد لكل أصل من رقم واحد أو قاموس أو جدول الأصول (symbol, payout)
+    
+    القيم الأكبر من 1 تعتبر نسبة مئوية (92 تعني 0.92)
+    """
+    if isinstance(payouts, pd.DataFrame):
+        payouts = dict(zip(payouts['symbol'], payouts['payout']))
+    elif not isinstance(payouts, dict):
+        payouts = {None: payouts}
+    
+    return {
+        asset: (float(value) / 100 if float(value) > 1 else float(value))
+        for asset, value in payouts.items()
+        if value is not None and not pd.isna(value)
+    }
+
+
+def _signals_frame(signals, asset: Optional[str]) -> pd.DataFrame:
+    """نتيجة generate_signals (SignalResult) أو قائمة قواميس أو DataFrame بنفس الأعمدة"""
+    if isinstance(signals, SignalResult):
+        signals = signals.frame
+    frame = signals.copy() if isinstance(signals, pd.DataFrame) else pd.DataFrame(list(signals))
+    if frame.empty:
+        return pd.DataFrame(columns=['asset', 'timestamp', 'direction', 'confidence'])
+    
+    if 'timestamp' not in frame.columns:
+        frame = frame.rename_axis('timestamp').reset_index()
+    if 'asset' not in frame.columns:
+        frame['asset'] = asset or DEFAULT_ASSET
+    if 'confidence' not in frame.columns:
+        frame['confidence'] = np.nan
+    
+    return frame[['asset', 'timestamp', 'direction', 'confidence']]
+
+
+def _candles_by_asset(candles, asset: Optional[str]) -> Dict[str, pd.DataFrame]:
+    """
+    الشموع لكل أصل: قاموس {أصل: DataFrame} أو DataFrame واحد (مع عمود asset
+    أو symbol عند وجود أكثر من أصل). الفهرس أو عمود timestamp هو وقت الشمعة
+    """
+    if isinstance(candles, dict):
+        return candles
+    
+    for column in ('asset', 'symbol'):
+        if column in candles.columns:
+            return {name: group for name, group in candles.groupby(column, sort=False)}
+    
+    return {asset or DEFAULT_ASSET: candles}
+
+
+def evaluate_trades(signals, candles, durations: Optional[Iterable] = None, payouts=0.8,
+                    asset: Optional[str] = None) -> pd.DataFrame:
+    """
+    صفقة لكل (إشارة، مدة) مع سعر الدخول والخروج والنتيجة
+    
+    outcome: 1 فوز، -1 خسارة، 0 تعادل (استرداد الرهان). profit بوحدة رهان واحدة:
+    نسبة العائد عند الفوز و -1 عند الخسارة. الإشارات التي ينتهي وقتها بعد آخر
+    شمعة متوفرة (أو بدون شمعة عند وقت الإشارة) يتم استبعادها.
+    
+    يرفع ValueError إذا لم تتوفر نسبة عائد لأحد أصول الإشارات (بدون قيمة افتراضية
+    في payouts مثل {None: 0.8})
+    """
+    durations = list(durations) if durations is not None else list(TradeDuration)
+    duration_names = [d.value if isinstance(d, TradeDuration) else d for d in durations]
+    duration_ns = np.array([duration_seconds(d) for d in durations], dtype=np.int64) * 10**9
+    
+    signals = _signals_frame(signals, asset)
+    payout_by_asset = _payout_lookup(payouts)
+    default_payout = payout_by_asset.get(None)
+    
+    if default_payout is None:
+        missing = sorted(set(signals['asset']) - set(payout_by_asset), key=str)
+        if missing:
+            raise ValueError(f"لا توجد نسبة عائد للأصول: {', '.join(map(str, missing))}")
+    
+    candles_by_asset = _candles_by_asset(candles, asset)
+    
+    trades = []
+    for name, asset_signals in signals.groupby('asset', sort=False):
+        # الإشارات مرتبة زمنياً حتى تكون استعلامات searchsorted متصاعدة
+        asset_signals = asset_signals.sort_values('timestamp', kind='stable')
+        asset_candles = candles_by_asset.get(name)
+        if asset_candles is None or asset_candles.empty:
+            continue
+        
+        if 'timestamp' in asset_candles.columns:
+            asset_candles = asset_candles.set_index('timestamp')
+        if not asset_candles.index.is_monotonic_increasing:
+            asset_candles = asset_candles.sort_index()
+        times = _to_ns(asset_candles.index)
+        close = asset_candles['close'].to_numpy(dtype=float)
+        
+        signal_times = _to_ns(asset_signals['timestamp'])
+        direction = np.where(asset_signals['direction'].to_numpy() == 'call', 1, -1)
+        
+        # شمعة الدخول: آخر شمعة عند وقت الإشارة أو قبله
+        entry_index = np.searchsorted(times, signal_times, side='right') - 1
+        
+        # شمعة الخروج لكل (إشارة، مدة): آخر شمعة عند وقت الانتهاء أو قبله
+        expiry_times = signal_times[:, None] + duration_ns[None, :]
+        exit_index = np.searchsorted(times, expiry_times, side='right') - 1
+        
+        valid = (entry_index[:, None] >= 0) & (expiry_times <= times[-1])
+        rows, columns = np.nonzero(valid)
+        
+        entry_price = close[entry_index[rows]]
+        exit_price = close[exit_index[rows, columns]]
+        outcome = np.sign(exit_price - entry_price).astype(int) * direction[rows]
+        
+        payout = payout_by_asset.get(name, default_payout)
+        trades.append(pd.DataFrame({
+            'asset': name,
+            'timestamp': asset_signals['timestamp'].to_numpy()[rows],
+            'direction': asset_signals['direction'].to_numpy()[rows],
+            'confidence': asset_signals['confidence'].to_numpy()[rows],
+            'duration': pd.Categorical.from_codes(columns, categories=duration_names),
+            'expiry_time': expiry_times[rows, columns].view('datetime64[ns]'),
+            'entry_price': entry_price,
+            'exit_price': exit_price,
+            'outcome': outcome,
+            'payout': payout,
+            'profit': np.where(outcome > 0, payout, np.where(outcome < 0, -1.0, 0.0))
+        }))
+    
+    if not trades:
+        return pd.DataFrame(columns=[
+            'asset', 'timestamp', 'direction', 'confidence', 'duration', 'expiry_time',
+            'entry_price', 'exit_price', 'outcome', 'payout', 'profit'
+        ])
+    
+    # أعمدة التجميع كفئات (تجميع أسرع وترتيب المدد كما في TradeDuration)
+    trades = pd.concat(trades, ignore_index=True)
+    trades['asset'] = trades['asset'].astype('category')
+    return trades
+
+
+def summarize(trades: pd.DataFrame, by: Union[str, List[str]] = 'duration') -> pd.DataFrame:
+    """
+    نسبة الفوز والعائد المتوقع وأقصى تراجع لكل مجموعة
+    
+    التراجع يحسب على الرصيد التراكمي مرتباً حسب وقت انتهاء الصفقات، بوحدات الرهان
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    if trades.empty:
+        return pd.DataFrame(columns=by + [
+            'trades', 'wins', 'losses', 'ties', 'win_rate', 'expectancy', 'total_profit', 'max_drawdown'
+        ])
+    
+    ordered = trades.sort_values('expiry_time', kind='stable')
+    groups = ordered.groupby(by, sort=False, observed=True)
+    
+    equity = groups['profit'].cumsum()
+    peak = equity.groupby([ordered[column] for column in by], observed=True).cummax().clip(lower=0)
+    ordered = ordered.assign(
+        drawdown=peak - equity,
+        win=ordered['outcome'] > 0,
+        loss=ordered['outcome'] < 0,
+        tie=ordered['outcome'] == 0
+    )
+    
+    summary = ordered.groupby(by, observed=True).agg(
+        trades=('outcome', 'size'),
+        wins=('win', 'sum'),
+        losses=('loss', 'sum'),
+        ties=('tie', 'sum'),
+        expectancy=('profit', 'mean'),
+        total_profit=('profit', 'sum'),
+        max_drawdown=('drawdown', 'max')
+    )
+    summary.insert(4, 'win_rate', summary['wins'] / summary['trades'] * 100)
+    
+    return summary.reset_index()
+
+
+def backtest(signals, candles, durations: Optional[Iterable] = None, payouts=0.8,
+             asset: Optional[str] = None) -> Dict:
+    """
+    اختبار الإشارات عند كل مدة
+    
+    يعيد {'trades', 'summary' (لكل مدة), 'by_asset' (لكل أصل ومدة)}
+    """
+    trades = evaluate_trades(signals, candles, durations, payouts, asset)
+    return {
+        'trades': trades,
+        'summary': summarize(trades, 'duration'),
+        'by_asset': summarize(trades, ['asset', 'duration'])
+    }
+
+
+# مثال على الاستخدام
+if __name__ == '__main__':
+    from market_data_provider import SyntheticMarketDataProvider
+    from technical_analysis import TechnicalAnalysisEngine
+    
+    data = SyntheticMarketDataProvider().get_candles('EURUSD', 50000)
+    candles_df = pd.DataFrame({
+        'timestamp': data['timestamps'],
+        'open': data['open'],
+        'high': data['high'],
+        'low': data['low'],
+        'close': data['close'],
+        'volume': data['volume']
+    })
+    
+    engine = TechnicalAnalysisEngine(candles_df)
+    signals = engine.run_analysis(min_confidence_threshold=0.3)
+    
+    results = backtest(signals, candles_df, payouts={'EURUSD': 92}, asset='EURUSD')
+    print(f"عدد الإشارات: {len(signals)}")
+    print(results['summary'].to_string(index=False))
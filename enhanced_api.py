@@ -1,51 +1,216 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, session
 from flask_cors import CORS
 import sys
 import os
+import secrets
+import threading
 sys.path.append('/home/ubuntu/pocket_option_trading_platform/backend/src/services')
 
 from signal_stabilizer import EnhancedSignalProcessor
 from single_pair_analyzer import SinglePairAnalyzer
 from simplified_indicators import SimplifiedTechnicalIndicators
+from market_data_provider import create_market_data_provider
 import numpy as np
 from datetime import datetime, timedelta
 import json
 
 app = Flask(__name__)
-CORS(app)
+
+def load_secret_key() -> str:
+    """مفتاح توقيع الجلسات من SECRET_KEY، أو مفتاح عشوائي مؤقت مع تحذير"""
+    secret_key = os.environ.get('SECRET_KEY')
+    if not secret_key:
+        print("⚠️ SECRET_KEY غير محدد: تم توليد مفتاح عشوائي، وستفقد الجلسات عند إعادة التشغيل")
+        secret_key = secrets.token_hex(32)
+    return secret_key
+
+# الجلسة تحفظ الزوج المفضل لكل مستخدم فقط
+app.secret_key = load_secret_key()
+CORS(app, supports_credentials=True)
+
+# مصدر الشموع حسب الإعدادات (MARKET_DATA_PROVIDER)
+market_data = create_market_data_provider()
 
 # إنشاء معالجات للأزواج المختلفة
 processors = {
-    'EURUSD': EnhancedSignalProcessor('EURUSD'),
-    'GBPUSD': EnhancedSignalProcessor('GBPUSD'),
-    'USDJPY': EnhancedSignalProcessor('USDJPY')
+    'EURUSD': EnhancedSignalProcessor('EURUSD', market_data),
+    'GBPUSD': EnhancedSignalProcessor('GBPUSD', market_data),
+    'USDJPY': EnhancedSignalProcessor('USDJPY', market_data)
 }
 
-current_pair = 'EURUSD'
-current_processor = processors[current_pair]
+DEFAULT_PAIR = 'EURUSD'
+
+# قفل لكل زوج: معالجات الأزواج ليست آمنة للخيوط، لكن طلبات الأزواج المختلفة تعمل بالتوازي
+pair_locks = {pair: threading.Lock() for pair in processors}
+
+# منطق المسارات مشترك بين Flask ونسخة ASGI (asgi_api.py)
+
+def resolve_preferred_pair(pair) -> str:
+    """الزوج المفضل المحفوظ في الجلسة أو الزوج الافتراضي"""
+    return pair if pair in processors else DEFAULT_PAIR
+
+def build_comprehensive_analysis(pair: str) -> dict:
+    """التحليل الشامل للزوج"""
+    data = processors[pair].analyzer.get_recent_data(100)
+    
+    # معالجة البيانات
+    with pair_locks[pair]:
+        return processors[pair].process_market_data(data['high'], data['low'], data['close'], data['volume'])
+
+def get_latest_candle_key(pair: str) -> str:
+    """
+    مفتاح آخر شمعة للزوج
+    
+    عند عدم وجود بيانات محفوظة يتم استخدام بيانات العينة، وتعتبر كل دقيقة شمعة جديدة
+    """
+    latest = processors[pair].analyzer.get_latest_candle_time()
+    if latest is None:
+        return datetime.now().strftime('%Y-%m-%d %H:%M')
+    return str(latest)
+
+def signal_fingerprint(result: dict) -> tuple:
+    """بصمة الإشارة لمعرفة ما إذا تغيرت النتيجة"""
+    if 'error' in result:
+        return ('error', result['error'])
+    
+    signal = result.get('signal', {})
+    return (
+        signal.get('signal_type'),
+        round(float(signal.get('confidence', 0)), 1),
+        signal.get('reason')
+    )
+
+def build_indicators(pair: str) -> dict:
+    """المؤشرات الفنية المحسنة للزوج"""
+    data = processors[pair].analyzer.get_recent_data(50)
+    
+    # حساب المؤشرات
+    indicators_calculator = SimplifiedTechnicalIndicators(pair)
+    indicators = indicators_calculator.get_all_indicators(data['high'], data['low'], data['close'], data['volume'])
+    
+    return {
+        'pair': pair,
+        'timestamp': datetime.now().isoformat(),
+        'indicators': indicators,
+        'current_price': data['close'][-1]
+    }
+
+def build_stability_report(pair: str) -> dict:
+    """تقرير الاستقرار للزوج"""
+    processor = processors[pair]
+    with pair_locks[pair]:
+        stability_report = processor.stabilizer.get_stability_report()
+        system_status = processor.get_system_status()
+    
+    return {
+        'pair': pair,
+        'stability_report': stability_report,
+        'system_status': system_status,
+        'timestamp': datetime.now().isoformat()
+    }
+
+def build_signals_history(pair: str) -> dict:
+    """تاريخ الإشارات للزوج"""
+    # محاكاة تاريخ الإشارات
+    signals_history = []
+    
+    for i in range(10):
+        timestamp = datetime.now() - timedelta(hours=i)
+        signal_type = np.random.choice(['buy', 'sell', 'neutral'], p=[0.3, 0.3, 0.4])
+        confidence = np.random.uniform(40, 95) if signal_type != 'neutral' else 0
+        
+        signals_history.append({
+            'timestamp': timestamp.isoformat(),
+            'signal_type': signal_type,
+            'confidence': confidence,
+            'pair': pair,
+            'result': np.random.choice(['pending', 'success', 'failed'], p=[0.2, 0.5, 0.3])
+        })
+    
+    return {
+        'pair': pair,
+        'signals': signals_history,
+        'total_signals': len(signals_history)
+    }
+
+def build_performance_metrics(pair: str) -> dict:
+    """مقاييس الأداء للزوج"""
+    # محاكاة مقاييس الأداء
+    return {
+        'pair': pair,
+        'period': '30_days',
+        'total_signals': np.random.randint(50, 150),
+        'successful_signals': np.random.randint(30, 100),
+        'success_rate': np.random.uniform(60, 85),
+        'average_confidence': np.random.uniform(70, 90),
+        'total_profit': np.random.uniform(-5, 25),
+        'max_drawdown': np.random.uniform(2, 8),
+        'sharpe_ratio': np.random.uniform(0.8, 2.5),
+        'signals_per_day': np.random.uniform(1.5, 5.0),
+        'timestamp': datetime.now().isoformat()
+    }
+
+def apply_config_update(pair: str, data: dict) -> dict:
+    """تحديث إعدادات معالج الزوج"""
+    processor = processors[pair]
+    
+    # تحديث إعدادات المعالج
+    with pair_locks[pair]:
+        if 'signal_confidence_threshold' in data:
+            processor.stabilizer.config.confirmation_threshold = data['signal_confidence_threshold'] / 100
+        
+        if 'max_signals_per_session' in data:
+            processor.max_signals_per_session = data['max_signals_per_session']
+        
+        if 'volatility_threshold' in data:
+            processor.stabilizer.config.noise_threshold = data['volatility_threshold']
+    
+    return {
+        'success': True,
+        'message': 'تم تحديث الإعدادات بنجاح',
+        'pair': pair,
+        'updated_config': data
+    }
+
+def build_health_status(pair: str) -> dict:
+    """حالة النظام"""
+    return {
+        'status': 'healthy',
+        'current_pair': pair,
+        'available_pairs': list(processors.keys()),
+        'timestamp': datetime.now().isoformat(),
+        'version': '2.0'
+    }
+
+def get_session_pair() -> str:
+    """الزوج المختار في جلسة المستخدم الحالي"""
+    return resolve_preferred_pair(session.get('pair'))
+
+def unsupported_pair(pair: str):
+    return jsonify({
+        'error': f'الزوج {pair} غير متاح',
+        'pair': pair
+    }), 400
 
 @app.route('/api/pairs', methods=['GET'])
 def get_available_pairs():
     """الحصول على الأزواج المتاحة"""
     return jsonify({
         'pairs': list(processors.keys()),
-        'current_pair': current_pair
+        'current_pair': get_session_pair()
     })
 
 @app.route('/api/pair/select', methods=['POST'])
 def select_pair():
-    """اختيار زوج للتحليل"""
-    global current_pair, current_processor
-    
+    """اختيار زوج للتحليل (تفضيل خاص بجلسة المستخدم)"""
     data = request.get_json()
     pair = data.get('pair', 'EURUSD')
     
     if pair in processors:
-        current_pair = pair
-        current_processor = processors[pair]
+        session['pair'] = pair
         return jsonify({
             'success': True,
-            'selected_pair': current_pair,
+            'selected_pair': pair,
             'message': f'تم اختيار الزوج {pair} بنجاح'
         })
     else:
@@ -54,184 +219,93 @@ def select_pair():
             'error': f'الزوج {pair} غير متاح'
         }), 400
 
-@app.route('/api/analysis/comprehensive', methods=['GET'])
-def get_comprehensive_analysis():
-    """الحصول على التحليل الشامل للزوج المختار"""
+# المسارات الخاصة بزوج محدد: /api/<pair>/...
+
+@app.route('/api/<pair>/analysis', methods=['GET'])
+def get_pair_analysis(pair):
+    """الحصول على التحليل الشامل للزوج"""
+    if pair not in processors:
+        return unsupported_pair(pair)
+    
     try:
-        # توليد بيانات عينة للاختبار
-        np.random.seed(int(datetime.now().timestamp()) % 1000)
-        n_points = 100
-        
-        # أسعار أساسية حسب الزوج
-        base_prices = {
-            "EURUSD": 1.0850,
-            "GBPUSD": 1.2650,
-            "USDJPY": 149.50
-        }
-        
-        base_price = base_prices.get(current_pair, 1.0850)
-        volatility = 0.0008 if current_pair == 'EURUSD' else 0.0012 if current_pair == 'GBPUSD' else 0.0006
-        
-        price_changes = np.random.normal(0, volatility, n_points)
-        closes = base_price + np.cumsum(price_changes)
-        
-        highs = closes + np.random.uniform(0, volatility * 0.5, n_points)
-        lows = closes - np.random.uniform(0, volatility * 0.5, n_points)
-        volumes = np.random.normal(1000, 200, n_points)
-        
-        # معالجة البيانات
-        result = current_processor.process_market_data(highs, lows, closes, volumes)
-        
-        return jsonify(result)
+        return jsonify(build_comprehensive_analysis(pair))
         
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'pair': current_pair
+            'pair': pair
         }), 500
 
-@app.route('/api/indicators', methods=['GET'])
-def get_indicators():
-    """الحصول على المؤشرات الفنية المحسنة"""
+@app.route('/api/<pair>/indicators', methods=['GET'])
+def get_pair_indicators(pair):
+    """الحصول على المؤشرات الفنية المحسنة للزوج"""
+    if pair not in processors:
+        return unsupported_pair(pair)
+    
     try:
-        # توليد بيانات عينة
-        np.random.seed(int(datetime.now().timestamp()) % 1000)
-        n_points = 50
-        
-        base_prices = {
-            "EURUSD": 1.0850,
-            "GBPUSD": 1.2650,
-            "USDJPY": 149.50
-        }
-        
-        base_price = base_prices.get(current_pair, 1.0850)
-        volatility = 0.0008 if current_pair == 'EURUSD' else 0.0012 if current_pair == 'GBPUSD' else 0.0006
-        
-        price_changes = np.random.normal(0, volatility, n_points)
-        closes = base_price + np.cumsum(price_changes)
-        
-        highs = closes + np.random.uniform(0, volatility * 0.5, n_points)
-        lows = closes - np.random.uniform(0, volatility * 0.5, n_points)
-        volumes = np.random.normal(1000, 200, n_points)
-        
-        # حساب المؤشرات
-        indicators_calculator = SimplifiedTechnicalIndicators(current_pair)
-        indicators = indicators_calculator.get_all_indicators(highs, lows, closes, volumes)
-        
-        return jsonify({
-            'pair': current_pair,
-            'timestamp': datetime.now().isoformat(),
-            'indicators': indicators,
-            'current_price': closes[-1]
-        })
+        return jsonify(build_indicators(pair))
         
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'pair': current_pair
+            'pair': pair
         }), 500
 
-@app.route('/api/stability/report', methods=['GET'])
-def get_stability_report():
-    """الحصول على تقرير الاستقرار"""
+@app.route('/api/<pair>/stability/report', methods=['GET'])
+def get_pair_stability_report(pair):
+    """الحصول على تقرير الاستقرار للزوج"""
+    if pair not in processors:
+        return unsupported_pair(pair)
+    
     try:
-        stability_report = current_processor.stabilizer.get_stability_report()
-        system_status = current_processor.get_system_status()
-        
-        return jsonify({
-            'pair': current_pair,
-            'stability_report': stability_report,
-            'system_status': system_status,
-            'timestamp': datetime.now().isoformat()
-        })
+        return jsonify(build_stability_report(pair))
         
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'pair': current_pair
+            'pair': pair
         }), 500
 
-@app.route('/api/signals/history', methods=['GET'])
-def get_signals_history():
-    """الحصول على تاريخ الإشارات"""
+@app.route('/api/<pair>/signals/history', methods=['GET'])
+def get_pair_signals_history(pair):
+    """الحصول على تاريخ الإشارات للزوج"""
+    if pair not in processors:
+        return unsupported_pair(pair)
+    
     try:
-        # محاكاة تاريخ الإشارات
-        signals_history = []
-        
-        for i in range(10):
-            timestamp = datetime.now() - timedelta(hours=i)
-            signal_type = np.random.choice(['buy', 'sell', 'neutral'], p=[0.3, 0.3, 0.4])
-            confidence = np.random.uniform(40, 95) if signal_type != 'neutral' else 0
-            
-            signals_history.append({
-                'timestamp': timestamp.isoformat(),
-                'signal_type': signal_type,
-                'confidence': confidence,
-                'pair': current_pair,
-                'result': np.random.choice(['pending', 'success', 'failed'], p=[0.2, 0.5, 0.3])
-            })
-        
-        return jsonify({
-            'pair': current_pair,
-            'signals': signals_history,
-            'total_signals': len(signals_history)
-        })
+        return jsonify(build_signals_history(pair))
         
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'pair': current_pair
+            'pair': pair
         }), 500
 
-@app.route('/api/performance', methods=['GET'])
-def get_performance_metrics():
-    """الحصول على مقاييس الأداء"""
+@app.route('/api/<pair>/performance', methods=['GET'])
+def get_pair_performance_metrics(pair):
+    """الحصول على مقاييس الأداء للزوج"""
+    if pair not in processors:
+        return unsupported_pair(pair)
+    
     try:
-        # محاكاة مقاييس الأداء
-        performance = {
-            'pair': current_pair,
-            'period': '30_days',
-            'total_signals': np.random.randint(50, 150),
-            'successful_signals': np.random.randint(30, 100),
-            'success_rate': np.random.uniform(60, 85),
-            'average_confidence': np.random.uniform(70, 90),
-            'total_profit': np.random.uniform(-5, 25),
-            'max_drawdown': np.random.uniform(2, 8),
-            'sharpe_ratio': np.random.uniform(0.8, 2.5),
-            'signals_per_day': np.random.uniform(1.5, 5.0),
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        return jsonify(performance)
+        return jsonify(build_performance_metrics(pair))
         
     except Exception as e:
         return jsonify({
             'error': str(e),
-            'pair': current_pair
+            'pair': pair
         }), 500
 
-@app.route('/api/config/update', methods=['POST'])
-def update_configuration():
-    """تحديث إعدادات النظام"""
+@app.route('/api/<pair>/config/update', methods=['POST'])
+def update_pair_configuration(pair):
+    """تحديث إعدادات معالج الزوج"""
+    if pair not in processors:
+        return unsupported_pair(pair)
+    
     try:
         data = request.get_json()
         
-        # تحديث إعدادات المعالج
-        if 'signal_confidence_threshold' in data:
-            current_processor.stabilizer.config.confirmation_threshold = data['signal_confidence_threshold'] / 100
-        
-        if 'max_signals_per_session' in data:
-            current_processor.max_signals_per_session = data['max_signals_per_session']
-        
-        if 'volatility_threshold' in data:
-            current_processor.stabilizer.config.noise_threshold = data['volatility_threshold']
-        
-        return jsonify({
-            'success': True,
-            'message': 'تم تحديث الإعدادات بنجاح',
-            'pair': current_pair,
-            'updated_config': data
-        })
+        return jsonify(apply_config_update(pair, data))
         
     except Exception as e:
         return jsonify({
@@ -239,22 +313,48 @@ def update_configuration():
             'error': str(e)
         }), 500
 
+# المسارات القديمة تستخدم الزوج المختار في الجلسة
+
+@app.route('/api/analysis/comprehensive', methods=['GET'])
+def get_comprehensive_analysis():
+    """الحصول على التحليل الشامل للزوج المختار"""
+    return get_pair_analysis(get_session_pair())
+
+@app.route('/api/indicators', methods=['GET'])
+def get_indicators():
+    """الحصول على المؤشرات الفنية المحسنة"""
+    return get_pair_indicators(get_session_pair())
+
+@app.route('/api/stability/report', methods=['GET'])
+def get_stability_report():
+    """الحصول على تقرير الاستقرار"""
+    return get_pair_stability_report(get_session_pair())
+
+@app.route('/api/signals/history', methods=['GET'])
+def get_signals_history():
+    """الحصول على تاريخ الإشارات"""
+    return get_pair_signals_history(get_session_pair())
+
+@app.route('/api/performance', methods=['GET'])
+def get_performance_metrics():
+    """الحصول على مقاييس الأداء"""
+    return get_pair_performance_metrics(get_session_pair())
+
+@app.route('/api/config/update', methods=['POST'])
+def update_configuration():
+    """تحديث إعدادات النظام"""
+    return update_pair_configuration(get_session_pair())
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """فحص صحة النظام"""
-    return jsonify({
-        'status': 'healthy',
-        'current_pair': current_pair,
-        'available_pairs': list(processors.keys()),
-        'timestamp': datetime.now().isoformat(),
-        'version': '2.0'
-    })
+    return jsonify(build_health_status(get_session_pair()))
 
 if __name__ == '__main__':
     print("🚀 بدء تشغيل خادم النظام المحسن...")
-    print(f"📊 الزوج الافتراضي: {current_pair}")
+    print(f"📊 الزوج الافتراضي: {DEFAULT_PAIR}")
     print(f"🔧 الأزواج المتاحة: {list(processors.keys())}")
     print("🌐 الخادم متاح على: http://0.0.0.0:5000")
     
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
 
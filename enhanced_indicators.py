@@ -1,10 +1,6 @@
 import numpy as np
-import pandas as pd
 from typing import Dict, List, Tuple, Optional
-import ta
-from scipy import signal
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import IsolationForest
+import indicator_kernels as kernels
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -15,8 +11,9 @@ class EnhancedTechnicalIndicators:
     
     def __init__(self, pair_name: str = "EURUSD"):
         self.pair_name = pair_name
-        self.scaler = StandardScaler()
-        self.outlier_detector = IsolationForest(contamination=0.1, random_state=42)
+        # نماذج sklearn يتم إنشاؤها عند أول استخدام فقط (استيرادها مكلف)
+        self._scaler = None
+        self._outlier_detector = None
         
         # معاملات التحسين الخاصة بكل زوج
         self.pair_configs = {
@@ -54,52 +51,33 @@ class EnhancedTechnicalIndicators:
         
         self.config = self.pair_configs.get(pair_name, self.pair_configs["EURUSD"])
     
+    @property
+    def scaler(self):
+        if self._scaler is None:
+            from sklearn.preprocessing import StandardScaler
+            self._scaler = StandardScaler()
+        return self._scaler
+    
+    @property
+    def outlier_detector(self):
+        if self._outlier_detector is None:
+            from sklearn.ensemble import IsolationForest
+            self._outlier_detector = IsolationForest(contamination=0.1, random_state=42)
+        return self._outlier_detector
+    
     def adaptive_smooth(self, data: np.ndarray, volatility: np.ndarray, 
                        base_period: int = 3) -> np.ndarray:
         """
         تمهيد متكيف بناءً على التقلبات
         """
-        smoothed = np.zeros_like(data)
-        
-        for i in range(len(data)):
-            if i < base_period:
-                smoothed[i] = data[i]
-                continue
-            
-            # تحديد فترة التمهيد بناءً على التقلب
-            vol_factor = volatility[i] / np.mean(volatility[max(0, i-20):i+1])
-            adaptive_period = max(2, min(10, int(base_period * vol_factor)))
-            
-            start_idx = max(0, i - adaptive_period + 1)
-            smoothed[i] = np.mean(data[start_idx:i+1])
-        
-        return smoothed
+        return kernels.adaptive_smooth(data, volatility, base_period)
     
     def kalman_filter(self, data: np.ndarray, process_variance: float = 1e-5,
                      measurement_variance: float = 1e-1) -> np.ndarray:
         """
-        مرشح كالمان للتمهيد المتقدم
+        مرشح كالمان للتمهيد المتقدم (يبدأ من أول قيمة صالحة بعد فترة الإحماء)
         """
-        n = len(data)
-        filtered = np.zeros(n)
-        
-        # حالة أولية
-        x = data[0]  # التقدير الأولي
-        P = 1.0      # تباين الخطأ الأولي
-        
-        for i in range(n):
-            # التنبؤ
-            x_pred = x
-            P_pred = P + process_variance
-            
-            # التحديث
-            K = P_pred / (P_pred + measurement_variance)
-            x = x_pred + K * (data[i] - x_pred)
-            P = (1 - K) * P_pred
-            
-            filtered[i] = x
-        
-        return filtered
+        return kernels.kalman_filter(data, process_variance, measurement_variance)
     
     def enhanced_rsi(self, prices: np.ndarray, high: np.ndarray, 
                     low: np.ndarray, volume: np.ndarray = None) -> Dict:
@@ -109,16 +87,11 @@ class EnhancedTechnicalIndicators:
         period = self.config["rsi_period"]
         smooth_period = self.config["rsi_smooth"]
         
-        # تحويل إلى pandas Series
-        prices_series = pd.Series(prices)
-        
         # حساب RSI التقليدي
-        rsi_traditional = ta.momentum.RSIIndicator(prices_series, window=period).rsi().values
+        rsi_traditional = kernels.rsi(prices, period)
         
         # حساب التقلبات
-        high_series = pd.Series(high)
-        low_series = pd.Series(low)
-        volatility = ta.volatility.AverageTrueRange(high_series, low_series, prices_series, window=14).average_true_range().values
+        volatility = kernels.atr(high, low, prices, 14)
         
         # تطبيق التمهيد المتكيف
         rsi_smoothed = self.adaptive_smooth(rsi_traditional, volatility, smooth_period)
@@ -167,8 +140,8 @@ class EnhancedTechnicalIndicators:
         signal_period = self.config["macd_signal"]
         
         # حساب MACD التقليدي
-        macd_line, macd_signal, macd_histogram = talib.MACD(
-            prices, fastperiod=fast_period, slowperiod=slow_period, signalperiod=signal_period
+        macd_line, macd_signal, macd_histogram = kernels.macd(
+            prices, fast_period, slow_period, signal_period
         )
         
         # تطبيق مرشح كالمان على خطوط MACD
@@ -225,11 +198,11 @@ class EnhancedTechnicalIndicators:
         مؤشر Stochastic محسن مع نطاقات ديناميكية
         """
         # حساب Stochastic التقليدي
-        slowk, slowd = talib.STOCH(high, low, close, 
-                                  fastk_period=14, slowk_period=3, slowd_period=3)
+        slowk, slowd = kernels.stochastic(high, low, close,
+                                          k_period=14, d_period=3, smooth_k=3)
         
         # تطبيق التمهيد المتكيف
-        volatility = talib.ATR(high, low, close, timeperiod=14)
+        volatility = kernels.atr(high, low, close, 14)
         stoch_k_smooth = self.adaptive_smooth(slowk, volatility, 3)
         stoch_d_smooth = self.adaptive_smooth(slowd, volatility, 3)
         
@@ -271,7 +244,7 @@ class EnhancedTechnicalIndicators:
         مؤشر Williams %R محسن
         """
         # حساب Williams %R التقليدي
-        willr = talib.WILLR(high, low, close, timeperiod=14)
+        willr = kernels.williams_r(high, low, close, 14)
         
         # تطبيق مرشح كالمان
         willr_filtered = self.kalman_filter(willr)
@@ -314,7 +287,7 @@ class EnhancedTechnicalIndicators:
         مؤشر CCI محسن مع تطبيع متكيف
         """
         # حساب CCI التقليدي
-        cci = talib.CCI(high, low, close, timeperiod=20)
+        cci = kernels.cci(high, low, close, 20)
         
         # تطبيق مرشح كالمان
         cci_filtered = self.kalman_filter(cci)
@@ -357,12 +330,10 @@ class EnhancedTechnicalIndicators:
         مؤشر ADX محسن لقياس قوة الاتجاه
         """
         # حساب ADX و DI
-        adx = talib.ADX(high, low, close, timeperiod=14)
-        plus_di = talib.PLUS_DI(high, low, close, timeperiod=14)
-        minus_di = talib.MINUS_DI(high, low, close, timeperiod=14)
+        adx, plus_di, minus_di = kernels.adx(high, low, close, 14)
         
         # تطبيق التمهيد
-        volatility = talib.ATR(high, low, close, timeperiod=14)
+        volatility = kernels.atr(high, low, close, 14)
         adx_smooth = self.adaptive_smooth(adx, volatility, 3)
         plus_di_smooth = self.adaptive_smooth(plus_di, volatility, 3)
         minus_di_smooth = self.adaptive_smooth(minus_di, volatility, 3)
@@ -409,9 +380,7 @@ class EnhancedTechnicalIndicators:
         std_dev = self.config["bb_std"]
         
         # حساب نطاقات بولينجر التقليدية
-        bb_upper, bb_middle, bb_lower = talib.BBANDS(
-            prices, timeperiod=period, nbdevup=std_dev, nbdevdn=std_dev
-        )
+        bb_upper, bb_middle, bb_lower = kernels.bollinger_bands(prices, period, std_dev)
         
         # حساب التقلبات
         returns = np.diff(prices) / prices[:-1]
@@ -421,8 +390,8 @@ class EnhancedTechnicalIndicators:
         adaptive_std = std_dev * (1 + volatility * 10)
         
         # إعادة حساب النطاقات مع الانحراف المتكيف
-        bb_upper_adaptive, bb_middle_adaptive, bb_lower_adaptive = talib.BBANDS(
-            prices, timeperiod=period, nbdevup=adaptive_std, nbdevdn=adaptive_std
+        bb_upper_adaptive, bb_middle_adaptive, bb_lower_adaptive = kernels.bollinger_bands(
+            prices, period, adaptive_std
         )
         
         current_price = prices[-1]
@@ -459,10 +428,10 @@ class EnhancedTechnicalIndicators:
         مؤشر Parabolic SAR محسن
         """
         # حساب Parabolic SAR التقليدي
-        sar = talib.SAR(high, low, acceleration=0.02, maximum=0.2)
+        sar = kernels.parabolic_sar(high, low, acceleration=0.02, maximum=0.2)
         
         # تطبيق مرشح للتقلبات المفاجئة
-        volatility = talib.ATR(high, low, (high + low) / 2, timeperiod=14)
+        volatility = kernels.atr(high, low, (high + low) / 2, 14)
         
         # تحديد الاتجاه
         current_price = (high[-1] + low[-1]) / 2
@@ -489,11 +458,12 @@ class EnhancedTechnicalIndicators:
         مؤشر Ichimoku محسن
         """
         # حساب خطوط Ichimoku
-        tenkan_sen = (talib.MAX(high, 9) + talib.MIN(low, 9)) / 2
-        kijun_sen = (talib.MAX(high, 26) + talib.MIN(low, 26)) / 2
+        ichimoku = kernels.ichimoku(high, low, tenkan=9, kijun=26)
+        tenkan_sen = ichimoku["tenkan_sen"]
+        kijun_sen = ichimoku["kijun_sen"]
         
         # تطبيق التمهيد
-        volatility = talib.ATR(high, low, close, timeperiod=14)
+        volatility = kernels.atr(high, low, close, 14)
         tenkan_smooth = self.adaptive_smooth(tenkan_sen, volatility, 2)
         kijun_smooth = self.adaptive_smooth(kijun_sen, volatility, 3)
         
@@ -526,7 +496,7 @@ class EnhancedTechnicalIndicators:
         مؤشر ATR محسن مع تطبيع ديناميكي
         """
         # حساب ATR التقليدي
-        atr = talib.ATR(high, low, close, timeperiod=14)
+        atr = kernels.atr(high, low, close, 14)
         
         # تطبيق متوسط متحرك متكيف
         atr_smooth = self.adaptive_smooth(atr, atr, 5)
@@ -562,7 +532,7 @@ class EnhancedTechnicalIndicators:
             volume = np.random.normal(1000, 200, len(close))
         
         # حساب OBV التقليدي
-        obv = talib.OBV(close, volume)
+        obv = kernels.obv(close, volume)
         
         # تطبيق التمهيد
         obv_smooth = self.adaptive_smooth(obv, np.abs(np.diff(close, prepend=close[0])), 5)
@@ -592,7 +562,7 @@ class EnhancedTechnicalIndicators:
             volume = np.random.normal(1000, 200, len(close))
         
         # حساب MFI التقليدي
-        mfi = talib.MFI(high, low, close, volume, timeperiod=14)
+        mfi = kernels.mfi(high, low, close, volume, 14)
         
         # تطبيق مرشح كالمان
         mfi_filtered = self.kalman_filter(mfi)
@@ -0,0 +1,494 @@
+"""
+نواة موحدة لحساب المؤشرات الفنية باستخدام NumPy فقط
+
+تستخدمها وحدات المؤشرات الثلاث (simplified_indicators و enhanced_indicators
+و technical_analysis) بدلاً من ta و talib و pandas_ta. جميع الدوال تستقبل
+مصفوفات (أو Series) وتعيد مصفوفات float بنفس الطول مع NaN في فترة الإحماء
+
+الحسابات المتكررة بطبيعتها (المتوسطات الأسية وتمهيد Wilder، Parabolic SAR،
+مرشح كالمان، التمهيد المتكيف) معزولة في دوال _loop صغيرة يتم ترجمتها عبر Numba
+عند توفره، وباقي الحسابات متجهية بالكامل
+
+يتم اختيار الواجهة الخلفية عند الاستيراد: INDICATOR_JIT=0 يفرض NumPy، والدوال
+المترجمة تحفظ في NUMBA_CACHE_DIR (افتراضياً .numba_cache بجانب هذا الملف) حتى
+لا تتكرر الترجمة في كل تشغيل. استيراد Numba نفسه مؤجل حتى أول استدعاء لدالة
+متكررة حتى لا يبطئ بدء تشغيل العمليات التي لا تحسب مؤشرات
+
+النتائج مقارنة مع ta و pandas في tests/test_indicator_kernels.py. تمهيد Wilder
+يبدأ بمتوسط بسيط لأول period قيمة، لذلك يختلف RSI و ADX عن ta (التي تبدأ ewm من
+أول قيمة) في فترة الإحماء ثم يتلاشى الفرق، ويختلف Parabolic SAR عن ta حول بعض
+نقاط الانعكاس. التطابق مع talib غير مختبر
+"""
+
+import functools
+import importlib.util
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+os.environ.setdefault('NUMBA_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.numba_cache'))
+
+if os.environ.get('INDICATOR_JIT', '1') != '0' and importlib.util.find_spec('numba') is not None:
+    JIT_BACKEND = 'numba'
+else:
+    JIT_BACKEND = 'numpy'
+
+
+def _jit(func):
+    """
+    ترجمة دالة متكررة عبر Numba إذا كان متاحاً (مع نفس سلوك القسمة في NumPy)
+    
+    الترجمة تتم عند أول استدعاء، وعند فشل استيراد Numba تستخدم نسخة Python
+    """
+    if JIT_BACKEND != 'numba':
+        return func
+    
+    compiled = None
+    
+    @functools.wraps(func)
+    def dispatch(*args):
+        nonlocal compiled
+        if compiled is None:
+            try:
+                from numba import njit
+                compiled = njit(cache=True, error_model='numpy')(func)
+            except ImportError:
+                compiled = func
+        return compiled(*args)
+    
+    return dispatch
+
+
+def _as_float(values) -> np.ndarray:
+    return np.asarray(values, dtype=float)
+
+
+def _first_valid(values: np.ndarray) -> int:
+    """مؤشر أول قيمة غير NaN (أو طول المصفوفة إذا لم توجد)"""
+    valid = np.flatnonzero(~np.isnan(values))
+    return int(valid[0]) if len(valid) else len(values)
+
+
+def _rolling(values, period: int, func) -> np.ndarray:
+    """تطبيق دالة تجميع على نوافذ متحركة بطول period (NaN قبل اكتمال أول نافذة)"""
+    values = _as_float(values)
+    out = np.full(len(values), np.nan)
+    if period < 1 or len(values) < period:
+        return out
+    
+    out[period - 1:] = func(sliding_window_view(values, period), axis=-1)
+    return out
+
+
+def sma(values, period: int) -> np.ndarray:
+    """المتوسط المتحرك البسيط"""
+    return _rolling(values, period, np.mean)
+
+
+def rolling_sum(values, period: int) -> np.ndarray:
+    return _rolling(values, period, np.sum)
+
+
+def rolling_max(values, period: int) -> np.ndarray:
+    return _rolling(values, period, np.max)
+
+
+def rolling_min(values, period: int) -> np.ndarray:
+    return _rolling(values, period, np.min)
+
+
+def rolling_std(values, period: int, ddof: int = 0) -> np.ndarray:
+    """الانحراف المعياري المتحرك (ddof=0 مثل talib، و ddof=1 مثل pandas)"""
+    return _rolling(values, period, lambda windows, axis: np.std(windows, axis=axis, ddof=ddof))
+
+
+@_jit
+def _ewm_loop(values: np.ndarray, alpha: float, adjust: bool, start: int) -> np.ndarray:
+    """
+    العودية الأساسية للمتوسطات الأسية ابتداءً من المؤشر start
+    
+    adjust=False: y[i] = alpha * x[i] + (1 - alpha) * y[i-1]
+    adjust=True: متوسط موزون بأوزان (1 - alpha)^k مثل pandas.ewm الافتراضي.
+    القيم NaN بعد البداية لا تغير المتوسط
+    """
+    n = len(values)
+    out = np.full(n, np.nan)
+    if start >= n:
+        return out
+    
+    decay = 1.0 - alpha
+    numerator = values[start]
+    denominator = 1.0
+    out[start] = numerator
+    
+    for i in range(start + 1, n):
+        x = values[i]
+        if x != x:
+            out[i] = out[i - 1]
+            continue
+        
+        if adjust:
+            numerator = x + decay * numerator
+            denominator = 1.0 + decay * denominator
+            out[i] = numerator / denominator
+        else:
+            numerator = alpha * x + decay * numerator
+            out[i] = numerator
+    
+    return out
+
+
+def ewm_mean(values, alpha: float, adjust: bool = False, sma_seed: int = 0, min_periods: int = 0) -> np.ndarray:
+    """
+    متوسط أسي عام يبدأ من أول قيمة صالحة
+    
+    sma_seed > 0: أول قيمة هي متوسط أول sma_seed قيمة (طريقة talib و Wilder)،
+    وإلا تبدأ العودية من أول قيمة مباشرة (طريقة pandas.ewm)
+    """
+    values = _as_float(values)
+    start = _first_valid(values)
+    
+    if sma_seed > 0:
+        if start + sma_seed > len(values):
+            return np.full(len(values), np.nan)
+        values = values.copy()
+        seed_index = start + sma_seed - 1
+        values[seed_index] = np.mean(values[start:seed_index + 1])
+        start = seed_index
+    
+    out = _ewm_loop(values, alpha, adjust, start)
+    if min_periods > 1:
+        out[:start + min_periods - 1] = np.nan
+    return out
+
+
+def ema(values, period: int, adjust: bool = False, sma_seed: bool = False) -> np.ndarray:
+    """
+    المتوسط المتحرك الأسي بمعامل 2 / (period + 1)
+    
+    adjust=True يطابق pandas.ewm(span=period).mean()، و sma_seed=True يبدأ بمتوسط بسيط (طريقة talib)
+    """
+    return ewm_mean(values, 2.0 / (period + 1), adjust=adjust, sma_seed=period if sma_seed else 0)
+
+
+def wilder_smooth(values, period: int) -> np.ndarray:
+    """تمهيد Wilder (معامل 1 / period) مبدوء بالمتوسط البسيط لأول period قيمة"""
+    return ewm_mean(values, 1.0 / period, sma_seed=period)
+
+
+def rsi(close, period: int = 14, method: str = "wilder") -> np.ndarray:
+    """
+    مؤشر القوة النسبية
+    
+    method='wilder': تمهيد Wilder مبدوء بمتوسط بسيط (يقترب من ta بعد الإحماء)،
+    method='sma': متوسط بسيط للمكاسب والخسائر
+    """
+    close = _as_float(close)
+    delta = np.diff(close, prepend=np.nan)
+    delta[0] = 0.0
+    
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    
+    if method == "sma":
+        avg_gain = sma(gain, period)
+        avg_loss = sma(loss, period)
+    else:
+        avg_gain = wilder_smooth(gain, period)
+        avg_loss = wilder_smooth(loss, period)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+
+
+def macd(close, fast: int = 12, slow: int = 26, signal: int = 9,
+         adjust: bool = False, sma_seed: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    MACD: (الخط، خط الإشارة، الهيستوجرام)
+    
+    خط الإشارة يبدأ من أول قيمة صالحة لخط MACD
+    """
+    macd_line = ema(close, fast, adjust, sma_seed) - ema(close, slow, adjust, sma_seed)
+    signal_line = ema(macd_line, signal, adjust, sma_seed)
+    return macd_line, signal_line, macd_line - signal_line
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """المدى الحقيقي (الشمعة الأولى: الأعلى - الأدنى)"""
+    high = _as_float(high)
+    low = _as_float(low)
+    prev_close = np.roll(_as_float(close), 1)
+    
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    if len(tr):
+        tr[0] = high[0] - low[0]
+    return tr
+
+
+def atr(high, low, close, period: int = 14) -> np.ndarray:
+    """متوسط المدى الحقيقي بتمهيد Wilder"""
+    return wilder_smooth(true_range(high, low, close), period)
+
+
+def stochastic(high, low, close, k_period: int = 14, d_period: int = 3,
+               smooth_k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Stochastic: (%K، %D)
+    
+    smooth_k > 1 يعطي Slow Stochastic (مثل talib.STOCH و pandas_ta.stoch)
+    """
+    close = _as_float(close)
+    lowest_low = rolling_min(low, k_period)
+    highest_high = rolling_max(high, k_period)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = 100.0 * (close - lowest_low) / (highest_high - lowest_low)
+    
+    if smooth_k > 1:
+        k = sma(k, smooth_k)
+    return k, sma(k, d_period)
+
+
+def williams_r(high, low, close, period: int = 14) -> np.ndarray:
+    """Williams %R (من -100 إلى 0)"""
+    highest_high = rolling_max(high, period)
+    lowest_low = rolling_min(low, period)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -100.0 * (highest_high - _as_float(close)) / (highest_high - lowest_low)
+
+
+def cci(high, low, close, period: int = 20) -> np.ndarray:
+    """مؤشر قناة السلع بمتوسط الانحراف المطلق"""
+    typical_price = (_as_float(high) + _as_float(low) + _as_float(close)) / 3.0
+    out = np.full(len(typical_price), np.nan)
+    if len(typical_price) < period:
+        return out
+    
+    windows = sliding_window_view(typical_price, period)
+    mean = windows.mean(axis=-1)
+    mean_deviation = np.abs(windows - mean[:, None]).mean(axis=-1)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[period - 1:] = (typical_price[period - 1:] - mean) / (0.015 * mean_deviation)
+    return out
+
+
+def directional_movement(high, low) -> Tuple[np.ndarray, np.ndarray]:
+    """الحركة الاتجاهية (+DM، -DM) حسب تعريف Wilder"""
+    high = _as_float(high)
+    low = _as_float(low)
+    
+    up_move = np.diff(high, prepend=np.nan)
+    down_move = -np.diff(low, prepend=np.nan)
+    
+    plus_dm = np.where((up_move > down_move) & (up_move > 0), up_move, 0.0)
+    minus_dm = np.where((down_move > up_move) & (down_move > 0), down_move, 0.0)
+    return plus_dm, minus_dm
+
+
+def adx(high, low, close, period: int = 14,
+        smoothing: str = "wilder") -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    ADX: (ADX، +DI، -DI)
+    
+    smoothing='wilder' تمهيد Wilder (يقترب من ta بعد الإحماء)، و smoothing='sma' لتمهيد بمتوسطات بسيطة
+    """
+    smooth = wilder_smooth if smoothing == "wilder" else sma
+    plus_dm, minus_dm = directional_movement(high, low)
+    
+    tr_smooth = smooth(true_range(high, low, close), period)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plus_di = 100.0 * smooth(plus_dm, period) / tr_smooth
+        minus_di = 100.0 * smooth(minus_dm, period) / tr_smooth
+        dx = 100.0 * np.abs(plus_di - minus_di) / (plus_di + minus_di)
+    
+    return smooth(dx, period), plus_di, minus_di
+
+
+def bollinger_bands(values, period: int = 20, std_dev: float = 2.0,
+                    ddof: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """نطاقات بولينجر: (العلوي، الأوسط، السفلي)"""
+    middle = sma(values, period)
+    deviation = rolling_std(values, period, ddof) * std_dev
+    return middle + deviation, middle, middle - deviation
+
+
+@_jit
+def _sar_loop(high: np.ndarray, low: np.ndarray, acceleration: float, maximum: float) -> np.ndarray:
+    n = len(high)
+    out = np.full(n, np.nan)
+    if n < 2:
+        return out
+    
+    # الاتجاه الأولي حسب الحركة الاتجاهية للشمعة الثانية
+    is_long = not (low[0] - low[1] > 0 and low[0] - low[1] > high[1] - high[0])
+    af = acceleration
+    if is_long:
+        extreme = high[1]
+        sar = low[0]
+    else:
+        extreme = low[1]
+        sar = high[0]
+    
+    for i in range(1, n):
+        # في الشمعة الأولى تعتبر الشمعة السابقة هي نفسها (كما في talib)
+        j = i - 1 if i > 1 else i
+        if is_long:
+            if low[i] <= sar:
+                # انعكاس إلى اتجاه هابط
+                is_long = False
+                sar = max(extreme, high[i], high[j])
+                out[i] = sar
+                af = acceleration
+                extreme = low[i]
+                sar = sar + af * (extreme - sar)
+                sar = max(sar, high[i], high[j])
+            else:
+                out[i] = sar
+                if high[i] > extreme:
+                    extreme = high[i]
+                    af = min(af + acceleration, maximum)
+                sar = sar + af * (extreme - sar)
+                sar = min(sar, low[i], low[j])
+        else:
+            if high[i] >= sar:
+                # انعكاس إلى اتجاه صاعد
+                is_long = True
+                sar = min(extreme, low[i], low[j])
+                out[i] = sar
+                af = acceleration
+                extreme = high[i]
+                sar = sar + af * (extreme - sar)
+                sar = min(sar, low[i], low[j])
+            else:
+                out[i] = sar
+                if low[i] < extreme:
+                    extreme = low[i]
+                    af = min(af + acceleration, maximum)
+                sar = sar + af * (extreme - sar)
+                sar = max(sar, high[i], high[j])
+    
+    return out
+
+
+def parabolic_sar(high, low, acceleration: float = 0.02, maximum: float = 0.2) -> np.ndarray:
+    """
+    Parabolic SAR على طريقة talib.SAR (أول قيمة NaN)
+    
+    الاختراق يفحص بعد تقييد SAR بالشمعتين السابقتين، بينما ta تفحصه قبل التقييد
+    فقد تعكس الاتجاه قبل هذه الدالة بشمعة
+    """
+    return _sar_loop(_as_float(high), _as_float(low), acceleration, maximum)
+
+
+def ichimoku(high, low, tenkan: int = 9, kijun: int = 26, senkou: int = 52) -> Dict[str, np.ndarray]:
+    """خطوط Ichimoku بدون إزاحة زمنية للسحابة"""
+    tenkan_sen = (rolling_max(high, tenkan) + rolling_min(low, tenkan)) / 2.0
+    kijun_sen = (rolling_max(high, kijun) + rolling_min(low, kijun)) / 2.0
+    
+    return {
+        'tenkan_sen': tenkan_sen,
+        'kijun_sen': kijun_sen,
+        'senkou_span_a': (tenkan_sen + kijun_sen) / 2.0,
+        'senkou_span_b': (rolling_max(high, senkou) + rolling_min(low, senkou)) / 2.0
+    }
+
+
+def obv(close, volume) -> np.ndarray:
+    """On-Balance Volume (يبدأ بحجم الشمعة الأولى مثل talib)"""
+    close = _as_float(close)
+    volume = _as_float(volume)
+    if len(close) == 0:
+        return np.empty(0)
+    
+    direction = np.sign(np.diff(close, prepend=close[0]))
+    signed_volume = direction * volume
+    signed_volume[0] = volume[0]
+    return np.cumsum(signed_volume)
+
+
+def mfi(high, low, close, volume, period: int = 14) -> np.ndarray:
+    """مؤشر تدفق الأموال"""
+    typical_price = (_as_float(high) + _as_float(low) + _as_float(close)) / 3.0
+    money_flow = typical_price * _as_float(volume)
+    
+    change = np.diff(typical_price, prepend=np.nan)
+    positive_flow = np.where(change > 0, money_flow, 0.0)
+    negative_flow = np.where(change < 0, money_flow, 0.0)
+    if len(change):
+        # الشمعة الأولى بدون تغير معروف، فتبدأ النتائج عند المؤشر period
+        positive_flow[0] = negative_flow[0] = np.nan
+    
+    positive_sum = rolling_sum(positive_flow, period)
+    negative_sum = rolling_sum(negative_flow, period)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100.0 * positive_sum / (positive_sum + negative_sum)
+
+
+@_jit
+def _kalman_loop(values: np.ndarray, process_variance: float, measurement_variance: float,
+                 start: int) -> np.ndarray:
+    n = len(values)
+    filtered = np.full(n, np.nan)
+    if start >= n:
+        return filtered
+    
+    x = values[start]  # التقدير الأولي
+    P = 1.0            # تباين الخطأ الأولي
+    
+    for i in range(start, n):
+        # التنبؤ
+        P_pred = P + process_variance
+        
+        # التحديث (القيم الناقصة تبقي التقدير كما هو)
+        if values[i] == values[i]:
+            K = P_pred / (P_pred + measurement_variance)
+            x = x + K * (values[i] - x)
+            P = (1 - K) * P_pred
+        else:
+            P = P_pred
+        
+        filtered[i] = x
+    
+    return filtered
+
+
+def kalman_filter(values, process_variance: float = 1e-5, measurement_variance: float = 1e-1) -> np.ndarray:
+    """مرشح كالمان أحادي البعد يبدأ من أول قيمة صالحة"""
+    values = _as_float(values)
+    return _kalman_loop(values, process_variance, measurement_variance, _first_valid(values))
+
+
+@_jit
+def _adaptive_smooth_loop(data: np.ndarray, volatility: np.ndarray, base_period: int) -> np.ndarray:
+    n = len(data)
+    smoothed = np.zeros(n)
+    
+    for i in range(n):
+        if i < base_period:
+            smoothed[i] = data[i]
+            continue
+        
+        # تحديد فترة التمهيد بناءً على التقلب (الفترة الأساسية أثناء إحماء التقلب)
+        vol_factor = 1.0
+        if volatility[i] == volatility[i]:
+            vol_factor = volatility[i] / np.nanmean(volatility[max(0, i - 20):i + 1])
+            if not np.isfinite(vol_factor):
+                vol_factor = 1.0
+        adaptive_period = max(2, min(10, int(base_period * vol_factor)))
+        
+        start_idx = max(0, i - adaptive_period + 1)
+        smoothed[i] = np.mean(data[start_idx:i + 1])
+    
+    return smoothed
+
+
+def adaptive_smooth(data, volatility, base_period: int = 3) -> np.ndarray:
+    """تمهيد بمتوسط متحرك تتغير فترته (2 إلى 10) حسب التقلب النسبي"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return _adaptive_smooth_loop(_as_float(data), _as_float(volatility), int(base_period))
@@ -2,7 +2,11 @@
 from fastapi import FastAPI, WebSocket
 from fastapi.responses import HTMLResponse
 
-app = FastAPI()
+import asgi_api
+
+# خدمة WebSocket ومسارات الإشارات (asgi_api) في عملية واحدة
+app = FastAPI(lifespan=asgi_api.lifespan)
+asgi_api.install(app)
 
 # صفحة ترحيبية عند زيارة الرابط الرئيسي
 @app.get("/", response_class=HTMLResponse)
@@ -0,0 +1,349 @@
+"""
+مزودو بيانات السوق (الشموع)
+
+جميع المزودين يعيدون نفس صيغة SinglePairAnalyzer.get_recent_data:
+{'timestamps', 'open', 'high', 'low', 'close', 'volume'} مرتبة تصاعدياً،
+أو None عند عدم توفر بيانات. يتم اختيار المزود عبر متغير البيئة
+MARKET_DATA_PROVIDER (sqlite / ticks / file / synthetic)
+"""
+
+import asyncio
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# مسار قاعدة بيانات التحليل لكل زوج (نفس مسار SinglePairAnalyzer)
+DEFAULT_DB_PATH_TEMPLATE = "/home/ubuntu/pocket_option_trading_platform/backend/data/{pair}_analysis.db"
+
+# أسعار أساسية وتقلبات كل زوج للبيانات الاصطناعية
+BASE_PRICES = {
+    "EURUSD": 1.0850,
+    "GBPUSD": 1.2650,
+    "USDJPY": 149.50
+}
+
+PAIR_VOLATILITY = {
+    "EURUSD": 0.0008,
+    "GBPUSD": 0.0012,
+    "USDJPY": 0.0006
+}
+
+# بث الأسعار اللحظية من pocket_option_ws_auto.py (المسار /ws على المنفذ 10000)
+DEFAULT_TICK_FEED_URL = "ws://localhost:10000/ws"
+
+TIMEFRAME_SECONDS = {
+    '1m': 60,
+    '5m': 300,
+    '15m': 900,
+    '1h': 3600
+}
+
+
+def _to_candle_dict(timestamps: List, opens, highs, lows, closes, volumes) -> Dict:
+    return {
+        'timestamps': timestamps,
+        'open': np.asarray(opens, dtype=float),
+        'high': np.asarray(highs, dtype=float),
+        'low': np.asarray(lows, dtype=float),
+        'close': np.asarray(closes, dtype=float),
+        'volume': np.asarray(volumes, dtype=float)
+    }
+
+
+class MarketDataProvider(ABC):
+    """
+    الواجهة الأساسية لمزودي بيانات الشموع
+    """
+    
+    @abstractmethod
+    def get_candles(self, pair: str, periods: int = 100, timeframe: str = "1m") -> Optional[Dict]:
+        """آخر periods شمعة للزوج مرتبة تصاعدياً"""
+        pass
+    
+    def get_latest_timestamp(self, pair: str, timeframe: str = "1m"):
+        """الطابع الزمني لآخر شمعة (None إذا لم توجد بيانات)"""
+        data = self.get_candles(pair, 1, timeframe)
+        if not data or not data['timestamps']:
+            return None
+        return data['timestamps'][-1]
+
+
+class SQLiteMarketDataProvider(MarketDataProvider):
+    """
+    الشموع المحفوظة في جدول price_data لقاعدة بيانات تحليل الزوج
+    """
+    
+    def __init__(self, db_path_template: str = DEFAULT_DB_PATH_TEMPLATE):
+        self.db_path_template = db_path_template
+    
+    def get_candles(self, pair: str, periods: int = 100, timeframe: str = "1m") -> Optional[Dict]:
+        conn = sqlite3.connect(self.db_path_template.format(pair=pair))
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT timestamp, open_price, high_price, low_price, close_price, volume
+                FROM price_data
+                WHERE timeframe = ?
+                ORDER BY timestamp DESC
+                LIMIT ?
+            ''', (timeframe, periods))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+        
+        if not rows:
+            return None
+        
+        rows.reverse()  # ترتيب تصاعدي
+        return _to_candle_dict(
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            [row[2] for row in rows],
+            [row[3] for row in rows],
+            [row[4] for row in rows],
+            [row[5] for row in rows]
+        )
+    
+    def get_latest_timestamp(self, pair: str, timeframe: str = "1m"):
+        conn = sqlite3.connect(self.db_path_template.format(pair=pair))
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT MAX(timestamp) FROM price_data WHERE timeframe = ?
+            ''', (timeframe,))
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        
+        return row[0] if row else None
+
+
+class TickAggregatorProvider(MarketDataProvider):
+    """
+    تجميع الأسعار اللحظية (ticks) في شموع داخل الذاكرة
+    
+    يتم تغذيته عبر add_tick، أو عبر subscribe للاشتراك في بث PriceStore من
+    pocket_option_ws_auto.py. الشمعة الحالية غير المكتملة تُضاف في النهاية
+    """
+    
+    def __init__(self, timeframe: str = "1m", max_candles: int = 1000):
+        self.timeframe = timeframe
+        self.interval = TIMEFRAME_SECONDS[timeframe]
+        self.max_candles = max_candles
+        self._candles: Dict[str, deque] = {}
+        self._current: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._feed_thread = None
+    
+    def subscribe(self, url: str = DEFAULT_TICK_FEED_URL, retry_delay: float = 5.0):
+        """
+        الاشتراك في بث الأسعار ({"asset", "price"}) في خيط خلفي
+        
+        يعيد الاتصال تلقائياً عند انقطاعه. الاستدعاء مرة ثانية لا يفتح اشتراكاً آخر
+        """
+        if self._feed_thread is not None:
+            return
+        
+        async def listen():
+            import websockets
+            
+            while True:
+                try:
+                    async with websockets.connect(url) as websocket:
+                        logger.info(f"متصل ببث الأسعار: {url}")
+                        async for message in websocket:
+                            data = json.loads(message)
+                            if 'asset' in data and 'price' in data:
+                                self.add_tick(data['asset'], float(data['price']))
+                except Exception as e:
+                    logger.warning(f"انقطع بث الأسعار ({url}): {e}، إعادة المحاولة خلال {retry_delay} ثانية")
+                    await asyncio.sleep(retry_delay)
+        
+        self._feed_thread = threading.Thread(target=asyncio.run, args=(listen(),), daemon=True)
+        self._feed_thread.start()
+    
+    def add_tick(self, pair: str, price: float, timestamp: Optional[datetime] = None, volume: float = 0.0):
+        """إضافة سعر لحظي للزوج"""
+        if timestamp is None:
+            timestamp = datetime.now()
+        
+        epoch = timestamp.timestamp()
+        bucket = datetime.fromtimestamp(epoch - epoch % self.interval)
+        
+        with self._lock:
+            current = self._current.get(pair)
+            
+            if current is None or bucket > current[0]:
+                if current is not None:
+                    self._candles.setdefault(pair, deque(maxlen=self.max_candles)).append(tuple(current))
+                # [وقت البداية، فتح، أعلى، أدنى، إغلاق، حجم]
+                self._current[pair] = [bucket, price, price, price, price, volume]
+            elif bucket == current[0]:
+                current[2] = max(current[2], price)
+                current[3] = min(current[3], price)
+                current[4] = price
+                current[5] += volume
+            # الأسعار المتأخرة عن الشمعة الحالية يتم تجاهلها
+    
+    def get_candles(self, pair: str, periods: int = 100, timeframe: str = "1m") -> Optional[Dict]:
+        if timeframe != self.timeframe:
+            return None
+        
+        with self._lock:
+            candles = list(self._candles.get(pair, ()))
+            if pair in self._current:
+                candles.append(tuple(self._current[pair]))
+        
+        if not candles:
+            return None
+        
+        candles = candles[-periods:]
+        columns = list(zip(*candles))
+        return _to_candle_dict(list(columns[0]), *columns[1:])
+
+
+class FileMarketDataProvider(MarketDataProvider):
+    """
+    الشموع من ملفات CSV أو Parquet
+    
+    يتم استخدام أحدث ملف يطابق {pair}_{timeframe}* داخل المجلد (نفس تسمية
+    PocketOptionDataCollector.save_candle_data)، مع أعمدة
+    timestamp, open, high, low, close, volume. يتم تخزين الملف المقروء في
+    الذاكرة ولا يُعاد تحميله إلا عند تغيره
+    """
+    
+    def __init__(self, data_dir: str, pattern: str = "{pair}_{timeframe}*"):
+        self.data_dir = data_dir
+        self.pattern = pattern
+        self._cache: Dict[str, tuple] = {}
+    
+    def _find_file(self, pair: str, timeframe: str) -> Optional[str]:
+        base = os.path.join(self.data_dir, self.pattern.format(pair=pair, timeframe=timeframe))
+        files = glob.glob(base + '.csv') + glob.glob(base + '.parquet')
+        if not files:
+            return None
+        return max(files, key=os.path.getmtime)
+    
+    def _load(self, path: str) -> Dict:
+        import pandas as pd
+        
+        if path.endswith('.parquet'):
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path, parse_dates=['timestamp'])
+        
+        df = df.sort_values('timestamp')
+        volumes = df['volume'] if 'volume' in df else np.zeros(len(df))
+        return _to_candle_dict(
+            [ts.to_pydatetime() for ts in df['timestamp']],
+            df['open'], df['high'], df['low'], df['close'], volumes
+        )
+    
+    def get_candles(self, pair: str, periods: int = 100, timeframe: str = "1m") -> Optional[Dict]:
+        path = self._find_file(pair, timeframe)
+        if path is None:
+            return None
+        
+        mtime = os.path.getmtime(path)
+        cached = self._cache.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, self._load(path))
+            self._cache[path] = cached
+        
+        data = cached[1]
+        return {
+            key: value[-periods:]
+            for key, value in data.items()
+        }
+
+
+class SyntheticMarketDataProvider(MarketDataProvider):
+    """
+    بيانات اصطناعية حتمية للاختبارات وقياس الأداء
+    
+    نفس البذرة تعطي نفس الأسعار دائماً، ويتم توليد كل سلسلة مرة واحدة فقط
+    """
+    
+    def __init__(self, seed: int = 42, end_time: Optional[datetime] = None):
+        self.seed = seed
+        self.end_time = end_time
+        self._cache: Dict[tuple, Dict] = {}
+    
+    def _generate(self, pair: str, periods: int, volatility: float) -> Dict:
+        rng = np.random.RandomState(self.seed)
+        base_price = BASE_PRICES.get(pair, 1.0850)
+        
+        # توليد تغييرات الأسعار
+        price_changes = rng.normal(0, volatility, periods)
+        closes = base_price + np.cumsum(price_changes)
+        
+        # توليد أسعار الفتح والإغلاق والأعلى والأدنى
+        opens = np.roll(closes, 1)
+        opens[0] = base_price
+        
+        highs = closes + rng.uniform(0, volatility * 0.5, periods)
+        lows = closes - rng.uniform(0, volatility * 0.5, periods)
+        
+        # التأكد من أن الأعلى أعلى من الإغلاق والأدنى أقل
+        highs = np.maximum(highs, closes)
+        lows = np.minimum(lows, closes)
+        
+        volumes = rng.normal(1000, 200, periods)
+        
+        return {'open': opens, 'high': highs, 'low': lows, 'close': closes, 'volume': volumes}
+    
+    def get_candles(self, pair: str, periods: int = 100, timeframe: str = "1m",
+                    volatility: Optional[float] = None) -> Optional[Dict]:
+        if volatility is None:
+            volatility = PAIR_VOLATILITY.get(pair, 0.0008)
+        
+        key = (pair, periods, volatility)
+        if key not in self._cache:
+            self._cache[key] = self._generate(pair, periods, volatility)
+        series = self._cache[key]
+        
+        # الطوابع الزمنية تنتهي عند آخر دقيقة مكتملة (أو end_time المحدد)
+        step = timedelta(seconds=TIMEFRAME_SECONDS.get(timeframe, 60))
+        end = self.end_time or datetime.now().replace(second=0, microsecond=0)
+        timestamps = [end - step * i for i in range(periods, 0, -1)]
+        
+        return _to_candle_dict(
+            timestamps,
+            series['open'].copy(), series['high'].copy(), series['low'].copy(),
+            series['close'].copy(), series['volume'].copy()
+        )
+
+
+def create_market_data_provider(name: Optional[str] = None) -> MarketDataProvider:
+    """
+    إنشاء مزود البيانات حسب الإعدادات
+    
+    يتم استخدام MARKET_DATA_PROVIDER عند عدم تحديد الاسم (الافتراضي sqlite)،
+    و MARKET_DATA_DIR لمجلد ملفات المزود file، و TICK_FEED_URL لبث الأسعار
+    الذي يشترك فيه المزود ticks
+    """
+    name = (name or os.environ.get('MARKET_DATA_PROVIDER', 'sqlite')).lower()
+    
+    if name == 'sqlite':
+        return SQLiteMarketDataProvider(os.environ.get('MARKET_DATA_DB_TEMPLATE', DEFAULT_DB_PATH_TEMPLATE))
+    if name == 'ticks':
+        provider = TickAggregatorProvider()
+        provider.subscribe(os.environ.get('TICK_FEED_URL', DEFAULT_TICK_FEED_URL))
+        return provider
+    if name == 'file':
+        return FileMarketDataProvider(os.environ.get('MARKET_DATA_DIR', 'data'))
+    if name == 'synthetic':
+        return SyntheticMarketDataProvider(int(os.environ.get('MARKET_DATA_SEED', '42')))
+    
+    raise ValueError(f"مزود بيانات غير معروف: {name}")
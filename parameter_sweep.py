@@ -0,0 +1,402 @@
+"""
+البحث عن أفضل إعدادات StabilityConfig و pair_configs على الشموع التاريخية
+
+لكل مجموعة إعدادات يتم توليد إشارة لكل شمعة بنفس قواعد تصويت
+SimplifiedTechnicalIndicators و EnhancedSignalProcessor (المؤشرات تحسب على
+السلسلة كاملة دفعة واحدة)، ثم تمريرها إلى SignalStabilizer.replay وقياس
+نتيجة كل إشارة كصفقة خيار ثنائي بعد expiry شمعة.
+
+- المرشحون يتم توزيعهم على مجموعة عمليات (ProcessPoolExecutor)، والمرشحون
+  الذين يشتركون في معاملات المؤشرات يُرسلون معاً لنفس العملية
+- كل عملية تحتفظ بذاكرة مؤقتة للمؤشرات مفتاحها (اسم المؤشر، المعاملات)، لذلك
+  لا يُعاد حساب مؤشر مشترك بين المرشحين
+- النتائج تحفظ في جدول CSV مرتب حسب العائد المتوقع لكل صفقة
+
+الاستخدام:
+    python parameter_sweep.py --pair EURUSD --periods 20000 --mode random --samples 200
+    python parameter_sweep.py --mode grid --grid my_grid.json --workers 8
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import fields
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import indicator_kernels as kernels
+from market_data_provider import create_market_data_provider
+from signal_stabilizer import SignalStabilizer, StabilityConfig
+from simplified_indicators import SimplifiedTechnicalIndicators
+
+# قيم البحث الافتراضية لإعدادات الاستقرار
+STABILITY_GRID = {
+    'noise_threshold': [0.05, 0.1, 0.2],
+    'signal_persistence_periods': [2, 3, 5],
+    'confirmation_threshold': [0.5, 0.6, 0.7],
+    'volatility_adjustment_factor': [0.3, 0.5],
+    'trend_consistency_window': [5, 10],
+    'outlier_detection_threshold': [1.5, 2.0, 2.5]
+}
+
+# قيم البحث الافتراضية لمعاملات المؤشرات (نفس مفاتيح pair_configs)
+PAIR_CONFIG_GRID = {
+    'rsi_period': [12, 14, 16],
+    'rsi_smooth': [2, 3, 4],
+    'macd_fast': [10, 12, 14],
+    'macd_slow': [24, 26, 28],
+    'macd_signal': [8, 9, 10],
+    'bb_period': [18, 20, 22],
+    'bb_std': [1.8, 2.0, 2.2]
+}
+
+STABILITY_KEYS = tuple(field.name for field in fields(StabilityConfig))
+PAIR_CONFIG_KEYS = tuple(PAIR_CONFIG_GRID)
+
+# نفس إعدادات EnhancedSignalProcessor
+MIN_CONFIRMATION_SIGNALS = 3
+# أكبر نافذة مستخدمة (sma_50) قبل بدء احتساب الصفقات
+WARMUP_BARS = 50
+
+DEFAULT_OUTPUT = 'sweep_results.csv'
+
+# بيانات كل عملية (يتم تعيينها مرة واحدة عبر _init_worker)
+_worker_state: Dict = {}
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """كل تراكيب القيم في الشبكة (بحث شبكي)"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def sample_grid(grid: Dict[str, List], samples: int, seed: int = 42) -> List[Dict]:
+    """
+    عينة عشوائية من تراكيب الشبكة بدون تكرار (بحث عشوائي)
+    
+    يتم اختيار قيمة عشوائية لكل معامل بدلاً من توليد الشبكة كاملة. القيم المكررة
+    في قائمة معامل تحتسب مرة واحدة (وإلا لن يصل عدد التراكيب المختلفة إلى total)
+    """
+    rng = random.Random(seed)
+    grid = {key: list(dict.fromkeys(values)) for key, values in grid.items()}
+    total = int(np.prod([len(values) for values in grid.values()]))
+    samples = min(samples, total)
+    
+    seen = set()
+    candidates = []
+    while len(candidates) < samples:
+        candidate = {key: rng.choice(values) for key, values in grid.items()}
+        key = tuple(candidate.values())
+        if key not in seen:
+            seen.add(key)
+            candidates.append(candidate)
+    
+    return candidates
+
+
+def _cached(name: str, params: Tuple, compute):
+    """مؤشر من ذاكرة العملية أو حسابه وتخزينه"""
+    cache = _worker_state.setdefault('cache', {})
+    key = (name,) + params
+    if key not in cache:
+        cache[key] = compute()
+    return cache[key]
+
+
+def _vote(buy: np.ndarray, sell: np.ndarray, buy_strength: np.ndarray,
+          sell_strength: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    اتجاه المؤشر لكل شمعة (1 شراء، -1 بيع، 0 محايد) وقوة الإشارة
+    
+    المقارنات مع NaN (فترة الإحماء) تعطي إشارة محايدة بقوة صفر
+    """
+    direction = np.where(buy, 1, np.where(sell, -1, 0)).astype(np.int8)
+    strength = np.where(buy, buy_strength, np.where(sell, sell_strength, 0.0))
+    return direction, np.minimum(100, strength)
+
+
+def indicator_votes(candles: Dict, pair_config: Dict) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    تصويت المؤشرات السبعة لكل شمعة بقواعد SimplifiedTechnicalIndicators
+    (ADX لا يصوت لأنه لا يعطي signal_type)
+    """
+    high, low, close = candles['high'], candles['low'], candles['close']
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        def rsi_vote():
+            rsi = kernels.rsi(close, pair_config['rsi_period'], method="sma")
+            smoothed = pd.Series(rsi).rolling(pair_config['rsi_smooth'], min_periods=1).mean()
+            recent = smoothed.rolling(30, min_periods=1)
+            mean, std = recent.mean().to_numpy(), recent.std(ddof=0).to_numpy()
+            smoothed = smoothed.to_numpy()
+            
+            overbought = np.minimum(80, mean + 1.5 * std)
+            oversold = np.maximum(20, mean - 1.5 * std)
+            return _vote(smoothed < oversold, smoothed > overbought,
+                         (oversold - smoothed) / oversold * 100,
+                         (smoothed - overbought) / (100 - overbought) * 100)
+        
+        def macd_vote():
+            line, signal, histogram = kernels.macd(
+                close, pair_config['macd_fast'], pair_config['macd_slow'], pair_config['macd_signal'],
+                adjust=True, sma_seed=False
+            )
+            strength = np.abs(histogram) * 1000
+            return _vote((line > signal) & (histogram > 0), (line < signal) & (histogram < 0), strength, strength)
+        
+        def stochastic_vote():
+            k, d = kernels.stochastic(high, low, close, 14, 3)
+            return _vote((k < 20) & (k < d), (k > 80) & (k > d), (20 - k) / 20 * 100, (k - 80) / 20 * 100)
+        
+        def williams_vote():
+            willr = kernels.williams_r(high, low, close, 14)
+            return _vote(willr < -80, willr > -20, (-80 - willr) / 20 * 100, (willr + 20) / 20 * 100)
+        
+        def cci_vote():
+            cci = kernels.cci(high, low, close, 20)
+            return _vote(cci < -100, cci > 100, (-100 - cci) / 100 * 100, (cci - 100) / 100 * 100)
+        
+        def bollinger_vote():
+            upper, _, lower = kernels.bollinger_bands(close, pair_config['bb_period'], pair_config['bb_std'], ddof=1)
+            position = (close - lower) / (upper - lower) * 100
+            return _vote(position < 20, position > 80, (20 - position) / 20 * 100, (position - 80) / 20 * 100)
+        
+        def sma_vote():
+            sma_20, sma_50 = kernels.sma(close, 20), kernels.sma(close, 50)
+            return _vote((close > sma_20) & (sma_20 > sma_50), (close < sma_20) & (sma_20 < sma_50),
+                         (close - sma_20) / sma_20 * 1000, (sma_20 - close) / sma_20 * 1000)
+        
+        return [
+            _cached('rsi', (pair_config['rsi_period'], pair_config['rsi_smooth']), rsi_vote),
+            _cached('macd', (pair_config['macd_fast'], pair_config['macd_slow'], pair_config['macd_signal']), macd_vote),
+            _cached('stochastic', (), stochastic_vote),
+            _cached('williams_r', (), williams_vote),
+            _cached('cci', (), cci_vote),
+            _cached('bollinger_bands', (pair_config['bb_period'], pair_config['bb_std']), bollinger_vote),
+            _cached('sma', (), sma_vote)
+        ]
+
+
+def market_context(candles: Dict, lookback: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    التقلب اليومي وثقة الاتجاه لكل شمعة كما في SinglePairAnalyzer
+    (analyze_volatility_patterns على آخر lookback شمعة و analyze_trend_strength)
+    """
+    close = candles['close']
+    
+    def compute():
+        returns = pd.Series(np.diff(close, prepend=np.nan) / np.roll(close, 1))
+        volatility = returns.rolling(lookback - 1, min_periods=2).std(ddof=0).to_numpy() * np.sqrt(1440)
+        
+        bullish = sum(
+            (close > kernels.sma(close, period)).astype(int)
+            for period in (10, 20, 50)
+        )
+        trend_confidence = np.maximum(bullish, 3 - bullish) / 3 * 100
+        return np.nan_to_num(volatility, nan=0.5), trend_confidence
+    
+    return _cached('market_context', (lookback,), compute)
+
+
+def primary_signals(candles: Dict, pair_config: Dict, lookback: int = 100) -> Dict[str, np.ndarray]:
+    """
+    الإشارة الأولية لكل شمعة بقاعدة التصويت في EnhancedSignalProcessor.process_market_data
+    """
+    key = tuple(pair_config[name] for name in PAIR_CONFIG_KEYS) + (lookback,)
+    
+    def compute():
+        votes = indicator_votes(candles, pair_config)
+        directions = np.stack([direction for direction, _ in votes])
+        indicator_count = len(votes)
+        
+        buy_votes = np.count_nonzero(directions == 1, axis=0)
+        sell_votes = np.count_nonzero(directions == -1, axis=0)
+        is_buy = (buy_votes > sell_votes) & (buy_votes >= MIN_CONFIRMATION_SIGNALS)
+        is_sell = (sell_votes > buy_votes) & (sell_votes >= MIN_CONFIRMATION_SIGNALS)
+        
+        volatility, trend_strength = market_context(candles, lookback)
+        
+        return {
+            'signal_type': np.where(is_buy, 'buy', np.where(is_sell, 'sell', 'neutral')),
+            'confidence': np.where(is_buy, buy_votes / indicator_count * 100,
+                                   np.where(is_sell, sell_votes / indicator_count * 100, 50.0)),
+            'signal_strength': sum(strength for _, strength in votes) / indicator_count,
+            'volatility': volatility,
+            'trend_strength': trend_strength
+        }
+    
+    return _cached('primary_signals', key, compute)
+
+
+def trade_outcomes(close: np.ndarray, signal_types: np.ndarray, expiry: int,
+                   payout: float, start: int = WARMUP_BARS) -> Dict:
+    """
+    نتيجة كل إشارة buy/sell كصفقة خيار ثنائي تغلق بعد expiry شمعة
+    
+    الربح payout عند الفوز و -1 عند الخسارة وصفر عند التعادل
+    """
+    n = len(close)
+    direction = np.where(signal_types == 'buy', 1, np.where(signal_types == 'sell', -1, 0))
+    direction[:start] = 0
+    direction[max(n - expiry, 0):] = 0
+    
+    entries = np.flatnonzero(direction)
+    moves = np.sign(close[entries + expiry] - close[entries]) * direction[entries]
+    profits = np.where(moves > 0, payout, np.where(moves < 0, -1.0, 0.0))
+    
+    equity = np.cumsum(profits)
+    drawdown = np.max(np.maximum.accumulate(np.append(0.0, equity))[1:] - equity) if len(equity) else 0.0
+    
+    trades = len(profits)
+    wins = int(np.count_nonzero(moves > 0))
+    losses = int(np.count_nonzero(moves < 0))
+    
+    return {
+        'trades': trades,
+        'wins': wins,
+        'losses': losses,
+        'win_rate': wins / trades * 100 if trades else 0.0,
+        'expectancy': float(np.mean(profits)) if trades else 0.0,
+        'total_profit': float(equity[-1]) if trades else 0.0,
+        'max_drawdown': float(drawdown)
+    }
+
+
+def evaluate_candidate(candidate: Dict) -> Dict:
+    """تقييم مجموعة إعدادات واحدة على شموع العملية الحالية"""
+    candles = _worker_state['candles']
+    settings = _worker_state['settings']
+    
+    pair_config = dict(_worker_state['base_pair_config'])
+    pair_config.update({key: value for key, value in candidate.items() if key in PAIR_CONFIG_KEYS})
+    
+    result = dict(candidate)
+    try:
+        signals = primary_signals(candles, pair_config, settings['lookback'])
+        
+        stabilizer = SignalStabilizer(settings['pair'])
+        stabilizer.config = StabilityConfig(**{
+            key: value for key, value in candidate.items() if key in STABILITY_KEYS
+        })
+        stabilized = stabilizer.replay(
+            signals['signal_type'], signals['confidence'], signals['volatility'],
+            signals['trend_strength'], signals['signal_strength']
+        )
+        
+        result.update(trade_outcomes(
+            candles['close'], stabilized['signal_type'].to_numpy(), settings['expiry'], settings['payout']
+        ))
+    except Exception as e:
+        result['error'] = str(e)
+    
+    return result
+
+
+def evaluate_group(candidates: List[Dict]) -> List[Dict]:
+    return [evaluate_candidate(candidate) for candidate in candidates]
+
+
+def _init_worker(candles: Dict, base_pair_config: Dict, settings: Dict):
+    _worker_state.clear()
+    _worker_state.update({
+        'candles': candles,
+        'base_pair_config': base_pair_config,
+        'settings': settings,
+        'cache': {}
+    })
+
+
+def group_by_indicators(candidates: List[Dict]) -> List[List[Dict]]:
+    """تجميع المرشحين الذين يشتركون في معاملات المؤشرات (لإعادة استخدام الذاكرة المؤقتة)"""
+    groups: Dict[tuple, List[Dict]] = {}
+    for candidate in candidates:
+        key = tuple(candidate.get(name) for name in PAIR_CONFIG_KEYS)
+        groups.setdefault(key, []).append(candidate)
+    return list(groups.values())
+
+
+def run_sweep(candles: Dict, candidates: List[Dict], pair: str = "EURUSD", expiry: int = 5,
+              payout: float = 0.8, lookback: int = 100, workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    تقييم كل المرشحين وإرجاع جدول النتائج مرتباً حسب العائد المتوقع
+    
+    workers=1 يشغل البحث في العملية الحالية بدون مجموعة عمليات
+    """
+    candles = {key: np.asarray(candles[key], dtype=float) for key in ('high', 'low', 'close')}
+    base_pair_config = SimplifiedTechnicalIndicators(pair).config
+    settings = {'pair': pair, 'expiry': expiry, 'payout': payout, 'lookback': lookback}
+    groups = group_by_indicators(candidates)
+    
+    if workers == 1:
+        _init_worker(candles, base_pair_config, settings)
+        results = [evaluate_group(group) for group in groups]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(candles, base_pair_config, settings)) as executor:
+            results = list(executor.map(evaluate_group, groups))
+    
+    table = pd.DataFrame([row for group in results for row in group])
+    if 'expectancy' in table:
+        table = table.sort_values(['expectancy', 'trades'], ascending=False, ignore_index=True)
+    return table
+
+
+def load_grid(path: Optional[str]) -> Dict[str, List]:
+    """الشبكة الافتراضية أو ملف JSON بنفس الصيغة {معامل: [قيم]}"""
+    grid = {**STABILITY_GRID, **PAIR_CONFIG_GRID}
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            custom = json.load(f)
+        
+        unknown = set(custom) - set(STABILITY_KEYS) - set(PAIR_CONFIG_KEYS)
+        if unknown:
+            raise ValueError(f"معاملات غير معروفة في الشبكة: {', '.join(sorted(unknown))}")
+        grid = custom
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description='البحث عن أفضل إعدادات الاستقرار والمؤشرات')
+    parser.add_argument('--pair', default='EURUSD')
+    parser.add_argument('--timeframe', default='1m')
+    parser.add_argument('--periods', type=int, default=10000, help='عدد الشموع التاريخية')
+    parser.add_argument('--provider', default=None, help='مزود البيانات (sqlite / file / synthetic)')
+    parser.add_argument('--mode', choices=['grid', 'random'], default='random')
+    parser.add_argument('--samples', type=int, default=200, help='عدد المرشحين في البحث العشوائي')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--grid', default=None, help='ملف JSON لشبكة البحث')
+    parser.add_argument('--expiry', type=int, default=5, help='مدة الصفقة بالشموع')
+    parser.add_argument('--payout', type=float, default=0.8, help='نسبة الربح عند الفوز')
+    parser.add_argument('--workers', type=int, default=None, help='عدد العمليات (الافتراضي عدد الأنوية)')
+    parser.add_argument('--top', type=int, default=10, help='عدد أفضل النتائج المعروضة')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='ملف CSV لجدول النتائج')
+    args = parser.parse_args()
+    
+    candles = create_market_data_provider(args.provider).get_candles(args.pair, args.periods, args.timeframe)
+    if candles is None or len(candles['close']) <= WARMUP_BARS + args.expiry:
+        print(f"❌ لا توجد بيانات كافية للزوج {args.pair} ({args.timeframe})")
+        sys.exit(1)
+    
+    grid = load_grid(args.grid)
+    if args.mode == 'grid':
+        candidates = expand_grid(grid)
+    else:
+        candidates = sample_grid(grid, args.samples, args.seed)
+    
+    print(f"🔍 تقييم {len(candidates)} مرشح على {len(candles['close'])} شمعة "
+          f"({args.workers or os.cpu_count()} عمليات)...")
+    table = run_sweep(candles, candidates, args.pair, args.expiry, args.payout, workers=args.workers)
+    
+    table.to_csv(args.output, index=False)
+    print(table.head(args.top).to_string(index=False))
+    print(f"\n💾 تم حفظ النتائج في {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,10 +7,6 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import random
 import math
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-import joblib
 import os
 
 class PocketOptionSimulator:
@@ -347,6 +343,12 @@ class PocketOptionSimulator:
     def train_ml_model(self, historical_data: pd.DataFrame):
         """تدريب نموذج التعلم الآلي"""
         try:
+            # استيراد sklearn و joblib عند التدريب فقط لتسريع بدء التشغيل
+            import joblib
+            from sklearn.ensemble import RandomForestRegressor
+            from sklearn.preprocessing import StandardScaler
+            from sklearn.model_selection import train_test_split
+            
             # إعداد الميزات
             features = []
             targets = []
@@ -411,6 +413,8 @@ class PocketOptionSimulator:
         """تحميل النماذج المدربة"""
         try:
             if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
+                import joblib
+                
                 self.model = joblib.load(self.model_path)
                 self.scaler = joblib.load(self.scaler_path)
                 self.logger.info("تم تحميل النماذج المدربة بنجاح")
@@ -0,0 +1,137 @@
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class PriceConsensusEngine:
+    """
+    محرك إجماع الأسعار عبر المصادر المتعددة
+    
+    يحسب سعراً مركباً مقاوماً للقيم الشاذة (وسيط موزون ثم متوسط موزون للقيم
+    المقبولة) حيث يعتمد وزن كل مصدر على حداثة سعره ودقته التاريخية، ويحدد
+    المصادر الشاذة ويعطي نطاق ثقة. يتم التحديث تدريجياً مع وصول كل سعر.
+    """
+    
+    def __init__(self, max_age_seconds: float = 300, freshness_half_life: float = 30,
+                 outlier_threshold: float = 3.0, min_relative_spread: float = 1e-5,
+                 accuracy_alpha: float = 0.1, accuracy_scale: float = 5e-4):
+        self.max_age_seconds = max_age_seconds
+        self.freshness_half_life = freshness_half_life
+        self.outlier_threshold = outlier_threshold
+        # الحد الأدنى للتشتت النسبي حتى لا تصبح جميع المصادر شاذة عند التطابق التام
+        self.min_relative_spread = min_relative_spread
+        self.accuracy_alpha = accuracy_alpha
+        self.accuracy_scale = accuracy_scale
+        
+        self.quotes: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        # متوسط متحرك للانحراف النسبي لكل مصدر عن الإجماع
+        self.source_errors: Dict[str, float] = {}
+        self.consensus: Dict[str, Dict] = {}
+    
+    def _freshness(self, age: float) -> float:
+        return 0.5 ** (max(0.0, age) / self.freshness_half_life)
+    
+    def source_accuracy(self, source: str) -> float:
+        """دقة المصدر بين 0 و1 بناءً على انحرافه التاريخي"""
+        error = self.source_errors.get(source)
+        if error is None:
+            return 1.0
+        return 1.0 / (1.0 + error / self.accuracy_scale)
+    
+    @staticmethod
+    def _weighted_median(values: List[float], weights: List[float]) -> float:
+        pairs = sorted(zip(values, weights))
+        half = sum(weights) / 2
+        cumulative = 0.0
+        for value, weight in pairs:
+            cumulative += weight
+            if cumulative >= half:
+                return value
+        return pairs[-1][0]
+    
+    def update(self, asset: str, source: str, price: float, ts: Optional[float] = None) -> Optional[Dict]:
+        """إضافة سعر جديد من مصدر وإعادة حساب الإجماع للأصل"""
+        if price is None or price <= 0 or not math.isfinite(price):
+            return self.consensus.get(asset)
+        
+        if ts is None:
+            ts = time.time()
+        
+        self.quotes.setdefault(asset, {})[source] = (price, ts)
+        result = self.compute(asset)
+        
+        # تحديث دقة المصدر فقط عند وجود مصادر كافية للمقارنة
+        if result is not None and result['sources_used'] >= 3:
+            deviation = abs(price - result['price']) / result['price']
+            previous = self.source_errors.get(source, deviation)
+            self.source_errors[source] = (
+                self.accuracy_alpha * deviation + (1 - self.accuracy_alpha) * previous
+            )
+        
+        return result
+    
+    def compute(self, asset: str, now: Optional[float] = None) -> Optional[Dict]:
+        """حساب السعر المركب ونطاق الثقة والمصادر الشاذة"""
+        if now is None:
+            now = time.time()
+        
+        quotes = {
+            source: (price, ts)
+            for source, (price, ts) in self.quotes.get(asset, {}).items()
+            if now - ts <= self.max_age_seconds
+        }
+        if not quotes:
+            self.consensus.pop(asset, None)
+            return None
+        
+        sources = list(quotes)
+        prices = [quotes[source][0] for source in sources]
+        weights = [
+            self._freshness(now - quotes[source][1]) * self.source_accuracy(source)
+            for source in sources
+        ]
+        
+        median = self._weighted_median(prices, weights)
+        deviations = [abs(price - median) for price in prices]
+        mad = self._weighted_median(deviations, weights) * 1.4826
+        spread = max(mad, median * self.min_relative_spread)
+        
+        outliers = [
+            source for source, deviation in zip(sources, deviations)
+            if deviation / spread > self.outlier_threshold
+        ]
+        
+        inliers = [
+            (price, weight) for source, price, weight in zip(sources, prices, weights)
+            if source not in outliers
+        ]
+        total_weight = sum(weight for _, weight in inliers)
+        composite = sum(price * weight for price, weight in inliers) / total_weight
+        
+        # نطاق الثقة: الانحراف المعياري الموزون مقسوماً على الحجم الفعال للعينة
+        variance = sum(weight * (price - composite) ** 2 for price, weight in inliers) / total_weight
+        effective_n = total_weight ** 2 / sum(weight ** 2 for _, weight in inliers)
+        half_width = max(math.sqrt(variance), spread) * 1.96 / math.sqrt(effective_n)
+        
+        confidence = min(1.0, len(inliers) / 3) * (1 - len(outliers) / len(sources))
+        confidence *= total_weight / len(inliers)
+        
+        result = {
+            'asset_name': asset,
+            'price': composite,
+            'median': median,
+            'lower': composite - half_width,
+            'upper': composite + half_width,
+            'confidence': round(confidence, 4),
+            'sources_used': len(inliers),
+            'outliers': outliers,
+            'weights': {source: round(weight, 4) for source, weight in zip(sources, weights)},
+            'timestamp': now
+        }
+        
+        self.consensus[asset] = result
+        return result
+    
+    def get_consensus(self, asset: str) -> Optional[Dict]:
+        """آخر إجماع محسوب للأصل"""
+        return self.consensus.get(asset)
@@ -0,0 +1,159 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional, Union
+
+# طول كل نافذة زمنية بالثواني
+WINDOW_SECONDS = {
+    'second': 1,
+    'minute': 60,
+    'hour': 3600,
+    'day': 86400,
+    'month': 30 * 86400
+}
+
+
+class TokenBucket:
+    """
+    دلو رموز (Token Bucket) غير متزامن مع طابور أولويات
+    
+    يتم ملء الدلو بشكل مستمر بمعدل limit / window، ولا يتجاوز عدد الرموز
+    سعة الانفجار (burst). جميع العمليات تتم داخل حلقة الأحداث دون أي await
+    بين القراءة والتعديل، لذلك لا يوجد سباق بين المهام المتزامنة.
+    الأولوية الأصغر تحصل على الرمز أولاً.
+    """
+    
+    def __init__(self, limit: int, window: str = 'minute', burst: Optional[float] = None):
+        if window not in WINDOW_SECONDS:
+            raise ValueError(f"نافذة زمنية غير معروفة: {window}")
+        
+        self.limit = limit
+        self.window = window
+        self.rate = limit / WINDOW_SECONDS[window]  # رموز في الثانية
+        self.capacity = float(burst if burst is not None else limit)
+        self.tokens = self.capacity
+        self.updated_at = time.time()
+        
+        self._waiters = []
+        self._counter = itertools.count()
+        self._timer = None
+        self._timer_loop = None
+    
+    def _refill(self):
+        """إضافة الرموز المتراكمة منذ آخر تحديث"""
+        now = time.time()
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+    
+    def estimated_wait(self) -> float:
+        """الوقت المتوقع (بالثواني) للحصول على رمز لطلب جديد"""
+        self._refill()
+        pending = sum(1 for _, _, fut in self._waiters if not fut.done())
+        deficit = pending + 1 - self.tokens
+        return max(0.0, deficit / self.rate)
+    
+    def _dispatch(self):
+        """توزيع الرموز المتاحة على المنتظرين حسب الأولوية"""
+        self._refill()
+        
+        while self._waiters and self.tokens >= 1:
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.tokens -= 1
+            fut.set_result(True)
+        
+        # إزالة المنتظرين الملغيين من رأس الطابور
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        
+        loop = asyncio.get_running_loop()
+        if self._timer_loop is not loop:
+            # مؤقت من حلقة أحداث سابقة (مثلاً استدعاء asyncio.run جديد)
+            self._timer = None
+        
+        if self._waiters and self._timer is None:
+            delay = (1 - self.tokens) / self.rate
+            self._timer = loop.call_later(delay, self._on_timer)
+            self._timer_loop = loop
+    
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+    
+    async def acquire(self, priority: int = 5, max_wait: Optional[float] = None) -> bool:
+        """
+        الحصول على رمز واحد
+        
+        يعيد False فوراً إذا كان الانتظار المتوقع أطول من max_wait
+        """
+        if max_wait is not None and self.estimated_wait() > max_wait:
+            return False
+        
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), fut))
+        self._dispatch()
+        
+        await fut
+        return True
+    
+    def get_state(self) -> Dict:
+        """حالة الدلو لحفظها بين عمليات إعادة التشغيل (للقراءة فقط، آمنة من أي خيط)"""
+        now = time.time()
+        tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated_at) * self.rate)
+        return {'tokens': tokens, 'updated_at': now}
+    
+    def load_state(self, tokens: float, updated_at: float):
+        """استعادة حالة محفوظة سابقاً"""
+        self.tokens = min(self.capacity, max(0.0, tokens))
+        self.updated_at = min(updated_at, time.time())
+        self._refill()
+
+
+class ProviderRateLimiter:
+    """
+    محدد معدل لمصدر واحد يجمع عدة نوافذ (ثانية/دقيقة/يوم/شهر)
+    
+    يجب توفر رمز في جميع النوافذ قبل إرسال الطلب. burst رقم يطبق على أقصر نافذة
+    فقط (النوافذ الأطول سعتها حدها الكامل)، أو قاموس {نافذة: سعة}
+    """
+    
+    def __init__(self, source: str, rate_limits: Dict[str, int],
+                 burst: Optional[Union[float, Dict[str, float]]] = None):
+        self.source = source
+        
+        if burst is not None and not isinstance(burst, dict):
+            shortest = min(rate_limits, key=lambda window: WINDOW_SECONDS[window])
+            burst = {shortest: burst}
+        burst = burst or {}
+        
+        # النوافذ الأطول أولاً حتى لا تُستهلك رموز الدقيقة عند نفاد حصة الشهر
+        self.buckets: List[TokenBucket] = [
+            TokenBucket(limit, window, burst[window] if window in burst and burst[window] < limit else None)
+            for window, limit in sorted(rate_limits.items(), key=lambda item: -WINDOW_SECONDS[item[0]])
+        ]
+    
+    def estimated_wait(self) -> float:
+        """الوقت المتوقع (بالثواني) حتى يتوفر رمز في جميع النوافذ"""
+        return max(bucket.estimated_wait() for bucket in self.buckets)
+    
+    async def acquire(self, priority: int = 5, max_wait: Optional[float] = None) -> bool:
+        """الحصول على رمز من جميع النوافذ"""
+        # الفحص المسبق يمنع استهلاك رمز من نافذة ثم الفشل في نافذة أخرى
+        if max_wait is not None and self.estimated_wait() > max_wait:
+            return False
+        
+        for bucket in self.buckets:
+            await bucket.acquire(priority)
+        return True
+    
+    def get_state(self) -> Dict[str, Dict]:
+        return {bucket.window: bucket.get_state() for bucket in self.buckets}
+    
+    def load_state(self, state: Dict[str, Dict]):
+        for bucket in self.buckets:
+            if bucket.window in state:
+                bucket.load_state(state[bucket.window]['tokens'], state[bucket.window]['updated_at'])
@@ -1,4 +1,5 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime, timedelta
@@ -20,6 +21,185 @@ class StabilityConfig:
     trend_consistency_window: int = 10
     outlier_detection_threshold: float = 2.0
 
+# عدد الإشارات المحفوظة في تاريخ كل زوج
+HISTORY_SIZE = 100
+
+# نافذة متوسط التقلب في calculate_volatility_adjustment
+VOLATILITY_WINDOW = 20
+
+TREND_MAPPING = {'buy': 'bullish', 'sell': 'bearish', 'neutral': 'neutral'}
+
+
+def _window_match_counts(codes: np.ndarray, window: int) -> np.ndarray:
+    """
+    عدد الإشارات المطابقة لنوع الإشارة الحالية في آخر window إشارة (بما فيها الحالية)
+    
+    القيمة صفر قبل اكتمال النافذة الأولى
+    """
+    counts = np.zeros(len(codes), dtype=np.int64)
+    if window < 1 or len(codes) < window:
+        return counts
+    
+    windows = sliding_window_view(codes, window)
+    counts[window - 1:] = np.count_nonzero(windows == windows[:, -1:], axis=1)
+    return counts
+
+
+def _replay_volatility_means(volatilities: np.ndarray, window: int) -> np.ndarray:
+    """
+    متوسط التقلبات في آخر window إشارة بعد كل إضافة، بنفس حساب
+    SignalHistoryBuffer.volatility_mean (np.mean على كل نافذة)
+    """
+    n = len(volatilities)
+    means = np.empty(n)
+    
+    # النوافذ الأولى أقصر من window
+    for end in range(1, min(window, n + 1)):
+        means[end - 1] = np.mean(volatilities[:end])
+    if n >= window:
+        means[window - 1:] = np.mean(sliding_window_view(volatilities, window), axis=1)
+    
+    return means
+
+@dataclass
+class StabilizedSignal:
+    """
+    نتيجة تحسين استقرار إشارة واحدة
+    """
+    signal_type: str
+    confidence: float
+    signal_strength: float
+    confirmation_score: float
+    is_outlier: bool
+    persistence: float
+    volatility_adjustment: float
+    trend_consistency: float
+    original_confidence: float
+    filtered_confidence: float
+    original_strength: float
+    filtered_strength: float
+    
+    @property
+    def noise_filtered(self) -> bool:
+        return abs(self.original_strength - self.filtered_strength) > 0.01
+    
+    def to_dict(self) -> Dict:
+        """الصيغة القديمة لنتيجة stabilize_signal"""
+        return {
+            'signal_type': self.signal_type,
+            'confidence': self.confidence,
+            'signal_strength': self.signal_strength,
+            'confirmation_score': self.confirmation_score,
+            'is_outlier': self.is_outlier,
+            'persistence': self.persistence,
+            'volatility_adjustment': self.volatility_adjustment,
+            'trend_consistency': self.trend_consistency,
+            'stability_metrics': {
+                'original_confidence': self.original_confidence,
+                'filtered_confidence': self.filtered_confidence,
+                'original_strength': self.original_strength,
+                'filtered_strength': self.filtered_strength,
+                'noise_filtered': self.noise_filtered
+            }
+        }
+
+class SignalHistoryBuffer:
+    """
+    مخزن دائري بحجم ثابت لتاريخ الإشارات (مصفوفات NumPy بدلاً من قوائم القواميس)
+    
+    كل قيمة تكتب في موضعين (i و i + capacity) حتى تكون آخر k قيمة دائماً شريحة
+    متصلة بدون نسخ. أنواع الإشارات تخزن كرموز صحيحة، ومتوسط التقلبات في آخر
+    VOLATILITY_WINDOW إشارة يحسب بـ np.mean على شريحة النافذة كما في الإصدار السابق
+    """
+    
+    __slots__ = (
+        'capacity', 'count', 'volatility_window', '_pos',
+        '_types', '_confidence', '_volatility', '_trend', '_timestamps',
+        '_type_codes', '_type_names'
+    )
+    
+    def __init__(self, capacity: int = HISTORY_SIZE, volatility_window: int = VOLATILITY_WINDOW):
+        self.capacity = capacity
+        self.count = 0
+        self.volatility_window = volatility_window
+        self._pos = 0
+        
+        self._types = np.zeros(2 * capacity, dtype=np.int8)
+        self._confidence = np.zeros(2 * capacity)
+        self._volatility = np.zeros(2 * capacity)
+        self._trend = np.zeros(2 * capacity)
+        self._timestamps = np.empty(2 * capacity, dtype=object)
+        
+        self._type_names = ['buy', 'sell', 'neutral']
+        self._type_codes = {name: code for code, name in enumerate(self._type_names)}
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def type_code(self, signal_type: str) -> int:
+        """رمز نوع الإشارة (-1 لنوع غير موجود في التاريخ)"""
+        return self._type_codes.get(signal_type, -1)
+    
+    def _encode(self, signal_type: str) -> int:
+        code = self._type_codes.get(signal_type)
+        if code is None:
+            code = len(self._type_names)
+            self._type_names.append(signal_type)
+            self._type_codes[signal_type] = code
+        return code
+    
+    def _last(self, values: np.ndarray, k: Optional[int]) -> np.ndarray:
+        k = self.count if k is None else min(k, self.count)
+        end = self._pos + self.capacity
+        return values[end - k:end]
+    
+    def append(self, signal_type: str, confidence: float, volatility: float,
+               trend_strength: float, timestamp: datetime):
+        """إضافة إشارة (تستبدل الأقدم عند امتلاء المخزن)"""
+        pos = self._pos
+        for index in (pos, pos + self.capacity):
+            self._types[index] = self._encode(signal_type)
+            self._confidence[index] = confidence
+            self._volatility[index] = volatility
+            self._trend[index] = trend_strength
+            self._timestamps[index] = timestamp
+        
+        self._pos = (pos + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+    
+    def types(self, k: Optional[int] = None) -> np.ndarray:
+        """رموز أنواع آخر k إشارة (من الأقدم إلى الأحدث)"""
+        return self._last(self._types, k)
+    
+    def confidences(self, k: Optional[int] = None) -> np.ndarray:
+        return self._last(self._confidence, k)
+    
+    def volatilities(self, k: Optional[int] = None) -> np.ndarray:
+        return self._last(self._volatility, k)
+    
+    def trend_strengths(self, k: Optional[int] = None) -> np.ndarray:
+        return self._last(self._trend, k)
+    
+    def volatility_mean(self) -> float:
+        """متوسط التقلب في آخر volatility_window إشارة"""
+        return float(np.mean(self.volatilities(self.volatility_window)))
+    
+    def to_records(self) -> List[Dict]:
+        """التاريخ بصيغة قائمة القواميس القديمة"""
+        return [
+            {
+                'timestamp': timestamp,
+                'signal_type': self._type_names[code],
+                'confidence': float(confidence),
+                'volatility': float(volatility),
+                'trend_strength': float(trend_strength)
+            }
+            for timestamp, code, confidence, volatility, trend_strength in zip(
+                self._last(self._timestamps, None), self.types(), self.confidences(),
+                self.volatilities(), self.trend_strengths()
+            )
+        ]
+
 class SignalStabilizer:
     """
     نظام تقليل التذبذب وتحسين استقرار الإشارات
@@ -28,15 +208,32 @@ class SignalStabilizer:
     def __init__(self, pair_name: str = "EURUSD"):
         self.pair_name = pair_name
         self.config = StabilityConfig()
-        self.signal_history = []
-        self.confidence_history = []
-        self.volatility_history = []
-        self.trend_history = []
+        self.history = SignalHistoryBuffer(HISTORY_SIZE)
+        # تقرير الاستقرار محفوظ حتى وصول الإشارة التالية
+        self._stability_report = None
         
         # إعداد نظام التسجيل
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(f"SignalStabilizer_{pair_name}")
     
+    # واجهة القوائم القديمة (للقراءة فقط)
+    
+    @property
+    def signal_history(self) -> List[Dict]:
+        return self.history.to_records()
+    
+    @property
+    def confidence_history(self) -> List[float]:
+        return self.history.confidences().tolist()
+    
+    @property
+    def volatility_history(self) -> List[float]:
+        return self.history.volatilities().tolist()
+    
+    @property
+    def trend_history(self) -> List[float]:
+        return self.history.trend_strengths().tolist()
+    
     def add_signal_data(self, signal_type: str, confidence: float, 
                        volatility: float, trend_strength: float, timestamp: datetime = None):
         """
@@ -45,44 +242,25 @@ class SignalStabilizer:
         if timestamp is None:
             timestamp = datetime.now()
         
-        signal_data = {
-            'timestamp': timestamp,
-            'signal_type': signal_type,
-            'confidence': confidence,
-            'volatility': volatility,
-            'trend_strength': trend_strength
-        }
-        
-        self.signal_history.append(signal_data)
-        self.confidence_history.append(confidence)
-        self.volatility_history.append(volatility)
-        self.trend_history.append(trend_strength)
-        
-        # الاحتفاظ بآخر 100 إشارة فقط
-        if len(self.signal_history) > 100:
-            self.signal_history = self.signal_history[-100:]
-            self.confidence_history = self.confidence_history[-100:]
-            self.volatility_history = self.volatility_history[-100:]
-            self.trend_history = self.trend_history[-100:]
+        # المخزن يحتفظ بآخر HISTORY_SIZE إشارة فقط
+        self.history.append(signal_type, confidence, volatility, trend_strength, timestamp)
+        self._stability_report = None
     
-    def detect_signal_outliers(self, recent_signals: List[Dict]) -> List[bool]:
+    def detect_signal_outliers(self, recent_signals) -> List[bool]:
         """
         كشف الإشارات الشاذة
+        
+        يقبل قائمة قواميس إشارات أو مصفوفة قيم الثقة مباشرة
         """
         if len(recent_signals) < 5:
             return [False] * len(recent_signals)
         
-        confidences = [s['confidence'] for s in recent_signals]
-        mean_confidence = np.mean(confidences)
-        std_confidence = np.std(confidences)
-        
-        outliers = []
-        for confidence in confidences:
-            z_score = abs(confidence - mean_confidence) / (std_confidence + 1e-8)
-            is_outlier = z_score > self.config.outlier_detection_threshold
-            outliers.append(is_outlier)
+        confidences = np.array([
+            s['confidence'] if isinstance(s, dict) else s for s in recent_signals
+        ], dtype=float)
         
-        return outliers
+        z_scores = np.abs(confidences - np.mean(confidences)) / (np.std(confidences) + 1e-8)
+        return (z_scores > self.config.outlier_detection_threshold).tolist()
     
     def calculate_signal_persistence(self, signal_type: str, window: int = None) -> float:
         """
@@ -91,11 +269,10 @@ class SignalStabilizer:
         if window is None:
             window = self.config.signal_persistence_periods
         
-        if len(self.signal_history) < window:
+        if len(self.history) < window:
             return 0.0
         
-        recent_signals = self.signal_history[-window:]
-        same_type_count = sum(1 for s in recent_signals if s['signal_type'] == signal_type)
+        same_type_count = np.count_nonzero(self.history.types(window) == self.history.type_code(signal_type))
         
         return same_type_count / window
     
@@ -103,10 +280,10 @@ class SignalStabilizer:
         """
         حساب تعديل التقلبات
         """
-        if len(self.volatility_history) < 10:
+        if len(self.history) < 10:
             return 1.0
         
-        avg_volatility = np.mean(self.volatility_history[-20:])
+        avg_volatility = self.history.volatility_mean()
         volatility_ratio = current_volatility / (avg_volatility + 1e-8)
         
         # تقليل قوة الإشارة في حالة التقلبات العالية
@@ -125,20 +302,19 @@ class SignalStabilizer:
         """
         window = self.config.trend_consistency_window
         
-        if len(self.signal_history) < window:
+        if len(self.history) < window:
             return 0.5
         
-        recent_signals = self.signal_history[-window:]
-        
-        # تحويل أنواع الإشارات إلى اتجاهات
-        trend_mapping = {'buy': 'bullish', 'sell': 'bearish', 'neutral': 'neutral'}
-        recent_trends = [trend_mapping.get(s['signal_type'], 'neutral') for s in recent_signals]
-        
         # حساب اتساق الاتجاه
         if current_trend == 'neutral':
             return 0.5
         
-        consistent_count = sum(1 for trend in recent_trends if trend == current_trend)
+        # الاتجاه الصاعد يقابل إشارات buy والهابط إشارات sell
+        signal_type = {'bullish': 'buy', 'bearish': 'sell'}.get(current_trend)
+        if signal_type is None:
+            return 0.0
+        
+        consistent_count = np.count_nonzero(self.history.types(window) == self.history.type_code(signal_type))
         consistency = consistent_count / window
         
         return consistency
@@ -152,9 +328,8 @@ class SignalStabilizer:
             return 0.0, 0.0
         
         # تطبيق تمهيد على قوة الإشارة
-        if len(self.confidence_history) >= 3:
-            recent_confidences = self.confidence_history[-3:]
-            smoothed_confidence = np.mean(recent_confidences + [confidence])
+        if len(self.history) >= 3:
+            smoothed_confidence = np.mean(np.append(self.history.confidences(3), confidence))
         else:
             smoothed_confidence = confidence
         
@@ -179,10 +354,14 @@ class SignalStabilizer:
         volatility_adjustment = self.calculate_volatility_adjustment(volatility)
         
         # حساب اتساق الاتجاه
-        trend_mapping = {'buy': 'bullish', 'sell': 'bearish', 'neutral': 'neutral'}
-        current_trend = trend_mapping.get(signal_type, 'neutral')
+        current_trend = TREND_MAPPING.get(signal_type, 'neutral')
         trend_consistency = self.calculate_trend_consistency(current_trend)
         
+        return self._confirmation_score(confidence, persistence, trend_consistency,
+                                        trend_strength, volatility_adjustment)
+    
+    def _confirmation_score(self, confidence: float, persistence: float, trend_consistency: float,
+                            trend_strength: float, volatility_adjustment: float) -> float:
         # حساب النقاط النهائية
         confirmation_score = (
             confidence * 0.4 +
@@ -193,34 +372,39 @@ class SignalStabilizer:
         
         return min(100, max(0, confirmation_score))
     
-    def stabilize_signal(self, signal_data: Dict) -> Dict:
+    def stabilize(self, signal_data: Dict) -> StabilizedSignal:
         """
         تحسين استقرار الإشارة
+        
+        يتم حساب كل مقياس مرة واحدة فقط لكل إشارة
         """
+        signal_type = signal_data['signal_type']
+        confidence = signal_data['confidence']
+        volatility = signal_data.get('volatility', 0.5)
+        trend_strength = signal_data.get('trend_strength', 50)
+        
         # إضافة البيانات إلى التاريخ
-        self.add_signal_data(
-            signal_data['signal_type'],
-            signal_data['confidence'],
-            signal_data.get('volatility', 0.5),
-            signal_data.get('trend_strength', 50)
-        )
+        self.add_signal_data(signal_type, confidence, volatility, trend_strength)
         
         # تطبيق مرشح الضوضاء
-        original_strength = signal_data.get('signal_strength', signal_data['confidence'])
-        filtered_strength, filtered_confidence = self.apply_noise_filter(
-            original_strength, signal_data['confidence']
-        )
+        original_strength = signal_data.get('signal_strength', confidence)
+        filtered_strength, filtered_confidence = self.apply_noise_filter(original_strength, confidence)
         
-        # حساب نقاط التأكيد
-        confirmation_score = self.calculate_confirmation_score(signal_data)
+        # مقاييس التأكيد
+        persistence = self.calculate_signal_persistence(signal_type)
+        volatility_adjustment = self.calculate_volatility_adjustment(volatility)
+        trend_consistency = self.calculate_trend_consistency(TREND_MAPPING.get(signal_type, 'neutral'))
+        
+        confirmation_score = self._confirmation_score(
+            confidence, persistence, trend_consistency, trend_strength, volatility_adjustment
+        )
         
         # كشف الإشارات الشاذة
-        recent_signals = self.signal_history[-5:] if len(self.signal_history) >= 5 else self.signal_history
-        outliers = self.detect_signal_outliers(recent_signals)
+        outliers = self.detect_signal_outliers(self.history.confidences(5))
         is_current_outlier = outliers[-1] if outliers else False
         
         # تحديد حالة الإشارة النهائية
-        final_signal_type = signal_data['signal_type']
+        final_signal_type = signal_type
         final_confidence = filtered_confidence
         final_strength = filtered_strength
         
@@ -230,65 +414,154 @@ class SignalStabilizer:
             final_confidence = 0
             final_strength = 0
         
-        # إنشاء الإشارة المحسنة
-        stabilized_signal = {
-            'signal_type': final_signal_type,
-            'confidence': final_confidence,
-            'signal_strength': final_strength,
-            'confirmation_score': confirmation_score,
-            'is_outlier': is_current_outlier,
-            'persistence': self.calculate_signal_persistence(signal_data['signal_type']),
-            'volatility_adjustment': self.calculate_volatility_adjustment(signal_data.get('volatility', 0.5)),
-            'trend_consistency': self.calculate_trend_consistency(
-                {'buy': 'bullish', 'sell': 'bearish', 'neutral': 'neutral'}.get(signal_data['signal_type'], 'neutral')
-            ),
-            'stability_metrics': {
-                'original_confidence': signal_data['confidence'],
-                'filtered_confidence': filtered_confidence,
-                'original_strength': original_strength,
-                'filtered_strength': filtered_strength,
-                'noise_filtered': abs(original_strength - filtered_strength) > 0.01
-            }
-        }
+        return StabilizedSignal(
+            signal_type=final_signal_type,
+            confidence=final_confidence,
+            signal_strength=final_strength,
+            confirmation_score=confirmation_score,
+            is_outlier=is_current_outlier,
+            persistence=persistence,
+            volatility_adjustment=volatility_adjustment,
+            trend_consistency=trend_consistency,
+            original_confidence=confidence,
+            filtered_confidence=filtered_confidence,
+            original_strength=original_strength,
+            filtered_strength=filtered_strength
+        )
+    
+    def stabilize_signal(self, signal_data: Dict) -> Dict:
+        """
+        تحسين استقرار الإشارة (النتيجة كقاموس)
+        """
+        return self.stabilize(signal_data).to_dict()
+    
+    def replay(self, signal_types, confidences, volatilities=None, trend_strengths=None,
+               signal_strengths=None) -> pd.DataFrame:
+        """
+        تحسين استقرار سلسلة إشارات تاريخية كاملة دفعة واحدة
+        
+        النتيجة مطابقة لاستدعاء stabilize على كل إشارة بالترتيب في مثبت جديد
+        (بنفس الإعدادات)، ويتم حسابها بعمليات نوافذ متحركة على المصفوفات. لا يتم
+        تعديل تاريخ هذا المثبت. كل صف في النتيجة يقابل حقول StabilizedSignal
+        """
+        signal_types = np.asarray(signal_types, dtype=object)
+        confidences = np.asarray(confidences, dtype=float)
+        n = len(signal_types)
+        
+        volatilities = np.full(n, 0.5) if volatilities is None else np.asarray(volatilities, dtype=float)
+        trend_strengths = np.full(n, 50.0) if trend_strengths is None else np.asarray(trend_strengths, dtype=float)
+        original_strengths = confidences if signal_strengths is None else np.asarray(signal_strengths, dtype=float)
+        
+        config = self.config
+        capacity = self.history.capacity
+        volatility_window = self.history.volatility_window
+        
+        # حجم التاريخ بعد إضافة كل إشارة (محدود بسعة المخزن)
+        history_size = np.minimum(np.arange(1, n + 1), capacity)
+        _, codes = np.unique(signal_types, return_inverse=True)
+        
+        # مرشح الضوضاء
+        smoothed_confidence = confidences.copy()
+        if n >= 3:
+            smoothed_confidence[2:] = (confidences[:-2] + confidences[1:-1] + confidences[2:] + confidences[2:]) / 4
+        
+        is_noise = original_strengths < config.noise_threshold
+        filtered_strength = np.where(is_noise, 0.0, original_strengths * 0.7 + (original_strengths * 0.3))
+        filtered_confidence = np.where(is_noise, 0.0, smoothed_confidence)
+        
+        # استمرارية الإشارة
+        window = config.signal_persistence_periods
+        persistence = np.where(history_size >= window, _window_match_counts(codes, window) / window, 0.0)
+        
+        # تعديل التقلبات
+        volatility_mean = _replay_volatility_means(volatilities, volatility_window)
+        volatility_ratio = volatilities / (volatility_mean + 1e-8)
+        factor = config.volatility_adjustment_factor
+        volatility_adjustment = np.select(
+            [volatility_ratio > 1.5, volatility_ratio < 0.5],
+            [np.maximum(0.3, 1.0 - (volatility_ratio - 1.0) * factor),
+             np.minimum(1.5, 1.0 + (1.0 - volatility_ratio) * factor)],
+            default=1.0
+        )
+        volatility_adjustment[history_size < 10] = 1.0
         
-        return stabilized_signal
+        # اتساق الاتجاه (إشارات buy/sell فقط، والباقي محايد)
+        window = config.trend_consistency_window
+        directional = np.isin(signal_types, ['buy', 'sell']) & (history_size >= window)
+        trend_consistency = np.where(directional, _window_match_counts(codes, window) / window, 0.5)
+        
+        confirmation_score = np.minimum(100, np.maximum(0, (
+            confidences * 0.4 +
+            persistence * 100 * 0.3 +
+            trend_consistency * 100 * 0.2 +
+            trend_strengths * 0.1
+        ) * volatility_adjustment))
+        
+        # كشف الإشارات الشاذة على آخر 5 قيم ثقة
+        is_outlier = np.zeros(n, dtype=bool)
+        if n >= 5:
+            windows = sliding_window_view(confidences, 5)
+            z_scores = np.abs(confidences[4:] - np.mean(windows, axis=1)) / (np.std(windows, axis=1) + 1e-8)
+            is_outlier[4:] = z_scores > config.outlier_detection_threshold
+        
+        # إلغاء الإشارة إذا كانت شاذة أو ضعيفة التأكيد
+        rejected = is_outlier | (confirmation_score < config.confirmation_threshold * 100)
+        
+        return pd.DataFrame({
+            'signal_type': np.where(rejected, 'neutral', signal_types),
+            'confidence': np.where(rejected, 0.0, filtered_confidence),
+            'signal_strength': np.where(rejected, 0.0, filtered_strength),
+            'confirmation_score': confirmation_score,
+            'is_outlier': is_outlier,
+            'persistence': persistence,
+            'volatility_adjustment': volatility_adjustment,
+            'trend_consistency': trend_consistency,
+            'original_confidence': confidences,
+            'filtered_confidence': filtered_confidence,
+            'original_strength': original_strengths,
+            'filtered_strength': filtered_strength,
+            'noise_filtered': np.abs(original_strengths - filtered_strength) > 0.01
+        })
     
     def get_stability_report(self) -> Dict:
         """
         الحصول على تقرير الاستقرار
+        
+        يتم حساب التقرير مرة واحدة بعد كل إشارة وإعادة نفس القاموس حتى الإشارة التالية
         """
-        if len(self.signal_history) < 10:
+        if self._stability_report is None:
+            self._stability_report = self._build_stability_report()
+        return self._stability_report
+    
+    def _build_stability_report(self) -> Dict:
+        if len(self.history) < 10:
             return {
                 "status": "insufficient_data",
                 "message": "بيانات غير كافية لتقرير الاستقرار"
             }
         
-        # حساب إحصائيات الاستقرار
-        recent_signals = self.signal_history[-20:]
+        # حساب إحصائيات الاستقرار على آخر 20 إشارة
+        signal_types = self.history.types(20)
         
         # تنوع الإشارات
-        signal_types = [s['signal_type'] for s in recent_signals]
-        buy_count = signal_types.count('buy')
-        sell_count = signal_types.count('sell')
-        neutral_count = signal_types.count('neutral')
+        buy_count = int(np.count_nonzero(signal_types == self.history.type_code('buy')))
+        sell_count = int(np.count_nonzero(signal_types == self.history.type_code('sell')))
+        neutral_count = int(np.count_nonzero(signal_types == self.history.type_code('neutral')))
         
         # استقرار الثقة
-        confidences = [s['confidence'] for s in recent_signals]
+        confidences = self.history.confidences(20)
         confidence_stability = 100 - (np.std(confidences) / (np.mean(confidences) + 1e-8) * 100)
         confidence_stability = max(0, min(100, confidence_stability))
         
         # استقرار التقلبات
-        volatilities = self.volatility_history[-20:] if len(self.volatility_history) >= 20 else self.volatility_history
+        volatilities = self.history.volatilities(20)
         volatility_stability = 100 - (np.std(volatilities) / (np.mean(volatilities) + 1e-8) * 100)
         volatility_stability = max(0, min(100, volatility_stability))
         
         # اتساق الاتجاه
-        trend_changes = 0
-        for i in range(1, len(recent_signals)):
-            if recent_signals[i]['signal_type'] != recent_signals[i-1]['signal_type']:
-                trend_changes += 1
+        trend_changes = np.count_nonzero(signal_types[1:] != signal_types[:-1])
         
-        trend_consistency = max(0, 100 - (trend_changes / len(recent_signals) * 100))
+        trend_consistency = max(0, 100 - (trend_changes / len(signal_types) * 100))
         
         # النقاط الإجمالية للاستقرار
         overall_stability = (confidence_stability * 0.4 + volatility_stability * 0.3 + trend_consistency * 0.3)
@@ -300,7 +573,7 @@ class SignalStabilizer:
                 "buy_signals": buy_count,
                 "sell_signals": sell_count,
                 "neutral_signals": neutral_count,
-                "total_signals": len(recent_signals)
+                "total_signals": len(signal_types)
             },
             "stability_metrics": {
                 "confidence_stability": confidence_stability,
@@ -339,9 +612,9 @@ class EnhancedSignalProcessor:
     معالج الإشارات المحسن مع تقليل التذبذب
     """
     
-    def __init__(self, pair_name: str = "EURUSD"):
+    def __init__(self, pair_name: str = "EURUSD", data_provider=None):
         self.pair_name = pair_name
-        self.analyzer = SinglePairAnalyzer(pair_name)
+        self.analyzer = SinglePairAnalyzer(pair_name, data_provider)
         self.stabilizer = SignalStabilizer(pair_name)
         self.indicators = SimplifiedTechnicalIndicators(pair_name)
         
@@ -371,8 +644,13 @@ class EnhancedSignalProcessor:
         """
         self.reset_session_if_needed()
         
-        # الحصول على التحليل الشامل
-        analysis = self.analyzer.comprehensive_analysis()
+        # الحصول على التحليل الشامل للبيانات المرسلة
+        analysis = self.analyzer.comprehensive_analysis(data={
+            'high': high,
+            'low': low,
+            'close': close,
+            'volume': volume
+        })
         
         if "error" in analysis:
             return analysis
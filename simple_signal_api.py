@@ -1,56 +1,156 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 import requests
+import hashlib
 import json
 import time
+import asyncio
 import threading
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Mapping, Optional
 from datetime import datetime
 import numpy as np
 
 app = Flask(__name__)
 CORS(app)
 
-# بيانات الأسعار الحقيقية
-real_prices = {
+# الأسعار الابتدائية قبل أول تحديث
+INITIAL_PRICES = {
     'EURUSD': 1.0850,
     'GBPUSD': 1.2650, 
     'USDJPY': 149.50
 }
 
-# تاريخ آخر تحديث
-last_update = datetime.now()
+@dataclass(frozen=True)
+class PriceSnapshot:
+    """
+    لقطة ثابتة من الأسعار
+    
+    لا يتم تعديل اللقطة بعد إنشائها، بل يتم استبدالها بالكامل بلقطة جديدة،
+    لذلك يمكن لمعالجات Flask قراءتها دون أي قفل. الإشارات محسوبة مرة واحدة
+    لكل إصدار من الأسعار
+    """
+    prices: Mapping[str, float]
+    last_update: datetime
+    version: int
+    source: str
+    signals: Mapping[str, Optional[dict]]
 
-def get_real_forex_prices():
-    """الحصول على أسعار حقيقية من مصادر متعددة"""
-    global real_prices, last_update
+class PriceRefresher:
+    """
+    محدّث أسعار غير متزامن يعمل في خيط خلفي بحلقة أحداث خاصة به
     
-    try:
-        # محاولة الحصول على أسعار من مصادر مختلفة
-        sources = [
-            get_prices_from_fixer,
-            get_prices_from_exchangerate,
-            get_prices_from_currencylayer
-        ]
+    يتم استدعاء جميع المصادر بالتوازي مع مهلة لكل مصدر، ويُعتمد أول مصدر
+    ناجح حسب ترتيب الأفضلية، ثم تُنشر لقطة جديدة دفعة واحدة
+    """
+    
+    def __init__(self, sources, interval: float = 10, source_timeout: float = 5,
+                 error_interval: float = 30):
+        self.sources = sources
+        self.interval = interval
+        self.source_timeout = source_timeout
+        self.error_interval = error_interval
+        self.snapshot = PriceSnapshot(
+            prices=MappingProxyType(dict(INITIAL_PRICES)),
+            last_update=datetime.now(),
+            version=0,
+            source='initial',
+            signals=self._compute_signals(INITIAL_PRICES)
+        )
+        self._thread = None
+        # يسلسل الناشرين فقط، القراءة من self.snapshot تبقى بدون قفل
+        self._publish_lock = threading.Lock()
+    
+    def publish(self, prices: dict, source: str, touch_update: bool = True) -> PriceSnapshot:
+        """
+        نشر لقطة جديدة (استبدال المرجع عملية ذرية)
         
-        for source in sources:
+        الإصدار (ومعه ETag) والإشارات لا تتغير إذا لم تتغير الأسعار، ويتم فقط
+        تحديث وقت آخر تحديث. النشر متسلسل حتى يقابل كل إصدار لقطة واحدة فقط
+        """
+        with self._publish_lock:
+            current = self.snapshot
+            merged = dict(current.prices)
+            merged.update(prices)
+            
+            if merged == current.prices:
+                if touch_update:
+                    self.snapshot = replace(current, last_update=datetime.now(), source=source)
+                return self.snapshot
+            
+            self.snapshot = PriceSnapshot(
+                prices=MappingProxyType(merged),
+                last_update=datetime.now() if touch_update else current.last_update,
+                version=current.version + 1,
+                source=source,
+                signals=self._compute_signals(merged)
+            )
+            return self.snapshot
+    
+    def _compute_signals(self, prices: dict) -> Mapping[str, Optional[dict]]:
+        """حساب إشارات جميع الأزواج للقطة الجديدة"""
+        signals = {}
+        for pair in prices:
             try:
-                prices = source()
+                signals[pair] = generate_trading_signal(pair, prices)
+            except Exception as e:
+                print(f"❌ خطأ في حساب إشارة {pair}: {e}")
+                signals[pair] = None
+        
+        return MappingProxyType(signals)
+    
+    async def _call_source(self, source) -> Optional[dict]:
+        return await asyncio.wait_for(asyncio.to_thread(source), self.source_timeout)
+    
+    async def refresh(self) -> bool:
+        """تحديث واحد: استعلام جميع المصادر بالتوازي"""
+        tasks = [asyncio.create_task(self._call_source(source)) for source in self.sources]
+        
+        try:
+            # انتظار المصادر حسب الأفضلية، بينما تعمل البقية في الخلفية
+            for source, task in zip(self.sources, tasks):
+                try:
+                    prices = await task
+                except Exception as e:
+                    print(f"❌ فشل في {source.__name__}: {e!r}")
+                    continue
+                
                 if prices:
-                    real_prices.update(prices)
-                    last_update = datetime.now()
+                    self.publish(prices, source.__name__)
                     print(f"✅ تم تحديث الأسعار من {source.__name__}")
                     return True
-            except Exception as e:
-                print(f"❌ فشل في {source.__name__}: {e}")
-                continue
+        finally:
+            for task in tasks:
+                task.cancel()
         
         # إذا فشلت جميع المصادر، استخدم محاكاة واقعية
-        simulate_realistic_prices()
+        self.publish(simulate_realistic_prices(self.snapshot.prices), 'simulation', touch_update=False)
         return True
+    
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+                await asyncio.sleep(self.interval)
+            except Exception as e:
+                print(f"❌ خطأ في التحديث المستمر: {e}")
+                await asyncio.sleep(self.error_interval)
+    
+    def start(self):
+        """بدء التحديث في خيط خلفي"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=asyncio.run, args=(self._run(),), daemon=True)
+            self._thread.start()
+
+def get_real_forex_prices():
+    """الحصول على أسعار حقيقية من مصادر متعددة (تحديث واحد متزامن)"""
+    try:
+        return asyncio.run(refresher.refresh())
         
     except Exception as e:
         print(f"❌ خطأ في تحديث الأسعار: {e}")
-        simulate_realistic_prices()
+        refresher.publish(simulate_realistic_prices(refresher.snapshot.prices), 'simulation', touch_update=False)
         return False
 
 def get_prices_from_fixer():
@@ -120,14 +220,13 @@ def get_prices_from_currencylayer():
     except:
         return None
 
-def simulate_realistic_prices():
-    """محاكاة أسعار واقعية عند فشل المصادر الخارجية"""
-    global real_prices
-    
+def simulate_realistic_prices(prices):
+    """محاكاة أسعار واقعية عند فشل المصادر الخارجية (تعيد قاموساً جديداً)"""
     # أسعار أساسية قريبة من السوق الحقيقي
     base_prices = {'EURUSD': 1.0850, 'GBPUSD': 1.2650, 'USDJPY': 149.50}
+    simulated = {}
     
-    for pair in real_prices:
+    for pair in prices:
         # تحديد التقلبات حسب الزوج
         if 'EUR' in pair:
             volatility = 0.0008
@@ -140,7 +239,7 @@ def simulate_realistic_prices():
         change = np.random.normal(0, volatility)
         
         # تطبيق التغيير مع الحفاظ على نطاق واقعي
-        new_price = real_prices[pair] + change
+        new_price = prices[pair] + change
         
         # التأكد من البقاء في نطاق واقعي
         base_price = base_prices[pair]
@@ -149,11 +248,13 @@ def simulate_realistic_prices():
         if abs(new_price - base_price) > max_deviation:
             new_price = base_price + np.random.uniform(-max_deviation, max_deviation)
         
-        real_prices[pair] = round(new_price, 5 if 'JPY' not in pair else 2)
+        simulated[pair] = round(new_price, 5 if 'JPY' not in pair else 2)
+    
+    return simulated
 
-def generate_trading_signal(pair):
+def generate_trading_signal(pair, prices):
     """توليد إشارة تداول بناءً على السعر الحقيقي"""
-    current_price = real_prices[pair]
+    current_price = prices[pair]
     
     # حساب التغيير من السعر الأساسي
     base_prices = {'EURUSD': 1.0850, 'GBPUSD': 1.2650, 'USDJPY': 149.50}
@@ -216,36 +317,81 @@ def generate_trading_signal(pair):
         "price_change_percent": round(price_change_percent, 3)
     }
 
-def update_prices_continuously():
-    """تحديث الأسعار بشكل مستمر"""
-    while True:
-        try:
-            get_real_forex_prices()
-            time.sleep(10)  # تحديث كل 10 ثواني
-        except Exception as e:
-            print(f"❌ خطأ في التحديث المستمر: {e}")
-            time.sleep(30)
+# بدء تحديث الأسعار في خيط منفصل (تحديث كل 10 ثواني)
+refresher = PriceRefresher([
+    get_prices_from_fixer,
+    get_prices_from_exchangerate,
+    get_prices_from_currencylayer
+])
+refresher.start()
+
+# منطق المسارات مشترك بين Flask ونسخة ASGI (asgi_api.py)
+
+def signal_etag(snapshot: PriceSnapshot, pair: str) -> str:
+    """
+    ETag ضعيف للإشارة مبني على محتواها (الإشارة والسعر) وليس على رقم الإصدار
+    
+    رقم الإصدار يبدأ من 0 في كل عملية، فلا يصلح وحده بعد إعادة التشغيل. يرسل
+    كـ W/ لأن الاستجابة تحتوي أيضاً على last_update و timestamp
+    """
+    content = json.dumps([snapshot.signals.get(pair), snapshot.prices[pair]], sort_keys=True, default=str)
+    return f"{pair}-{hashlib.sha1(content.encode()).hexdigest()[:16]}"
+
+def build_signal_payload(snapshot: PriceSnapshot, pair: str) -> dict:
+    return {
+        "success": True,
+        "signal": snapshot.signals.get(pair),
+        "current_price": snapshot.prices[pair],
+        "last_update": snapshot.last_update.strftime("%H:%M:%S"),
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+    }
 
-# بدء تحديث الأسعار في خيط منفصل
-price_update_thread = threading.Thread(target=update_prices_continuously, daemon=True)
-price_update_thread.start()
+def build_price_payload(snapshot: PriceSnapshot, pair: str) -> dict:
+    return {
+        "pair": pair,
+        "price": snapshot.prices[pair],
+        "last_update": snapshot.last_update.strftime("%H:%M:%S"),
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+    }
+
+def build_prices_payload(snapshot: PriceSnapshot) -> dict:
+    return {
+        "prices": dict(snapshot.prices),
+        "last_update": snapshot.last_update.strftime("%H:%M:%S"),
+        "timestamp": datetime.now().strftime("%H:%M:%S")
+    }
+
+def build_health_payload(snapshot: PriceSnapshot) -> dict:
+    return {
+        "status": "healthy",
+        "prices_available": list(snapshot.prices.keys()),
+        "last_update": snapshot.last_update.strftime("%H:%M:%S"),
+        "current_time": datetime.now().strftime("%H:%M:%S"),
+        "version": "Simple Signal v1.0"
+    }
 
 @app.route('/api/signal/<pair>', methods=['GET'])
 def get_signal(pair):
-    """الحصول على إشارة التداول للزوج المحدد"""
+    """
+    الحصول على إشارة التداول للزوج المحدد
+    
+    الإشارة مأخوذة من اللقطة الحالية، ويعاد 304 إذا لم تتغير الإشارة أو السعر
+    منذ آخر طلب (If-None-Match)
+    """
     try:
-        if pair not in real_prices:
+        snapshot = refresher.snapshot
+        if pair not in snapshot.prices:
             return jsonify({"error": "زوج غير مدعوم"}), 400
         
-        signal = generate_trading_signal(pair)
+        etag = signal_etag(snapshot, pair)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            return response
         
-        return jsonify({
-            "success": True,
-            "signal": signal,
-            "current_price": real_prices[pair],
-            "last_update": last_update.strftime("%H:%M:%S"),
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
+        response = jsonify(build_signal_payload(snapshot, pair))
+        response.set_etag(etag, weak=True)
+        return response
         
     except Exception as e:
         return jsonify({
@@ -257,15 +403,11 @@ def get_signal(pair):
 def get_price(pair):
     """الحصول على السعر الحقيقي للزوج"""
     try:
-        if pair not in real_prices:
+        snapshot = refresher.snapshot
+        if pair not in snapshot.prices:
             return jsonify({"error": "زوج غير مدعوم"}), 400
         
-        return jsonify({
-            "pair": pair,
-            "price": real_prices[pair],
-            "last_update": last_update.strftime("%H:%M:%S"),
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
+        return jsonify(build_price_payload(snapshot, pair))
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -274,11 +416,7 @@ def get_price(pair):
 def get_all_prices():
     """الحصول على جميع الأسعار"""
     try:
-        return jsonify({
-            "prices": real_prices,
-            "last_update": last_update.strftime("%H:%M:%S"),
-            "timestamp": datetime.now().strftime("%H:%M:%S")
-        })
+        return jsonify(build_prices_payload(refresher.snapshot))
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -286,22 +424,14 @@ def get_all_prices():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """فحص صحة النظام"""
-    return jsonify({
-        "status": "healthy",
-        "prices_available": list(real_prices.keys()),
-        "last_update": last_update.strftime("%H:%M:%S"),
-        "current_time": datetime.now().strftime("%H:%M:%S"),
-        "version": "Simple Signal v1.0"
-    })
+    return jsonify(build_health_payload(refresher.snapshot))
 
 if __name__ == '__main__':
     print("🚀 بدء تشغيل خادم الإشارات المبسط...")
-    print("📊 الأزواج المتاحة:", list(real_prices.keys()))
+    print("📊 الأزواج المتاحة:", list(refresher.snapshot.prices.keys()))
     print("🔄 تحديث الأسعار كل 10 ثواني...")
     print("🌐 الخادم متاح على: http://0.0.0.0:5002")
     
-    # تحديث أولي للأسعار
-    get_real_forex_prices()
-    
+    # التحديث الأولي يتم في خيط refresher الذي بدأ عند الاستيراد
     app.run(host='0.0.0.0', port=5002, debug=True)
 
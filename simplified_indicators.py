@@ -1,10 +1,7 @@
 import numpy as np
 import pandas as pd
 from typing import Dict, List, Tuple, Optional
-import ta
-from scipy import signal
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import IsolationForest
+import indicator_kernels as kernels
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -70,58 +67,41 @@ class SimplifiedTechnicalIndicators:
         """
         حساب RSI مبسط
         """
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        return pd.Series(kernels.rsi(prices, period, method="sma"), index=prices.index)
     
     def calculate_macd(self, prices: pd.Series, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict:
         """
         حساب MACD مبسط
         """
-        ema_fast = prices.ewm(span=fast).mean()
-        ema_slow = prices.ewm(span=slow).mean()
-        macd_line = ema_fast - ema_slow
-        signal_line = macd_line.ewm(span=signal).mean()
-        histogram = macd_line - signal_line
+        macd_line, signal_line, histogram = kernels.macd(prices, fast, slow, signal, adjust=True, sma_seed=False)
         
         return {
-            "macd": macd_line,
-            "signal": signal_line,
-            "histogram": histogram
+            "macd": pd.Series(macd_line, index=prices.index),
+            "signal": pd.Series(signal_line, index=prices.index),
+            "histogram": pd.Series(histogram, index=prices.index)
         }
     
     def calculate_bollinger_bands(self, prices: pd.Series, period: int = 20, std_dev: float = 2) -> Dict:
         """
         حساب نطاقات بولينجر مبسطة
         """
-        sma = prices.rolling(window=period).mean()
-        std = prices.rolling(window=period).std()
-        
-        upper_band = sma + (std * std_dev)
-        lower_band = sma - (std * std_dev)
+        upper_band, sma, lower_band = kernels.bollinger_bands(prices, period, std_dev, ddof=1)
         
         return {
-            "upper": upper_band,
-            "middle": sma,
-            "lower": lower_band
+            "upper": pd.Series(upper_band, index=prices.index),
+            "middle": pd.Series(sma, index=prices.index),
+            "lower": pd.Series(lower_band, index=prices.index)
         }
     
     def calculate_stochastic(self, high: pd.Series, low: pd.Series, close: pd.Series, k_period: int = 14, d_period: int = 3) -> Dict:
         """
         حساب مؤشر Stochastic مبسط
         """
-        lowest_low = low.rolling(window=k_period).min()
-        highest_high = high.rolling(window=k_period).max()
-        
-        k_percent = 100 * ((close - lowest_low) / (highest_high - lowest_low))
-        d_percent = k_percent.rolling(window=d_period).mean()
+        k_percent, d_percent = kernels.stochastic(high, low, close, k_period, d_period)
         
         return {
-            "k": k_percent,
-            "d": d_percent
+            "k": pd.Series(k_percent, index=close.index),
+            "d": pd.Series(d_percent, index=close.index)
         }
     
     def enhanced_rsi(self, prices: np.ndarray, high: np.ndarray, 
@@ -280,16 +260,9 @@ class SimplifiedTechnicalIndicators:
         """
         period = 14
         
-        high_series = pd.Series(high)
-        low_series = pd.Series(low)
-        close_series = pd.Series(close)
-        
-        highest_high = high_series.rolling(window=period).max()
-        lowest_low = low_series.rolling(window=period).min()
-        
-        williams_r = -100 * ((highest_high - close_series) / (highest_high - lowest_low))
+        williams_r = kernels.williams_r(high, low, close, period)
         
-        current_willr = williams_r.iloc[-1] if len(williams_r) > 0 else -50
+        current_willr = williams_r[-1] if len(williams_r) > 0 else -50
         
         signal_type = "neutral"
         signal_strength = 0
@@ -305,7 +278,7 @@ class SimplifiedTechnicalIndicators:
             "value": current_willr,
             "signal_type": signal_type,
             "signal_strength": signal_strength,
-            "quality_score": self._calculate_quality_score(williams_r.values)
+            "quality_score": self._calculate_quality_score(williams_r)
         }
     
     def enhanced_cci(self, high: np.ndarray, low: np.ndarray, 
@@ -315,17 +288,9 @@ class SimplifiedTechnicalIndicators:
         """
         period = 20
         
-        high_series = pd.Series(high)
-        low_series = pd.Series(low)
-        close_series = pd.Series(close)
-        
-        typical_price = (high_series + low_series + close_series) / 3
-        sma_tp = typical_price.rolling(window=period).mean()
-        mad = typical_price.rolling(window=period).apply(lambda x: np.mean(np.abs(x - x.mean())))
-        
-        cci = (typical_price - sma_tp) / (0.015 * mad)
+        cci = kernels.cci(high, low, close, period)
         
-        current_cci = cci.iloc[-1] if len(cci) > 0 else 0
+        current_cci = cci[-1] if len(cci) > 0 else 0
         
         signal_type = "neutral"
         signal_strength = 0
@@ -341,7 +306,7 @@ class SimplifiedTechnicalIndicators:
             "value": current_cci,
             "signal_type": signal_type,
             "signal_strength": signal_strength,
-            "quality_score": self._calculate_quality_score(cci.values)
+            "quality_score": self._calculate_quality_score(cci)
         }
     
     def enhanced_adx(self, high: np.ndarray, low: np.ndarray, 
@@ -351,36 +316,12 @@ class SimplifiedTechnicalIndicators:
         """
         period = 14
         
-        high_series = pd.Series(high)
-        low_series = pd.Series(low)
-        close_series = pd.Series(close)
-        
-        # حساب True Range
-        tr1 = high_series - low_series
-        tr2 = abs(high_series - close_series.shift(1))
-        tr3 = abs(low_series - close_series.shift(1))
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        
-        # حساب Directional Movement
-        plus_dm = high_series.diff()
-        minus_dm = low_series.diff()
-        
-        plus_dm[plus_dm < 0] = 0
-        minus_dm[minus_dm > 0] = 0
-        minus_dm = abs(minus_dm)
-        
-        # تمهيد
-        atr = tr.rolling(window=period).mean()
-        plus_di = 100 * (plus_dm.rolling(window=period).mean() / atr)
-        minus_di = 100 * (minus_dm.rolling(window=period).mean() / atr)
-        
-        # حساب ADX
-        dx = 100 * abs(plus_di - minus_di) / (plus_di + minus_di)
-        adx = dx.rolling(window=period).mean()
+        # ADX و DI بتمهيد بمتوسطات بسيطة
+        adx, plus_di, minus_di = kernels.adx(high, low, close, period, smoothing="sma")
         
-        current_adx = adx.iloc[-1] if len(adx) > 0 else 25
-        current_plus_di = plus_di.iloc[-1] if len(plus_di) > 0 else 25
-        current_minus_di = minus_di.iloc[-1] if len(minus_di) > 0 else 25
+        current_adx = adx[-1] if len(adx) > 0 else 25
+        current_plus_di = plus_di[-1] if len(plus_di) > 0 else 25
+        current_minus_di = minus_di[-1] if len(minus_di) > 0 else 25
         
         trend_strength = "weak"
         if current_adx > 40:
@@ -407,7 +348,7 @@ class SimplifiedTechnicalIndicators:
             "trend_strength": trend_strength,
             "trend_direction": trend_direction,
             "signal_strength": signal_strength,
-            "quality_score": self._calculate_quality_score(adx.values)
+            "quality_score": self._calculate_quality_score(adx)
         }
     
     def _calculate_quality_score(self, indicator_values: np.ndarray) -> float:
@@ -485,8 +426,8 @@ class SimplifiedTechnicalIndicators:
         # إضافة مؤشرات إضافية مبسطة
         try:
             # مؤشر المتوسط المتحرك البسيط
-            sma_20 = pd.Series(close).rolling(window=20).mean().iloc[-1]
-            sma_50 = pd.Series(close).rolling(window=50).mean().iloc[-1]
+            sma_20 = kernels.sma(close, 20)[-1]
+            sma_50 = kernels.sma(close, 50)[-1]
             current_price = close[-1]
             
             sma_signal = "neutral"
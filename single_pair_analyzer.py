@@ -6,6 +6,9 @@ import json
 import sqlite3
 from dataclasses import dataclass
 from simplified_indicators import SimplifiedTechnicalIndicators
+from market_data_provider import MarketDataProvider, SQLiteMarketDataProvider, SyntheticMarketDataProvider
+from support_resistance import detect_levels, nearest_levels
+from timeframe_resampler import ResampledBarCache
 import logging
 
 @dataclass
@@ -27,7 +30,7 @@ class SinglePairAnalyzer:
     نظام التحليل المركز لزوج عملة واحد
     """
     
-    def __init__(self, pair_name: str = "EURUSD"):
+    def __init__(self, pair_name: str = "EURUSD", data_provider: Optional[MarketDataProvider] = None):
         self.pair_name = pair_name
         self.indicators = SimplifiedTechnicalIndicators(pair_name)
         self.config = self._get_pair_config(pair_name)
@@ -38,6 +41,12 @@ class SinglePairAnalyzer:
         # إعداد قاعدة البيانات
         self._setup_database()
         
+        # مصدر الشموع (قاعدة بيانات الزوج افتراضياً) والبيانات الاصطناعية عند عدم توفرها
+        self.data_provider = data_provider or SQLiteMarketDataProvider(self.db_path)
+        self.sample_provider = SyntheticMarketDataProvider()
+        # شموع الإطارات الأعلى المشتقة من شموع الدقيقة
+        self.bar_cache = ResampledBarCache()
+        
         # إعداد نظام التسجيل
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(f"PairAnalyzer_{pair_name}")
@@ -182,90 +191,30 @@ class SinglePairAnalyzer:
         if len(self.historical_data) > 1000:
             self.historical_data = self.historical_data[-1000:]
     
+    def get_latest_candle_time(self, timeframe: str = "1m") -> Optional[str]:
+        """
+        الطابع الزمني لآخر شمعة محفوظة (None إذا لم توجد بيانات)
+        """
+        return self.data_provider.get_latest_timestamp(self.pair_name, timeframe)
+    
     def get_recent_data(self, periods: int = 100, timeframe: str = "1m") -> Dict:
         """
-        الحصول على البيانات الحديثة
+        الحصول على البيانات الحديثة من مزود البيانات
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT timestamp, open_price, high_price, low_price, close_price, volume
-            FROM price_data 
-            WHERE timeframe = ?
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (timeframe, periods))
-        
-        data = cursor.fetchall()
-        conn.close()
+        data = self.data_provider.get_candles(self.pair_name, periods, timeframe)
         
-        if not data:
+        if data is None or len(data['close']) == 0:
             return self._generate_sample_data(periods)
         
-        # تحويل البيانات إلى arrays
-        data.reverse()  # ترتيب تصاعدي
-        
-        timestamps = [row[0] for row in data]
-        opens = np.array([row[1] for row in data])
-        highs = np.array([row[2] for row in data])
-        lows = np.array([row[3] for row in data])
-        closes = np.array([row[4] for row in data])
-        volumes = np.array([row[5] for row in data])
-        
-        return {
-            'timestamps': timestamps,
-            'open': opens,
-            'high': highs,
-            'low': lows,
-            'close': closes,
-            'volume': volumes
-        }
+        return data
     
     def _generate_sample_data(self, periods: int = 100) -> Dict:
         """
-        توليد بيانات عينة للاختبار
+        توليد بيانات عينة للاختبار (حتمية ويتم توليدها مرة واحدة فقط)
         """
-        np.random.seed(42)
-        
-        # أسعار أساسية حسب الزوج
-        base_prices = {
-            "EURUSD": 1.0850,
-            "GBPUSD": 1.2650,
-            "USDJPY": 149.50
-        }
-        
-        base_price = base_prices.get(self.pair_name, 1.0850)
-        
-        # توليد تغييرات الأسعار
-        price_changes = np.random.normal(0, self.config.volatility_threshold, periods)
-        closes = base_price + np.cumsum(price_changes)
-        
-        # توليد أسعار الفتح والإغلاق والأعلى والأدنى
-        opens = np.roll(closes, 1)
-        opens[0] = base_price
-        
-        highs = closes + np.random.uniform(0, self.config.volatility_threshold * 0.5, periods)
-        lows = closes - np.random.uniform(0, self.config.volatility_threshold * 0.5, periods)
-        
-        # التأكد من أن الأعلى أعلى من الإغلاق والأدنى أقل
-        highs = np.maximum(highs, closes)
-        lows = np.minimum(lows, closes)
-        
-        volumes = np.random.normal(1000, 200, periods)
-        
-        # توليد timestamps
-        now = datetime.now()
-        timestamps = [now - timedelta(minutes=i) for i in range(periods, 0, -1)]
-        
-        return {
-            'timestamps': timestamps,
-            'open': opens,
-            'high': highs,
-            'low': lows,
-            'close': closes,
-            'volume': volumes
-        }
+        return self.sample_provider.get_candles(
+            self.pair_name, periods, volatility=self.config.volatility_threshold
+        )
     
     def analyze_trading_session(self, timestamp: datetime) -> Dict:
         """
@@ -409,38 +358,35 @@ class SinglePairAnalyzer:
         """
         حساب مستويات الدعم والمقاومة
         """
-        highs = data['high']
-        lows = data['low']
+        highs = np.asarray(data['high'], dtype=float)
+        lows = np.asarray(data['low'], dtype=float)
         closes = data['close']
         
-        # البحث عن القمم والقيعان
-        peaks = []
-        troughs = []
-        
-        for i in range(2, len(highs) - 2):
-            # البحث عن القمم
-            if (highs[i] > highs[i-1] and highs[i] > highs[i-2] and 
-                highs[i] > highs[i+1] and highs[i] > highs[i+2]):
-                peaks.append(highs[i])
-            
-            # البحث عن القيعان
-            if (lows[i] < lows[i-1] and lows[i] < lows[i-2] and 
-                lows[i] < lows[i+1] and lows[i] < lows[i+2]):
-                troughs.append(lows[i])
+        # البحث عن القمم والقيعان (أعلى/أدنى من نقطتين على كل جانب)
+        levels = detect_levels(highs, lows, order=2)
+        peaks = levels['peaks']
+        troughs = levels['troughs']
         
         # حساب مستويات المقاومة والدعم
-        resistance_levels = sorted(peaks, reverse=True)[:3] if peaks else [max(highs)]
-        support_levels = sorted(troughs)[:3] if troughs else [min(lows)]
+        resistance_levels = np.sort(peaks)[::-1][:3].tolist() if len(peaks) else [float(highs.max())]
+        support_levels = np.sort(troughs)[:3].tolist() if len(troughs) else [float(lows.min())]
         
         current_price = closes[-1]
         
-        # تحديد أقرب مستويات
-        nearest_resistance = min(resistance_levels, key=lambda x: abs(x - current_price) if x > current_price else float('inf'))
-        nearest_support = min(support_levels, key=lambda x: abs(x - current_price) if x < current_price else float('inf'))
+        # تحديد أقرب مستويات (أول مستوى في القائمة إذا لم يوجد مستوى في الاتجاه المطلوب)
+        nearest_resistance = nearest_levels(resistance_levels, current_price)[1]
+        if nearest_resistance is None:
+            nearest_resistance = resistance_levels[0]
+        
+        nearest_support = nearest_levels(support_levels, current_price)[0]
+        if nearest_support is None:
+            nearest_support = support_levels[0]
         
         return {
             "resistance_levels": resistance_levels,
             "support_levels": support_levels,
+            "resistance_zones": levels['resistance_zones'].tolist(),
+            "support_zones": levels['support_zones'].tolist(),
             "nearest_resistance": nearest_resistance,
             "nearest_support": nearest_support,
             "current_price": current_price,
@@ -448,12 +394,15 @@ class SinglePairAnalyzer:
             "distance_to_support": (current_price - nearest_support) / current_price * 100 if nearest_support < current_price else None
         }
     
-    def comprehensive_analysis(self, periods: int = 100) -> Dict:
+    def comprehensive_analysis(self, periods: int = 100, data: Optional[Dict] = None) -> Dict:
         """
         التحليل الشامل للزوج
+        
+        يمكن تمرير البيانات مباشرة (نفس صيغة get_recent_data) بدلاً من قراءتها
         """
         # الحصول على البيانات
-        data = self.get_recent_data(periods)
+        if data is None:
+            data = self.get_recent_data(periods)
         
         if len(data['close']) < 20:
             return {"error": "بيانات غير كافية للتحليل"}
@@ -502,6 +451,66 @@ class SinglePairAnalyzer:
             "recommendation": self._generate_recommendation(overall_score, indicators, trend_analysis)
         }
     
+    def multi_timeframe_analysis(self, timeframes: Tuple[str, ...] = ("1m", "5m", "15m", "1h"),
+                                 base_periods: int = 1440, data: Optional[Dict] = None) -> Dict:
+        """
+        تحليل متعدد الإطارات الزمنية من سلسلة الدقيقة فقط
+        
+        يتم قراءة شموع الدقيقة مرة واحدة واشتقاق الإطارات الأعلى منها، ثم حساب
+        المؤشرات والاتجاه لكل إطار وقياس مدى توافق الاتجاهات
+        """
+        if data is None:
+            data = self.get_recent_data(base_periods)
+        
+        results = {}
+        directions = []
+        
+        for timeframe in timeframes:
+            bars = data if timeframe == "1m" else self.bar_cache.get_bars(self.pair_name, data, timeframe)
+            
+            if len(bars['close']) < 20:
+                results[timeframe] = {"error": "بيانات غير كافية للتحليل", "bars": len(bars['close'])}
+                continue
+            
+            indicators = self.indicators.get_all_indicators(
+                bars['high'], bars['low'], bars['close'], bars['volume']
+            )
+            trend_analysis = self.analyze_trend_strength(bars)
+            
+            results[timeframe] = {
+                "bars": len(bars['close']),
+                "last_bar": str(bars['timestamps'][-1]),
+                "indicators": indicators,
+                "trend_analysis": trend_analysis
+            }
+            directions.append(trend_analysis["overall_trend"])
+        
+        # توافق الاتجاه بين الإطارات الزمنية
+        bullish_count = directions.count("bullish")
+        bearish_count = directions.count("bearish")
+        
+        if directions and bullish_count > bearish_count:
+            dominant_trend = "bullish"
+        elif directions and bearish_count > bullish_count:
+            dominant_trend = "bearish"
+        else:
+            dominant_trend = "neutral"
+        
+        agreeing = max(bullish_count, bearish_count)
+        
+        return {
+            "pair_name": self.pair_name,
+            "timestamp": datetime.now().isoformat(),
+            "timeframes": results,
+            "confirmation": {
+                "dominant_trend": dominant_trend,
+                "agreeing_timeframes": agreeing,
+                "analyzed_timeframes": len(directions),
+                "alignment": agreeing / len(directions) * 100 if directions else 0,
+                "fully_aligned": bool(directions) and agreeing == len(directions)
+            }
+        }
+    
     def _calculate_overall_score(self, indicators: Dict, session: Dict, 
                                 volatility: Dict, trend: Dict) -> float:
         """
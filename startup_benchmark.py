@@ -0,0 +1,189 @@
+"""
+قياس زمن بدء التشغيل (زمن الاستيراد) لكل نقطة دخول
+
+يشغل كل وحدة في عملية جديدة عبر python -X importtime ويعرض الزمن الكلي وأثقل
+الحزم المستوردة. يتم حفظ النتائج في ملف JSON (startup_times.json افتراضياً)
+لمتابعة تغير زمن البدء بين التعديلات ومقارنته بآخر قياس
+
+الاستخدام:
+    python startup_benchmark.py
+    python startup_benchmark.py asgi_api enhanced_api --runs 5 --top 15
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# نقاط الدخول (الوحدات التي تشغل خوادم)
+ENTRY_POINTS = [
+    'main',
+    'asgi_api',
+    'enhanced_api',
+    'simple_signal_api',
+    'pocket_option_ws_auto'
+]
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(REPO_DIR, 'startup_times.json')
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """
+    تحويل مخرجات -X importtime إلى قائمة من
+    {'package', 'self_us', 'cumulative_us', 'depth'}
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            stripped = name.lstrip(' ')
+            entries.append({
+                'package': stripped.strip(),
+                'self_us': int(self_us),
+                'cumulative_us': int(cumulative_us),
+                # كل مستوى تداخل يضيف مسافتين
+                'depth': (len(name) - len(stripped) - 1) // 2
+            })
+        except ValueError:
+            continue
+    
+    return entries
+
+
+def package_totals(entries: List[Dict]) -> Dict[str, int]:
+    """
+    الزمن التراكمي لكل حزمة رئيسية (numpy، pandas، sklearn...) بالميكروثانية
+    
+    يتم احتساب أعلى استيراد للحزمة فقط (الذي استورده كود من حزمة أخرى) حتى
+    لا تتكرر الوحدات الفرعية. مخرجات importtime تطبع الوحدة بعد وحداتها الفرعية،
+    لذلك يتم المرور عليها بالعكس لمعرفة الوحدة الأم لكل سطر
+    """
+    totals: Dict[str, int] = {}
+    ancestors: List[str] = []
+    
+    for entry in reversed(entries):
+        depth = entry['depth']
+        del ancestors[depth:]
+        package = entry['package'].split('.')[0]
+        parent = ancestors[-1] if ancestors else None
+        
+        if parent != package:
+            totals[package] = totals.get(package, 0) + entry['cumulative_us']
+        
+        ancestors.append(package)
+    
+    return totals
+
+
+def measure_module(module: str, top: int = 10) -> Dict:
+    """زمن استيراد وحدة واحدة في عملية Python جديدة"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=REPO_DIR,
+        capture_output=True,
+        text=True
+    )
+    
+    entries = parse_importtime(result.stderr)
+    top_level = [entry for entry in entries if entry['depth'] == 0]
+    
+    # الحزم المستوردة أثناء تحميل الوحدة (بدون الوحدة نفسها وبدء المفسر)
+    module_entries = [entry for entry in top_level if entry['package'] == module]
+    totals = package_totals(entries)
+    for name in [entry['package'].split('.')[0] for entry in top_level]:
+        totals.pop(name, None)
+    
+    measurement = {
+        'module': module,
+        'success': result.returncode == 0,
+        'total_ms': round(sum(entry['cumulative_us'] for entry in top_level) / 1000, 1),
+        'module_ms': round(sum(entry['cumulative_us'] for entry in module_entries) / 1000, 1),
+        'heaviest': [
+            {'package': package, 'cumulative_ms': round(cumulative_us / 1000, 1)}
+            for package, cumulative_us in sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+        ]
+    }
+    
+    if result.returncode != 0:
+        # آخر سطر من الخطأ (مثلاً حزمة غير مثبتة)
+        error_lines = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+        measurement['error'] = error_lines[-1] if error_lines else f'exit code {result.returncode}'
+    
+    return measurement
+
+
+def benchmark(modules: List[str], runs: int = 3, top: int = 10) -> Dict[str, Dict]:
+    """
+    قياس كل وحدة عدة مرات والاحتفاظ بأسرع تشغيل
+    
+    أسرع تشغيل هو الأقل تأثراً بضجيج النظام، والتشغيل الأول يسخن ذاكرة الملفات
+    """
+    results = {}
+    for module in modules:
+        measurements = [measure_module(module, top) for _ in range(runs)]
+        results[module] = min(measurements, key=lambda measurement: measurement['total_ms'])
+    return results
+
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(path: str, history: List[Dict]):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+
+
+def print_report(results: Dict[str, Dict], previous: Optional[Dict] = None):
+    for module, measurement in results.items():
+        line = f"\n📦 {module}: {measurement['total_ms']:.1f} ms"
+        
+        if previous and module in previous.get('results', {}):
+            before = previous['results'][module]['total_ms']
+            line += f" (السابق: {before:.1f} ms، الفرق: {measurement['total_ms'] - before:+.1f} ms)"
+        
+        if not measurement['success']:
+            line += f" ❌ {measurement.get('error')}"
+        
+        print(line)
+        for entry in measurement['heaviest']:
+            print(f"    {entry['cumulative_ms']:>8.1f} ms  {entry['package']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس زمن الاستيراد لنقاط الدخول')
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS, help='الوحدات المطلوب قياسها')
+    parser.add_argument('--runs', type=int, default=3, help='عدد مرات القياس لكل وحدة')
+    parser.add_argument('--top', type=int, default=10, help='عدد أثقل الحزم المعروضة')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='ملف JSON لحفظ تاريخ القياسات')
+    parser.add_argument('--no-save', action='store_true', help='عدم حفظ النتائج')
+    args = parser.parse_args()
+    
+    print(f"⏱️ قياس زمن بدء التشغيل ({args.runs} مرات لكل وحدة)...")
+    results = benchmark(args.modules, args.runs, args.top)
+    
+    history = load_history(args.output)
+    print_report(results, history[-1] if history else None)
+    
+    if not args.no_save:
+        history.append({
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'results': results
+        })
+        save_history(args.output, history)
+        print(f"\n💾 تم حفظ النتائج في {args.output}")
+
+
+if __name__ == '__main__':
+    main()
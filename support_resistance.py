@@ -0,0 +1,97 @@
+"""
+كشف مستويات الدعم والمقاومة بشكل متجهي (بدون حلقات على الشموع)
+
+- find_swing_points: القمم والقيعان المحلية بمقارنات إزاحة على المصفوفة كاملة
+- cluster_levels: تجميع المستويات المتقاربة في مناطق سعرية
+- nearest_levels: أقرب دعم ومقاومة عبر np.searchsorted
+"""
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+def find_swing_points(values, order: int = 2, kind: str = 'peak', edge: Optional[int] = None) -> np.ndarray:
+    """
+    مؤشرات القمم (peak) أو القيعان (trough) المحلية
+    
+    النقطة قمة إذا كانت أكبر تماماً من order نقطة على كل جانب. edge هو عدد
+    النقاط المستبعدة من كل طرف (يساوي order افتراضياً)
+    """
+    values = np.asarray(values, dtype=float)
+    edge = order if edge is None else edge
+    n = len(values)
+    
+    if n < 2 * edge + 1:
+        return np.empty(0, dtype=int)
+    
+    compare = np.greater if kind == 'peak' else np.less
+    core = values[edge:n - edge]
+    mask = np.ones(len(core), dtype=bool)
+    
+    # حلقة على عرض النافذة فقط (ثابت صغير) وليس على الشموع
+    for k in range(1, order + 1):
+        mask &= compare(core, values[edge - k:n - edge - k])
+        mask &= compare(core, values[edge + k:n - edge + k])
+    
+    return np.flatnonzero(mask) + edge
+
+
+def cluster_levels(levels, tolerance: float = 0.0005) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    تجميع المستويات المتقاربة في مناطق
+    
+    يتم بدء منطقة جديدة عندما تتجاوز الفجوة بين مستويين متتاليين (بعد الترتيب)
+    النسبة tolerance من السعر. يعيد (مراكز المناطق، عدد اللمسات لكل منطقة)
+    """
+    levels = np.sort(np.asarray(levels, dtype=float))
+    if len(levels) == 0:
+        return levels, np.empty(0, dtype=int)
+    
+    gaps = np.diff(levels) > levels[:-1] * tolerance
+    starts = np.concatenate(([0], np.flatnonzero(gaps) + 1))
+    
+    counts = np.diff(np.append(starts, len(levels)))
+    centers = np.add.reduceat(levels, starts) / counts
+    
+    return centers, counts
+
+
+def nearest_levels(levels, price: float) -> Tuple[Optional[float], Optional[float]]:
+    """
+    أقرب مستوى أسفل السعر (دعم) وأقرب مستوى أعلاه (مقاومة)
+    
+    يعيد None للطرف الذي لا يوجد فيه مستوى
+    """
+    levels = np.sort(np.asarray(levels, dtype=float))
+    
+    above = np.searchsorted(levels, price, side='right')
+    below = np.searchsorted(levels, price, side='left') - 1
+    
+    resistance = float(levels[above]) if above < len(levels) else None
+    support = float(levels[below]) if below >= 0 else None
+    
+    return support, resistance
+
+
+def detect_levels(highs, lows, order: int = 2, tolerance: float = 0.0005) -> Dict:
+    """
+    القمم والقيعان ومناطقها لسلسلة شموع
+    """
+    highs = np.asarray(highs, dtype=float)
+    lows = np.asarray(lows, dtype=float)
+    
+    peaks = highs[find_swing_points(highs, order, 'peak')]
+    troughs = lows[find_swing_points(lows, order, 'trough')]
+    
+    resistance_zones, resistance_touches = cluster_levels(peaks, tolerance)
+    support_zones, support_touches = cluster_levels(troughs, tolerance)
+    
+    return {
+        'peaks': peaks,
+        'troughs': troughs,
+        'resistance_zones': resistance_zones,
+        'resistance_touches': resistance_touches,
+        'support_zones': support_zones,
+        'support_touches': support_touches
+    }
@@ -1,17 +1,275 @@
 import pandas as pd
-import pandas_ta as ta
 import numpy as np
 import logging
+import indicator_kernels as kernels
 
 # إعداد التسجيل
-logging.basicConfig(level=logging.INFO, format=\'%(asctime)s - %(name)s - %(levelname)s - %(message)s\')
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# أقصى عدد تأكيدات يمكن ضغطها في قناع uint64 واحد
+MAX_PACKED_CONFIRMATIONS = 64
+
+def popcount(masks):
+    """عدد البتات المفعلة في كل قناع uint64"""
+    masks = np.asarray(masks, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(masks).astype(np.int64)
+
+    # NumPy < 2.0: جدول عد البتات لكل بايت
+    table = np.array([bin(value).count("1") for value in range(256)], dtype=np.int64)
+    return table[np.ascontiguousarray(masks, dtype="<u8").view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+def rule_bits(names, rule_names):
+    """قناع البتات لمجموعة قواعد (للتركيب بعمليات البت)"""
+    positions = {name: position for position, name in enumerate(rule_names)}
+    mask = np.uint64(0)
+    for name in names:
+        mask |= np.uint64(1) << np.uint64(positions[name])
+    return mask
+
+def unpack_confirmations(masks, count):
+    """فك أقنعة uint64 إلى مصفوفة منطقية (شموع × count)، البت i للتأكيد i"""
+    masks = np.ascontiguousarray(masks, dtype="<u8")
+    bits = np.unpackbits(masks.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    return bits[:, :count].astype(bool)
+
+# --- بناء شروط التأكيد (كل شرط دالة على قاموس أعمدة الشموع والمؤشرات) ---
+
+def _operand(data, operand):
+    return data[operand] if isinstance(operand, str) else operand
+
+def _previous(values):
+    """قيمة الشمعة السابقة (مثل shift(1)، والشمعة الأولى NaN)"""
+    if np.isscalar(values):
+        return values
+    shifted = np.empty_like(values)
+    shifted[0] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+def above(a, b):
+    return lambda data: _operand(data, a) > _operand(data, b)
+
+def below(a, b):
+    return lambda data: _operand(data, a) < _operand(data, b)
+
+def at_least(a, b):
+    return lambda data: _operand(data, a) >= _operand(data, b)
+
+def at_most(a, b):
+    return lambda data: _operand(data, a) <= _operand(data, b)
+
+def crossed_above(a, b):
+    """a كان أقل من b في الشمعة السابقة وأصبح أكبر أو يساوي"""
+    def condition(data):
+        first, second = _operand(data, a), _operand(data, b)
+        return (_previous(first) < _previous(second)) & (first >= second)
+    return condition
+
+def crossed_below(a, b):
+    """a كان أكبر من b في الشمعة السابقة وأصبح أقل أو يساوي"""
+    def condition(data):
+        first, second = _operand(data, a), _operand(data, b)
+        return (_previous(first) > _previous(second)) & (first <= second)
+    return condition
+
+def rising(a):
+    return lambda data: _operand(data, a) > _previous(_operand(data, a))
+
+def falling(a):
+    return lambda data: _operand(data, a) < _previous(_operand(data, a))
+
+def all_of(*conditions):
+    return lambda data: np.logical_and.reduce([condition(data) for condition in conditions])
+
+# عدد التأكيدات في مقام الثقة (الخانات غير المستخدمة تعتبر تأكيدات غير محققة)
+TOTAL_CONFIRMATIONS = 60
+
+# قواعد التأكيد بالترتيب (البت i في القناع للقاعدة i)
+CONFIRMATION_RULES = [
+    # --- تأكيدات RSI ---
+    ("RSI_Overbought", above("RSI_14", 70)),
+    ("RSI_Oversold", below("RSI_14", 30)),
+    ("RSI_Crossed_Up_30", crossed_above("RSI_14", 30)),
+    ("RSI_Crossed_Down_70", crossed_below("RSI_14", 70)),
+    ("RSI_Above_50", above("RSI_14", 50)),
+    ("RSI_Below_50", below("RSI_14", 50)),
+
+    # --- تأكيدات MACD ---
+    ("MACD_Crossed_Up_Signal", crossed_above("MACD_12_26_9", "MACDs_12_26_9")),
+    ("MACD_Crossed_Down_Signal", crossed_below("MACD_12_26_9", "MACDs_12_26_9")),
+    ("MACD_Above_Zero", above("MACD_12_26_9", 0)),
+    ("MACD_Below_Zero", below("MACD_12_26_9", 0)),
+    ("MACD_Histogram_Positive", above("MACDh_12_26_9", 0)),
+    ("MACD_Histogram_Negative", below("MACDh_12_26_9", 0)),
+
+    # --- تأكيدات المتوسطات المتحركة (SMA) ---
+    ("Price_Above_SMA10", above("close", "SMA_10")),
+    ("Price_Below_SMA10", below("close", "SMA_10")),
+    ("Price_Above_SMA20", above("close", "SMA_20")),
+    ("Price_Below_SMA20", below("close", "SMA_20")),
+    ("Price_Above_SMA50", above("close", "SMA_50")),
+    ("Price_Below_SMA50", below("close", "SMA_50")),
+    ("SMA10_Above_SMA20", above("SMA_10", "SMA_20")),
+    ("SMA10_Below_SMA20", below("SMA_10", "SMA_20")),
+    ("SMA20_Above_SMA50", above("SMA_20", "SMA_50")),
+    ("SMA20_Below_SMA50", below("SMA_20", "SMA_50")),
+
+    # --- تأكيدات بولينجر باندز (BBands) ---
+    ("Price_Above_BB_Upper", above("close", "BBU_20_2.0")),
+    ("Price_Below_BB_Lower", below("close", "BBL_20_2.0")),
+    ("Price_Touched_BB_Upper", at_least("high", "BBU_20_2.0")),
+    ("Price_Touched_BB_Lower", at_most("low", "BBL_20_2.0")),
+    ("Price_Inside_BBands", all_of(at_most("close", "BBU_20_2.0"), at_least("close", "BBL_20_2.0"))),
+
+    # --- تأكيدات ستوكاستيك (Stochastic) ---
+    ("Stoch_Overbought", above("STOCHk_14_3_3", 80)),
+    ("Stoch_Oversold", below("STOCHk_14_3_3", 20)),
+    ("Stoch_K_Crossed_Up_D", crossed_above("STOCHk_14_3_3", "STOCHd_14_3_3")),
+    ("Stoch_K_Crossed_Down_D", crossed_below("STOCHk_14_3_3", "STOCHd_14_3_3")),
+    ("Stoch_K_Above_80", above("STOCHk_14_3_3", 80)),
+    ("Stoch_K_Below_20", below("STOCHk_14_3_3", 20)),
+    ("Stoch_D_Above_80", above("STOCHd_14_3_3", 80)),
+    ("Stoch_D_Below_20", below("STOCHd_14_3_3", 20)),
+
+    # تأكيدات الاتجاه العام باستخدام المتوسطات
+    ("Uptrend_SMA10_20_50", all_of(above("SMA_10", "SMA_20"), above("SMA_20", "SMA_50"))),
+    ("Downtrend_SMA10_20_50", all_of(below("SMA_10", "SMA_20"), below("SMA_20", "SMA_50"))),
+
+    # تأكيدات تقاطع السعر مع المتوسطات
+    ("Price_Crossed_Up_SMA10", crossed_above("close", "SMA_10")),
+    ("Price_Crossed_Down_SMA10", crossed_below("close", "SMA_10")),
+    ("Price_Crossed_Up_SMA20", crossed_above("close", "SMA_20")),
+    ("Price_Crossed_Down_SMA20", crossed_below("close", "SMA_20")),
+    ("Price_Crossed_Up_SMA50", crossed_above("close", "SMA_50")),
+    ("Price_Crossed_Down_SMA50", crossed_below("close", "SMA_50")),
+
+    # تأكيدات تقاطع المتوسطات
+    ("SMA10_Crossed_Up_SMA20", crossed_above("SMA_10", "SMA_20")),
+    ("SMA10_Crossed_Down_SMA20", crossed_below("SMA_10", "SMA_20")),
+    ("SMA20_Crossed_Up_SMA50", crossed_above("SMA_20", "SMA_50")),
+    ("SMA20_Crossed_Down_SMA50", crossed_below("SMA_20", "SMA_50")),
+
+    # تأكيدات حجم التداول (مثال بسيط)
+    ("Volume_Above_SMA20", above("volume", "Volume_SMA20")),
+    ("Volume_Below_SMA20", below("volume", "Volume_SMA20")),
+
+    # تأكيدات تقاطع السعر مع خط الوسط لبولينجر باندز
+    ("Price_Crossed_Up_BB_Middle", crossed_above("close", "BBM_20_2.0")),
+    ("Price_Crossed_Down_BB_Middle", crossed_below("close", "BBM_20_2.0")),
+    # تأكيدات وضع ستوكاستيك بالنسبة لمستويات 50
+    ("Stoch_K_Above_50", above("STOCHk_14_3_3", 50)),
+    ("Stoch_K_Below_50", below("STOCHk_14_3_3", 50)),
+    ("Stoch_D_Above_50", above("STOCHd_14_3_3", 50)),
+    ("Stoch_D_Below_50", below("STOCHd_14_3_3", 50)),
+    # تأكيدات تزايد/تناقص MACD Histogram
+    ("MACD_Histogram_Increasing", rising("MACDh_12_26_9")),
+    ("MACD_Histogram_Decreasing", falling("MACDh_12_26_9")),
+    # تأكيدات تزايد/تناقص RSI
+    ("RSI_Increasing", rising("RSI_14")),
+    ("RSI_Decreasing", falling("RSI_14")),
+
+    # ... يمكن إضافة المزيد (ADX, ATR, CCI, MFI...) عبر register_confirmation حتى 64 قاعدة
+]
+
+# القواعد المطلوبة لكل اتجاه بالإضافة إلى عتبة الثقة (تطابق بعمليات البت)
+SIGNAL_RULES = {
+    # إشارة شراء: تقاطع MACD صاعد + RSI فوق 50 + السعر فوق SMA20
+    "call": ("MACD_Crossed_Up_Signal", "RSI_Above_50", "Price_Above_SMA20"),
+    # إشارة بيع: تقاطع MACD هابط + RSI تحت 50 + السعر تحت SMA20
+    "put": ("MACD_Crossed_Down_Signal", "RSI_Below_50", "Price_Below_SMA20")
+}
+
+def register_confirmation(name, condition, rules=None):
+    """إضافة قاعدة تأكيد (الاسم، دالة على قاموس الأعمدة تعيد مصفوفة منطقية)"""
+    rules = CONFIRMATION_RULES if rules is None else rules
+    if any(existing == name for existing, _ in rules):
+        raise ValueError(f"قاعدة التأكيد '{name}' مسجلة مسبقاً")
+    if len(rules) >= MAX_PACKED_CONFIRMATIONS:
+        raise ValueError(f"لا يمكن تسجيل أكثر من {MAX_PACKED_CONFIRMATIONS} قاعدة تأكيد")
+    rules.append((name, condition))
+
+class SignalResult:
+    """
+    نتيجة generate_signals بشكل مضغوط
+
+    frame: DataFrame بالأعمدة timestamp, direction, confidence, confirmation_mask
+    (البت i في القناع يقابل confirmation_names[i]). صيغة قائمة القواميس القديمة
+    يتم بناؤها فقط عند الطلب (التكرار أو الفهرسة أو to_list)
+    """
+
+    COLUMNS = ["timestamp", "direction", "confidence", "confirmation_mask"]
+
+    def __init__(self, frame, confirmation_names):
+        self.frame = frame
+        self.confirmation_names = list(confirmation_names)
+
+    @classmethod
+    def empty(cls, confirmation_names=()):
+        frame = pd.DataFrame({
+            "timestamp": pd.Series(dtype="datetime64[ns]"),
+            "direction": pd.Series(dtype=object),
+            "confidence": pd.Series(dtype=float),
+            "confirmation_mask": pd.Series(dtype=np.uint64)
+        })
+        return cls(frame, confirmation_names)
+
+    def __len__(self):
+        return len(self.frame)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self._record(position)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [self._record(position) for position in range(len(self))[item]]
+        return self._record(range(len(self))[item])
+
+    def __repr__(self):
+        return f"SignalResult({len(self)} إشارة، {len(self.confirmation_names)} تأكيد)"
+
+    def confirmation_matrix(self):
+        """التأكيدات لكل إشارة كمصفوفة منطقية (إشارات × تأكيدات)"""
+        return unpack_confirmations(self.frame["confirmation_mask"].to_numpy(), len(self.confirmation_names))
+
+    def _record(self, position):
+        row = self.frame.iloc[position]
+        bits = unpack_confirmations(np.array([row["confirmation_mask"]]), len(self.confirmation_names))[0]
+        return {
+            "timestamp": row["timestamp"],
+            "direction": row["direction"],
+            "confidence": row["confidence"],
+            "confirmations": dict(zip(self.confirmation_names, bits.tolist()))
+        }
+
+    def to_list(self):
+        """الصيغة القديمة: قائمة قواميس {timestamp, direction, confidence, confirmations}"""
+        matrix = self.confirmation_matrix().tolist()
+        return [
+            {
+                "timestamp": timestamp,
+                "direction": direction,
+                "confidence": confidence,
+                "confirmations": dict(zip(self.confirmation_names, bits))
+            }
+            for timestamp, direction, confidence, bits in zip(
+                self.frame["timestamp"], self.frame["direction"], self.frame["confidence"], matrix
+            )
+        ]
+
 class TechnicalAnalysisEngine:
     """محرك التحليل الفني لحساب المؤشرات وتوليد الإشارات"""
 
-    def __init__(self, candles_df):
-        """تهيئة المحرك ببيانات الشموع"""
+    def __init__(self, candles_df, rules=None, signal_rules=None):
+        """
+        تهيئة المحرك ببيانات الشموع
+
+        rules: قواعد التأكيد (CONFIRMATION_RULES افتراضياً). signal_rules: القواعد
+        المطلوبة لكل اتجاه call/put (SIGNAL_RULES افتراضياً)، ويجب أن تكون جميعها
+        ضمن rules
+        """
         if not isinstance(candles_df, pd.DataFrame) or candles_df.empty:
             raise ValueError("يجب توفير DataFrame غير فارغ لبيانات الشموع")
         
@@ -37,38 +295,71 @@ class TechnicalAnalysisEngine:
 
         self.df = candles_df
         self.indicators = pd.DataFrame(index=self.df.index)
-        self.confirmations = {}
+        self.rules = list(CONFIRMATION_RULES if rules is None else rules)
+        if len(self.rules) > MAX_PACKED_CONFIRMATIONS:
+            raise ValueError(f"لا يمكن استخدام أكثر من {MAX_PACKED_CONFIRMATIONS} قاعدة تأكيد")
+
+        self.signal_rules = dict(SIGNAL_RULES if signal_rules is None else signal_rules)
+        missing_directions = {"call", "put"} - set(self.signal_rules)
+        if missing_directions:
+            raise ValueError(f"signal_rules يجب أن تحتوي على الاتجاهين call و put (المفقود: {', '.join(sorted(missing_directions))})")
+        rule_names = {name for name, _ in self.rules}
+        missing_rules = sorted({name for required in self.signal_rules.values() for name in required} - rule_names)
+        if missing_rules:
+            raise ValueError(f"قواعد الإشارات غير موجودة في قواعد التأكيد: {', '.join(missing_rules)}")
+        # قناع التأكيدات لكل شمعة (البت i للقاعدة i) وأسماء التأكيدات حتى TOTAL_CONFIRMATIONS
+        self.confirmation_mask = None
+        self.confirmation_names = []
+        self._confirmations = None
         self.signals = []
 
+    @property
+    def confirmations(self):
+        """التأكيدات كقاموس {الاسم: Series منطقية} (يتم فك القناع عند الطلب فقط)"""
+        if self.confirmation_mask is None:
+            return {}
+        if self._confirmations is None:
+            matrix = unpack_confirmations(self.confirmation_mask, len(self.confirmation_names))
+            self._confirmations = {
+                name: pd.Series(matrix[:, position], index=self.indicators.index)
+                for position, name in enumerate(self.confirmation_names)
+            }
+        return self._confirmations
+
     def calculate_indicators(self):
         """حساب المؤشرات الفنية المطلوبة"""
         try:
+            close = self.df["close"].to_numpy(dtype=float)
+            high = self.df["high"].to_numpy(dtype=float)
+            low = self.df["low"].to_numpy(dtype=float)
+
             # RSI
-            self.indicators["RSI_14"] = ta.rsi(self.df["close"], length=14)
+            self.indicators["RSI_14"] = kernels.rsi(close, 14)
 
-            # MACD
-            macd = ta.macd(self.df["close"], fast=12, slow=26, signal=9)
-            if macd is not None and not macd.empty:
-                self.indicators = pd.concat([self.indicators, macd], axis=1)
+            # MACD (نفس أسماء أعمدة pandas_ta)
+            macd_line, signal_line, histogram = kernels.macd(close, fast=12, slow=26, signal=9)
+            self.indicators["MACD_12_26_9"] = macd_line
+            self.indicators["MACDh_12_26_9"] = histogram
+            self.indicators["MACDs_12_26_9"] = signal_line
 
             # Moving Averages (SMA)
-            self.indicators["SMA_10"] = ta.sma(self.df["close"], length=10)
-            self.indicators["SMA_20"] = ta.sma(self.df["close"], length=20)
-            self.indicators["SMA_50"] = ta.sma(self.df["close"], length=50)
+            self.indicators["SMA_10"] = kernels.sma(close, 10)
+            self.indicators["SMA_20"] = kernels.sma(close, 20)
+            self.indicators["SMA_50"] = kernels.sma(close, 50)
 
             # Bollinger Bands
-            bbands = ta.bbands(self.df["close"], length=20, std=2)
-            if bbands is not None and not bbands.empty:
-                self.indicators = pd.concat([self.indicators, bbands], axis=1)
+            upper, middle, lower = kernels.bollinger_bands(close, 20, 2.0)
+            self.indicators["BBL_20_2.0"] = lower
+            self.indicators["BBM_20_2.0"] = middle
+            self.indicators["BBU_20_2.0"] = upper
 
             # Stochastic Oscillator
-            stoch = ta.stoch(self.df["high"], self.df["low"], self.df["close"], k=14, d=3, smooth_k=3)
-            if stoch is not None and not stoch.empty:
-                self.indicators = pd.concat([self.indicators, stoch], axis=1)
-                
-            # حذف الأعمدة غير المرغوب فيها التي قد تضيفها pandas_ta
-            columns_to_drop = [col for col in self.indicators.columns if col.startswith("BBP_") or col.startswith("BBB_")]
-            self.indicators.drop(columns=columns_to_drop, inplace=True, errors=\'ignore\')
+            stoch_k, stoch_d = kernels.stochastic(high, low, close, k_period=14, d_period=3, smooth_k=3)
+            self.indicators["STOCHk_14_3_3"] = stoch_k
+            self.indicators["STOCHd_14_3_3"] = stoch_d
+
+            # متوسط حجم التداول
+            self.indicators["Volume_SMA20"] = kernels.sma(self.df["volume"].to_numpy(dtype=float), 20)
 
             logger.info("تم حساب المؤشرات الفنية بنجاح")
             
@@ -76,189 +367,73 @@ class TechnicalAnalysisEngine:
             logger.error(f"حدث خطأ أثناء حساب المؤشرات: {str(e)}")
             # يمكنك إضافة معالجة خطأ أكثر تفصيلاً هنا
 
-    def _check_confirmation(self, name, condition):
-        """التحقق من شرط التأكيد وتخزينه"""
-        try:
-            # تأكد من أن condition هو Series من نوع bool
-            if isinstance(condition, pd.Series) and condition.dtype == bool:
-                self.confirmations[name] = condition
-            else:
-                 # إذا لم يكن كذلك، حاول تحويله (قد يكون ناتج مقارنة)
-                 if isinstance(condition, pd.Series):
-                     self.confirmations[name] = condition.fillna(False).astype(bool)
-                 else:
-                     # إذا كان قيمة واحدة، قم بإنشاء Series بنفس الفهرس
-                     self.confirmations[name] = pd.Series(condition, index=self.indicators.index, dtype=bool)
-        except Exception as e:
-            logger.warning(f"خطأ في التحقق من التأكيد 	'{name}	': {e}. سيتم تعيينه إلى False.")
-            self.confirmations[name] = pd.Series(False, index=self.indicators.index)
-
     def run_confirmation_system(self):
-        """تشغيل نظام التأكيدات المتعدد"""
+        """
+        تشغيل نظام التأكيدات المتعدد
+
+        كل قاعدة في self.rules تضيف بتاً واحداً إلى قناع uint64 لكل شمعة
+        """
         if self.indicators.empty:
             logger.warning("لا يمكن تشغيل نظام التأكيدات بدون حساب المؤشرات أولاً.")
             return
 
-        # دمج بيانات الشموع والمؤشرات لتسهيل الوصول إليها
-        combined_df = pd.concat([self.df, self.indicators], axis=1)
-        
-        # --- تأكيدات RSI ---
-        self._check_confirmation("RSI_Overbought", combined_df["RSI_14"] > 70)
-        self._check_confirmation("RSI_Oversold", combined_df["RSI_14"] < 30)
-        self._check_confirmation("RSI_Crossed_Up_30", (combined_df["RSI_14"].shift(1) < 30) & (combined_df["RSI_14"] >= 30))
-        self._check_confirmation("RSI_Crossed_Down_70", (combined_df["RSI_14"].shift(1) > 70) & (combined_df["RSI_14"] <= 70))
-        self._check_confirmation("RSI_Above_50", combined_df["RSI_14"] > 50)
-        self._check_confirmation("RSI_Below_50", combined_df["RSI_14"] < 50)
-
-        # --- تأكيدات MACD ---
-        self._check_confirmation("MACD_Crossed_Up_Signal", (combined_df["MACD_12_26_9"].shift(1) < combined_df["MACDs_12_26_9"].shift(1)) & (combined_df["MACD_12_26_9"] >= combined_df["MACDs_12_26_9"]))
-        self._check_confirmation("MACD_Crossed_Down_Signal", (combined_df["MACD_12_26_9"].shift(1) > combined_df["MACDs_12_26_9"].shift(1)) & (combined_df["MACD_12_26_9"] <= combined_df["MACDs_12_26_9"]))
-        self._check_confirmation("MACD_Above_Zero", combined_df["MACD_12_26_9"] > 0)
-        self._check_confirmation("MACD_Below_Zero", combined_df["MACD_12_26_9"] < 0)
-        self._check_confirmation("MACD_Histogram_Positive", combined_df["MACDh_12_26_9"] > 0)
-        self._check_confirmation("MACD_Histogram_Negative", combined_df["MACDh_12_26_9"] < 0)
-
-        # --- تأكيدات المتوسطات المتحركة (SMA) ---
-        self._check_confirmation("Price_Above_SMA10", combined_df["close"] > combined_df["SMA_10"])
-        self._check_confirmation("Price_Below_SMA10", combined_df["close"] < combined_df["SMA_10"])
-        self._check_confirmation("Price_Above_SMA20", combined_df["close"] > combined_df["SMA_20"])
-        self._check_confirmation("Price_Below_SMA20", combined_df["close"] < combined_df["SMA_20"])
-        self._check_confirmation("Price_Above_SMA50", combined_df["close"] > combined_df["SMA_50"])
-        self._check_confirmation("Price_Below_SMA50", combined_df["close"] < combined_df["SMA_50"])
-        self._check_confirmation("SMA10_Above_SMA20", combined_df["SMA_10"] > combined_df["SMA_20"])
-        self._check_confirmation("SMA10_Below_SMA20", combined_df["SMA_10"] < combined_df["SMA_20"])
-        self._check_confirmation("SMA20_Above_SMA50", combined_df["SMA_20"] > combined_df["SMA_50"])
-        self._check_confirmation("SMA20_Below_SMA50", combined_df["SMA_20"] < combined_df["SMA_50"])
-
-        # --- تأكيدات بولينجر باندز (BBands) ---
-        self._check_confirmation("Price_Above_BB_Upper", combined_df["close"] > combined_df["BBU_20_2.0"])
-        self._check_confirmation("Price_Below_BB_Lower", combined_df["close"] < combined_df["BBL_20_2.0"])
-        self._check_confirmation("Price_Touched_BB_Upper", combined_df["high"] >= combined_df["BBU_20_2.0"])
-        self._check_confirmation("Price_Touched_BB_Lower", combined_df["low"] <= combined_df["BBL_20_2.0"])
-        self._check_confirmation("Price_Inside_BBands", (combined_df["close"] <= combined_df["BBU_20_2.0"]) & (combined_df["close"] >= combined_df["BBL_20_2.0"]))
-
-        # --- تأكيدات ستوكاستيك (Stochastic) ---
-        self._check_confirmation("Stoch_Overbought", combined_df["STOCHk_14_3_3"] > 80)
-        self._check_confirmation("Stoch_Oversold", combined_df["STOCHk_14_3_3"] < 20)
-        self._check_confirmation("Stoch_K_Crossed_Up_D", (combined_df["STOCHk_14_3_3"].shift(1) < combined_df["STOCHd_14_3_3"].shift(1)) & (combined_df["STOCHk_14_3_3"] >= combined_df["STOCHd_14_3_3"]))
-        self._check_confirmation("Stoch_K_Crossed_Down_D", (combined_df["STOCHk_14_3_3"].shift(1) > combined_df["STOCHd_14_3_3"].shift(1)) & (combined_df["STOCHk_14_3_3"] <= combined_df["STOCHd_14_3_3"]))
-        self._check_confirmation("Stoch_K_Above_80", combined_df["STOCHk_14_3_3"] > 80)
-        self._check_confirmation("Stoch_K_Below_20", combined_df["STOCHk_14_3_3"] < 20)
-        self._check_confirmation("Stoch_D_Above_80", combined_df["STOCHd_14_3_3"] > 80)
-        self._check_confirmation("Stoch_D_Below_20", combined_df["STOCHd_14_3_3"] < 20)
-
-        # --- تأكيدات إضافية (مثال - يمكن إضافة المزيد حتى 60) ---
-        # تأكيدات الاتجاه العام باستخدام المتوسطات
-        self._check_confirmation("Uptrend_SMA10_20_50", (combined_df["SMA_10"] > combined_df["SMA_20"]) & (combined_df["SMA_20"] > combined_df["SMA_50"]))
-        self._check_confirmation("Downtrend_SMA10_20_50", (combined_df["SMA_10"] < combined_df["SMA_20"]) & (combined_df["SMA_20"] < combined_df["SMA_50"]))
-        
-        # تأكيدات تقاطع السعر مع المتوسطات
-        self._check_confirmation("Price_Crossed_Up_SMA10", (combined_df["close"].shift(1) < combined_df["SMA_10"].shift(1)) & (combined_df["close"] >= combined_df["SMA_10"]))
-        self._check_confirmation("Price_Crossed_Down_SMA10", (combined_df["close"].shift(1) > combined_df["SMA_10"].shift(1)) & (combined_df["close"] <= combined_df["SMA_10"]))
-        self._check_confirmation("Price_Crossed_Up_SMA20", (combined_df["close"].shift(1) < combined_df["SMA_20"].shift(1)) & (combined_df["close"] >= combined_df["SMA_20"]))
-        self._check_confirmation("Price_Crossed_Down_SMA20", (combined_df["close"].shift(1) > combined_df["SMA_20"].shift(1)) & (combined_df["close"] <= combined_df["SMA_20"]))
-        self._check_confirmation("Price_Crossed_Up_SMA50", (combined_df["close"].shift(1) < combined_df["SMA_50"].shift(1)) & (combined_df["close"] >= combined_df["SMA_50"]))
-        self._check_confirmation("Price_Crossed_Down_SMA50", (combined_df["close"].shift(1) > combined_df["SMA_50"].shift(1)) & (combined_df["close"] <= combined_df["SMA_50"]))
-
-        # تأكيدات تقاطع المتوسطات
-        self._check_confirmation("SMA10_Crossed_Up_SMA20", (combined_df["SMA_10"].shift(1) < combined_df["SMA_20"].shift(1)) & (combined_df["SMA_10"] >= combined_df["SMA_20"]))
-        self._check_confirmation("SMA10_Crossed_Down_SMA20", (combined_df["SMA_10"].shift(1) > combined_df["SMA_20"].shift(1)) & (combined_df["SMA_10"] <= combined_df["SMA_20"]))
-        self._check_confirmation("SMA20_Crossed_Up_SMA50", (combined_df["SMA_20"].shift(1) < combined_df["SMA_50"].shift(1)) & (combined_df["SMA_20"] >= combined_df["SMA_50"]))
-        self._check_confirmation("SMA20_Crossed_Down_SMA50", (combined_df["SMA_20"].shift(1) > combined_df["SMA_50"].shift(1)) & (combined_df["SMA_20"] <= combined_df["SMA_50"]))
-
-        # تأكيدات حجم التداول (مثال بسيط)
-        self.indicators["Volume_SMA20"] = ta.sma(self.df["volume"], length=20)
-        combined_df = pd.concat([self.df, self.indicators], axis=1) # إعادة الدمج بعد إضافة مؤشر جديد
-        self._check_confirmation("Volume_Above_SMA20", combined_df["volume"] > combined_df["Volume_SMA20"])
-        self._check_confirmation("Volume_Below_SMA20", combined_df["volume"] < combined_df["Volume_SMA20"])
-        
-        # تأكيدات إضافية للوصول إلى 60 تأكيد
-        # ... (يمكن إضافة المزيد من التأكيدات هنا بناءً على مؤشرات أخرى أو تركيبات مختلفة)
-        # مثال: تأكيدات ADX, ATR, CCI, MFI, إلخ.
-        # مثال: تأكيدات تقاطع السعر مع خط الوسط لبولينجر باندز
-        self._check_confirmation("Price_Crossed_Up_BB_Middle", (combined_df["close"].shift(1) < combined_df["BBM_20_2.0"].shift(1)) & (combined_df["close"] >= combined_df["BBM_20_2.0"]))
-        self._check_confirmation("Price_Crossed_Down_BB_Middle", (combined_df["close"].shift(1) > combined_df["BBM_20_2.0"].shift(1)) & (combined_df["close"] <= combined_df["BBM_20_2.0"]))
-        # مثال: تأكيدات وضع ستوكاستيك بالنسبة لمستويات 50
-        self._check_confirmation("Stoch_K_Above_50", combined_df["STOCHk_14_3_3"] > 50)
-        self._check_confirmation("Stoch_K_Below_50", combined_df["STOCHk_14_3_3"] < 50)
-        self._check_confirmation("Stoch_D_Above_50", combined_df["STOCHd_14_3_3"] > 50)
-        self._check_confirmation("Stoch_D_Below_50", combined_df["STOCHd_14_3_3"] < 50)
-        # مثال: تأكيدات تزايد/تناقص MACD Histogram
-        self._check_confirmation("MACD_Histogram_Increasing", combined_df["MACDh_12_26_9"] > combined_df["MACDh_12_26_9"].shift(1))
-        self._check_confirmation("MACD_Histogram_Decreasing", combined_df["MACDh_12_26_9"] < combined_df["MACDh_12_26_9"].shift(1))
-        # مثال: تأكيدات تزايد/تناقص RSI
-        self._check_confirmation("RSI_Increasing", combined_df["RSI_14"] > combined_df["RSI_14"].shift(1))
-        self._check_confirmation("RSI_Decreasing", combined_df["RSI_14"] < combined_df["RSI_14"].shift(1))
-        
-        # ... أكمل حتى 60 تأكيد ...
-        # تأكيد وهمي للوصول للعدد المطلوب مؤقتاً
-        num_existing_confirmations = len(self.confirmations)
-        for i in range(num_existing_confirmations, 60):
-             self._check_confirmation(f"Dummy_Confirmation_{i+1}", pd.Series(False, index=self.indicators.index))
+        # أعمدة الشموع والمؤشرات كمصفوفات لتقييم القواعد
+        data = {column: self.df[column].to_numpy(dtype=float) for column in ["open", "high", "low", "close", "volume"]}
+        data.update({column: self.indicators[column].to_numpy(dtype=float) for column in self.indicators.columns})
+
+        mask = np.zeros(len(self.indicators), dtype=np.uint64)
+        for bit, (name, condition) in enumerate(self.rules):
+            try:
+                satisfied = np.asarray(condition(data), dtype=bool)
+            except Exception as e:
+                logger.warning(f"خطأ في التحقق من التأكيد '{name}': {e}. سيتم تعيينه إلى False.")
+                continue
+            mask |= satisfied.astype(np.uint64) << np.uint64(bit)
 
-        logger.info(f"تم تشغيل نظام التأكيدات بنجاح لـ {len(self.confirmations)} تأكيد.")
+        # الخانات المتبقية حتى TOTAL_CONFIRMATIONS تأكيدات غير محققة دائماً
+        names = [name for name, _ in self.rules]
+        names += [f"Dummy_Confirmation_{i+1}" for i in range(len(names), TOTAL_CONFIRMATIONS)]
+
+        self.confirmation_mask = mask
+        self.confirmation_names = names
+        self._confirmations = None
+
+        logger.info(f"تم تشغيل نظام التأكيدات بنجاح لـ {len(names)} تأكيد.")
 
     def generate_signals(self, min_confidence_threshold=0.6):
-        """توليد إشارات الشراء/البيع بناءً على التأكيدات"""
-        if not self.confirmations:
+        """
+        توليد إشارات الشراء/البيع بناءً على التأكيدات
+
+        الثقة هي عدد البتات المفعلة في قناع الشمعة مقسوماً على عدد التأكيدات، وشروط
+        كل اتجاه (self.signal_rules) تطابق بعمليات البت. يتم إرجاع SignalResult (إشارات
+        الشراء ثم البيع بالترتيب الزمني)
+        """
+        if self.confirmation_mask is None:
             logger.warning("لا يمكن توليد الإشارات بدون تشغيل نظام التأكيدات أولاً.")
-            return []
+            self.signals = SignalResult.empty()
+            return self.signals
 
-        self.signals = []
-        total_confirmations = len(self.confirmations)
-        if total_confirmations == 0:
-             logger.warning("لا توجد تأكيدات متاحة لتوليد الإشارات.")
-             return []
+        masks = self.confirmation_mask
+        names = self.confirmation_names
 
-        # تحويل قاموس التأكيدات إلى DataFrame
-        confirmations_df = pd.DataFrame(self.confirmations)
-        
-        # حساب عدد التأكيدات الإيجابية لكل صف (كل شمعة)
-        confirmations_df["positive_confirmations"] = confirmations_df.sum(axis=1)
-        
         # حساب مستوى الثقة (نسبة التأكيدات الإيجابية)
-        confirmations_df["confidence"] = confirmations_df["positive_confirmations"] / total_confirmations
-
-        # تحديد الإشارات بناءً على عتبة الثقة
-        # هذا مثال بسيط، يمكن تعقيد منطق الإشارة أكثر
-        # إشارة شراء: ثقة عالية + بعض الشروط الإيجابية (مثل تقاطع MACD أو SMA)
-        buy_conditions = (
-            (confirmations_df["confidence"] >= min_confidence_threshold) &
-            (confirmations_df["MACD_Crossed_Up_Signal"]) &
-            (confirmations_df["RSI_Above_50"]) &
-            (confirmations_df["Price_Above_SMA20"])
-        )
-        
-        # إشارة بيع: ثقة عالية + بعض الشروط السلبية (مثل تقاطع MACD أو SMA)
-        sell_conditions = (
-            (confirmations_df["confidence"] >= min_confidence_threshold) &
-            (confirmations_df["MACD_Crossed_Down_Signal"]) &
-            (confirmations_df["RSI_Below_50"]) &
-            (confirmations_df["Price_Below_SMA20"])
-        )
-
-        # استخراج الإشارات
-        buy_signals = confirmations_df[buy_conditions]
-        sell_signals = confirmations_df[sell_conditions]
-
-        for timestamp, row in buy_signals.iterrows():
-            signal_confirmations = {name: bool(confirmations_df.loc[timestamp, name]) for name in self.confirmations}
-            self.signals.append({
-                "timestamp": timestamp,
-                "direction": "call",
-                "confidence": row["confidence"],
-                "confirmations": signal_confirmations
-            })
-
-        for timestamp, row in sell_signals.iterrows():
-            signal_confirmations = {name: bool(confirmations_df.loc[timestamp, name]) for name in self.confirmations}
-            self.signals.append({
-                "timestamp": timestamp,
-                "direction": "put",
-                "confidence": row["confidence"],
-                "confirmations": signal_confirmations
-            })
-
+        confidence = popcount(masks) / len(names)
+        is_confident = confidence >= min_confidence_threshold
+
+        rows = {}
+        for direction, required_rules in self.signal_rules.items():
+            required = rule_bits(required_rules, names)
+            rows[direction] = np.flatnonzero(is_confident & ((masks & required) == required))
+
+        selected = np.concatenate([rows["call"], rows["put"]])
+        frame = pd.DataFrame({
+            "timestamp": self.indicators.index[selected],
+            "direction": np.array(["call"] * len(rows["call"]) + ["put"] * len(rows["put"]), dtype=object),
+            "confidence": confidence[selected],
+            "confirmation_mask": masks[selected]
+        })
+
+        self.signals = SignalResult(frame, names)
         logger.info(f"تم توليد {len(self.signals)} إشارة.")
         return self.signals
 
@@ -269,24 +444,24 @@ class TechnicalAnalysisEngine:
         return self.generate_signals(min_confidence_threshold)
 
 # مثال للاستخدام (للاختبار)
-if __name__ == \'__main__\':
+if __name__ == '__main__':
     # إنشاء بيانات شموع وهمية
     data = {
-        \'timestamp\': pd.to_datetime([\'2023-01-01 09:00\', \'2023-01-01 09:01\', \'2023-01-01 09:02\', \'2023-01-01 09:03\', \'2023-01-01 09:04\'] * 20), # 100 نقطة بيانات
-        \'open\': np.random.rand(100) * 10 + 100,
-        \'high\': np.random.rand(100) * 2 + 101,
-        \'low\': np.random.rand(100) * 2 + 99,
-        \'close\': np.random.rand(100) * 10 + 100,
-        \'volume\': np.random.rand(100) * 1000
+        'timestamp': pd.to_datetime(['2023-01-01 09:00', '2023-01-01 09:01', '2023-01-01 09:02', '2023-01-01 09:03', '2023-01-01 09:04'] * 20), # 100 نقطة بيانات
+        'open': np.random.rand(100) * 10 + 100,
+        'high': np.random.rand(100) * 2 + 101,
+        'low': np.random.rand(100) * 2 + 99,
+        'close': np.random.rand(100) * 10 + 100,
+        'volume': np.random.rand(100) * 1000
     }
     dummy_df = pd.DataFrame(data)
     # إضافة بعض الاتجاهات البسيطة
-    dummy_df[\'close\'] = dummy_df[\'close\'].add(np.linspace(0, 5, 100))
-    dummy_df[\'high\'] = dummy_df[[\'high\", \'close\"]].max(axis=1)
-    dummy_df[\'low\'] = dummy_df[[\'low\", \'close\"]].min(axis=1)
-    dummy_df[\'open\'] = dummy_df[\'close\'].shift(1).fillna(dummy_df[\'close\'].iloc[0])
+    dummy_df['close'] = dummy_df['close'].add(np.linspace(0, 5, 100))
+    dummy_df['high'] = dummy_df[['high', 'close']].max(axis=1)
+    dummy_df['low'] = dummy_df[['low', 'close']].min(axis=1)
+    dummy_df['open'] = dummy_df['close'].shift(1).fillna(dummy_df['close'].iloc[0])
     
-    dummy_df[\'timestamp\'] = pd.date_range(start=\'2023-01-01\', periods=100, freq=\'min\')
+    dummy_df['timestamp'] = pd.date_range(start='2023-01-01', periods=100, freq='min')
 
     try:
         engine = TechnicalAnalysisEngine(dummy_df)
@@ -0,0 +1,173 @@
+"""
+مقارنة نواة المؤشرات (indicator_kernels) مع مكتبة ta و pandas على بيانات ثابتة
+
+المؤشرات ذات التعريف الموحد يجب أن تتطابق بدقة الفاصلة العائمة. أما الاختلافات
+المقصودة في طريقة البدء (seeding) فيتم اختبار تلاشيها بعد فترة الإحماء:
+
+- RSI و ADX/DI: النواة تبدأ تمهيد Wilder بمتوسط بسيط لأول period قيمة، بينما ta
+  تبدأ ewm من أول قيمة. الفرق يتلاشى بمعامل (1 - 1/period) لكل شمعة: على هذه
+  البيانات يصل إلى 0.18 (RSI) و 0.06 (ADX/DI) عند المقارنة من الشمعة 60، وأقل من
+  1e-5 من الشمعة 200
+- MACD: الإعداد الافتراضي sma_seed=True يختلف بنفس الطريقة، و sma_seed=False
+  يطابق خط ta تماماً
+- Parabolic SAR: ta تفحص اختراق السعر قبل تقييد SAR بأعلى/أدنى الشمعتين
+  السابقتين، فقد تعكس الاتجاه قبل النواة بشمعة ويختلف SAR (حتى ~4.6 وحدة سعرية
+  هنا) إلى أن يتزامن الانعكاس التالي، كما تختلف أول شمعتين
+
+التطابق مع talib غير مختبر هنا لأن talib غير متوفر في بيئة الاختبار
+
+التشغيل: python -m pytest --rootdir=tests tests (ملف __init__.py في جذر المشروع
+يستورد تطبيق Flask الكامل إذا جمعه pytest كحزمة)
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# إضافة مجلد المشروع في نهاية المسار حتى لا يحجب signal.py وحدة signal القياسية
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import indicator_kernels as kernels
+
+ta = pytest.importorskip("ta")
+
+EXACT = dict(rtol=1e-9, atol=1e-9, equal_nan=True)
+
+# بداية المقارنة للمؤشرات ذات البدء المختلف، والحد الأقصى للفرق بعدها
+CONVERGED_FROM = 200
+SEEDING_TOLERANCE = 1e-4
+
+
+@pytest.fixture(scope="module")
+def candles():
+    rng = np.random.default_rng(7)
+    n = 500
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    high = close + rng.uniform(0.1, 1.5, n)
+    low = close - rng.uniform(0.1, 1.5, n)
+    volume = rng.uniform(100, 1000, n)
+    return {
+        "high": pd.Series(high),
+        "low": pd.Series(low),
+        "close": pd.Series(close),
+        "volume": pd.Series(volume)
+    }
+
+
+def assert_converged(actual, expected, start=CONVERGED_FROM):
+    actual = np.asarray(actual, dtype=float)[start:]
+    expected = np.asarray(expected, dtype=float)[start:]
+    assert np.nanmax(np.abs(actual - expected)) < SEEDING_TOLERANCE
+
+
+def test_moving_averages_match_pandas(candles):
+    close = candles["close"]
+    np.testing.assert_allclose(kernels.sma(close, 20), close.rolling(20).mean(), **EXACT)
+    np.testing.assert_allclose(kernels.ema(close, 20, adjust=True), close.ewm(span=20).mean(), **EXACT)
+    np.testing.assert_allclose(kernels.ema(close, 20), close.ewm(span=20, adjust=False).mean(), **EXACT)
+    np.testing.assert_allclose(kernels.rolling_std(close, 20, ddof=1), close.rolling(20).std(), **EXACT)
+
+
+def test_wilder_smooth_matches_sma_seeded_ewm(candles):
+    close = candles["close"]
+    seeded = close.copy()
+    seeded.iloc[13] = close.iloc[:14].mean()
+    seeded.iloc[:13] = np.nan
+    expected = seeded.ewm(alpha=1 / 14, adjust=False).mean()
+    np.testing.assert_allclose(kernels.wilder_smooth(close, 14), expected, **EXACT)
+
+
+def test_rsi_converges_to_ta(candles):
+    expected = ta.momentum.RSIIndicator(candles["close"], 14).rsi()
+    actual = kernels.rsi(candles["close"])
+    assert np.isnan(actual[:13]).all()
+    assert_converged(actual, expected)
+
+
+def test_macd(candles):
+    expected = ta.trend.MACD(candles["close"], 26, 12, 9)
+
+    line, signal, histogram = kernels.macd(candles["close"], sma_seed=False)
+    np.testing.assert_allclose(line[25:], expected.macd()[25:], **EXACT)
+    np.testing.assert_allclose(histogram, line - signal, **EXACT)
+    assert_converged(signal, expected.macd_signal())
+
+    line, signal, _ = kernels.macd(candles["close"])
+    assert_converged(line, expected.macd())
+    assert_converged(signal, expected.macd_signal())
+
+
+def test_atr_matches_ta(candles):
+    expected = ta.volatility.AverageTrueRange(candles["high"], candles["low"], candles["close"], 14)
+    actual = kernels.atr(candles["high"], candles["low"], candles["close"])
+    np.testing.assert_allclose(actual[13:], expected.average_true_range()[13:], **EXACT)
+
+
+def test_stochastic_matches_ta(candles):
+    expected = ta.momentum.StochasticOscillator(candles["high"], candles["low"], candles["close"], 14, 3)
+    k, d = kernels.stochastic(candles["high"], candles["low"], candles["close"])
+    np.testing.assert_allclose(k, expected.stoch(), **EXACT)
+    np.testing.assert_allclose(d, expected.stoch_signal(), **EXACT)
+
+
+def test_williams_r_matches_ta(candles):
+    expected = ta.momentum.WilliamsRIndicator(candles["high"], candles["low"], candles["close"], 14)
+    actual = kernels.williams_r(candles["high"], candles["low"], candles["close"])
+    np.testing.assert_allclose(actual, expected.williams_r(), **EXACT)
+
+
+def test_cci_matches_ta(candles):
+    expected = ta.trend.CCIIndicator(candles["high"], candles["low"], candles["close"], 20)
+    actual = kernels.cci(candles["high"], candles["low"], candles["close"])
+    np.testing.assert_allclose(actual, expected.cci(), **EXACT)
+
+
+def test_adx_converges_to_ta(candles):
+    expected = ta.trend.ADXIndicator(candles["high"], candles["low"], candles["close"], 14)
+    adx, plus_di, minus_di = kernels.adx(candles["high"], candles["low"], candles["close"])
+    assert_converged(adx, expected.adx())
+    assert_converged(plus_di, expected.adx_pos())
+    assert_converged(minus_di, expected.adx_neg())
+
+
+def test_bollinger_bands_match_ta(candles):
+    expected = ta.volatility.BollingerBands(candles["close"], 20, 2)
+    upper, middle, lower = kernels.bollinger_bands(candles["close"])
+    np.testing.assert_allclose(upper, expected.bollinger_hband(), **EXACT)
+    np.testing.assert_allclose(middle, expected.bollinger_mavg(), **EXACT)
+    np.testing.assert_allclose(lower, expected.bollinger_lband(), **EXACT)
+
+
+def test_parabolic_sar_resynchronizes_with_ta(candles):
+    expected = ta.trend.PSARIndicator(candles["high"], candles["low"], candles["close"]).psar().to_numpy()
+    actual = kernels.parabolic_sar(candles["high"], candles["low"])
+
+    assert np.isnan(actual[0])
+    mismatched = ~np.isclose(actual[1:], expected[1:], rtol=1e-9, atol=1e-9)
+    assert mismatched.mean() < 0.05
+    np.testing.assert_allclose(actual[-CONVERGED_FROM:], expected[-CONVERGED_FROM:], **EXACT)
+
+
+def test_ichimoku_matches_ta(candles):
+    expected = ta.trend.IchimokuIndicator(candles["high"], candles["low"], 9, 26, 52)
+    actual = kernels.ichimoku(candles["high"], candles["low"])
+    np.testing.assert_allclose(actual["tenkan_sen"], expected.ichimoku_conversion_line(), **EXACT)
+    np.testing.assert_allclose(actual["kijun_sen"], expected.ichimoku_base_line(), **EXACT)
+    np.testing.assert_allclose(actual["senkou_span_a"], expected.ichimoku_a(), **EXACT)
+    # ta تحسب Senkou B على نوافذ ناقصة قبل الشمعة 52، والنواة تعيد NaN
+    np.testing.assert_allclose(actual["senkou_span_b"][51:], expected.ichimoku_b()[51:], **EXACT)
+
+
+def test_obv_matches_ta(candles):
+    expected = ta.volume.OnBalanceVolumeIndicator(candles["close"], candles["volume"])
+    actual = kernels.obv(candles["close"], candles["volume"])
+    np.testing.assert_allclose(actual, expected.on_balance_volume(), **EXACT)
+
+
+def test_mfi_matches_ta(candles):
+    expected = ta.volume.MFIIndicator(candles["high"], candles["low"], candles["close"], candles["volume"], 14)
+    actual = kernels.mfi(candles["high"], candles["low"], candles["close"], candles["volume"])
+    np.testing.assert_allclose(actual[14:], expected.money_flow_index()[14:], **EXACT)
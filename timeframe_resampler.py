@@ -0,0 +1,127 @@
+"""
+اشتقاق شموع الإطارات الزمنية الأعلى (5m / 15m / 1h) من شموع الدقيقة
+
+يتم التجميع بشكل متجهي (floor + groupby) ويتم تخزين الشموع المشتقة بحيث
+لا يُعاد تجميع إلا الشمعة الأخيرة غير المكتملة والشموع الجديدة
+"""
+
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# قاعدة التقريب في pandas لكل إطار زمني
+RESAMPLE_RULES = {
+    '5m': '5min',
+    '15m': '15min',
+    '1h': '1h'
+}
+
+OHLCV_AGGREGATION = {
+    'open': 'first',
+    'high': 'max',
+    'low': 'min',
+    'close': 'last',
+    'volume': 'sum'
+}
+
+
+def candles_to_frame(data: Dict) -> pd.DataFrame:
+    """تحويل صيغة get_recent_data إلى DataFrame مفهرس بالوقت"""
+    volume = data.get('volume')
+    if volume is None:
+        volume = np.zeros(len(data['close']))
+    
+    return pd.DataFrame({
+        'open': data.get('open', data['close']),
+        'high': data['high'],
+        'low': data['low'],
+        'close': data['close'],
+        'volume': volume
+    }, index=pd.DatetimeIndex(pd.to_datetime(data['timestamps'])))
+
+
+def frame_to_candles(frame: pd.DataFrame) -> Dict:
+    """تحويل DataFrame إلى صيغة get_recent_data"""
+    return {
+        'timestamps': [ts.to_pydatetime() for ts in frame.index],
+        'open': frame['open'].to_numpy(dtype=float),
+        'high': frame['high'].to_numpy(dtype=float),
+        'low': frame['low'].to_numpy(dtype=float),
+        'close': frame['close'].to_numpy(dtype=float),
+        'volume': frame['volume'].to_numpy(dtype=float)
+    }
+
+
+def resample_frame(frame: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+    """تجميع شموع الدقيقة في إطار زمني أعلى"""
+    buckets = frame.index.floor(RESAMPLE_RULES[timeframe])
+    return frame.groupby(buckets).agg(OHLCV_AGGREGATION)
+
+
+def resample_candles(data: Dict, timeframe: str) -> Dict:
+    """تجميع بيانات get_recent_data في إطار زمني أعلى"""
+    return frame_to_candles(resample_frame(candles_to_frame(data), timeframe))
+
+
+class ResampledBarCache:
+    """
+    ذاكرة مؤقتة تدريجية للشموع المشتقة لكل (زوج، إطار زمني)
+    
+    عند وصول بيانات جديدة يتم إعادة تجميع الشمعة الأخيرة (قد تكون غير
+    مكتملة) وما بعدها فقط، مع الاحتفاظ بالشموع الأقدم كما هي
+    """
+    
+    def __init__(self, max_bars: int = 500):
+        self.max_bars = max_bars
+        self._bars: Dict[tuple, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+    
+    def get_bars(self, pair: str, base_data: Dict, timeframe: str) -> Dict:
+        """شموع الإطار الزمني المطلوب محدثة حتى آخر شمعة دقيقة"""
+        frame = candles_to_frame(base_data)
+        key = (pair, timeframe)
+        
+        with self._lock:
+            cached = self._bars.get(key)
+            bars = self._update(cached, frame, timeframe)
+            self._bars[key] = bars
+        
+        return frame_to_candles(bars)
+    
+    def _rebuild(self, frame: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+        bars = resample_frame(frame, timeframe)
+        
+        # الشمعة الأولى ناقصة إذا بدأت البيانات في منتصفها
+        if len(bars) > 1 and frame.index[0] > bars.index[0]:
+            bars = bars.iloc[1:]
+        
+        return bars.iloc[-self.max_bars:]
+    
+    def _update(self, cached: Optional[pd.DataFrame], frame: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+        if frame.empty:
+            return cached if cached is not None else resample_frame(frame, timeframe)
+        
+        # إعادة البناء بالكامل إذا لم توجد ذاكرة أو إذا كانت البيانات الجديدة أقدم من المخزنة
+        if cached is None or cached.empty or frame.index[-1] < cached.index[-1]:
+            return self._rebuild(frame, timeframe)
+        
+        # الشمعة الأخيرة المخزنة قد تكون غير مكتملة: إعادة تجميعها مع ما بعدها
+        last_bucket = cached.index[-1]
+        if frame.index[0] > last_bucket:
+            # البيانات الجديدة لا تغطي بداية الشمعة الأخيرة، لذلك لا يمكن تحديثها
+            return self._rebuild(frame, timeframe)
+        
+        fresh = resample_frame(frame[frame.index >= last_bucket], timeframe)
+        bars = pd.concat([cached.iloc[:-1], fresh])
+        
+        return bars.iloc[-self.max_bars:]
+    
+    def clear(self, pair: Optional[str] = None):
+        with self._lock:
+            if pair is None:
+                self._bars.clear()
+            else:
+                for key in [key for key in self._bars if key[0] == pair]:
+                    del self._bars[key]
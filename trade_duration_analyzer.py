@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from dataclasses import dataclass
 from enum import Enum
 import json
+from support_resistance import find_swing_points, nearest_levels
 
 class TradeDirection(Enum):
     """اتجاهات التداول"""
@@ -177,25 +178,22 @@ class TradeDurationAnalyzer:
             current_price = self.price_history[-1]['price'] if self.price_history else 1.0
             return current_price * 0.999, current_price * 1.001
         
-        prices = [p['price'] for p in self.price_history[-50:]]
+        prices = np.fromiter((p['price'] for p in self.price_history[-50:]), dtype=float)
         
-        # البحث عن القمم والقيعان
-        highs = []
-        lows = []
-        
-        for i in range(2, len(prices) - 2):
-            # قمة محلية
-            if prices[i] > prices[i-1] and prices[i] > prices[i+1]:
-                highs.append(prices[i])
-            # قاع محلي
-            if prices[i] < prices[i-1] and prices[i] < prices[i+1]:
-                lows.append(prices[i])
+        # البحث عن القمم والقيعان (نقطة واحدة على كل جانب)
+        highs = prices[find_swing_points(prices, order=1, kind='peak', edge=2)]
+        lows = prices[find_swing_points(prices, order=1, kind='trough', edge=2)]
         
         # أقرب مستويات دعم ومقاومة
         current_price = prices[-1]
         
-        resistance = min([h for h in highs if h > current_price], default=current_price * 1.001)
-        support = max([l for l in lows if l < current_price], default=current_price * 0.999)
+        resistance = nearest_levels(highs, current_price)[1]
+        support = nearest_levels(lows, current_price)[0]
+        
+        if resistance is None:
+            resistance = current_price * 1.001
+        if support is None:
+            support = current_price * 0.999
         
         return support, resistance
     
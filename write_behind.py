@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import sqlite3
+from typing import List, Optional, Tuple
+
+
+class WriteBehindQueue:
+    """
+    طابور كتابة مؤجلة إلى SQLite
+    
+    يتم وضع الصفوف في طابور دون انتظار، ويقوم عامل خلفي بتجميعها في دفعات
+    وكتابتها باستخدام executemany داخل خيط منفصل حتى لا تتوقف حلقة الأحداث.
+    الدفعة الفاشلة يعاد إرسالها حتى max_retries مرة، وعند إلغاء العامل تتم كتابة
+    الصفوف التي لم تحفظ بعد مباشرة
+    """
+    
+    def __init__(self, db_path: str, batch_size: int = 200, flush_interval: float = 0.5,
+                 max_retries: int = 3, retry_delay: float = 0.5,
+                 logger: Optional[logging.Logger] = None):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.logger = logger or logging.getLogger(__name__)
+        
+        self._queue = None
+        self._batch_ready = None
+        self._worker = None
+        self._loop = None
+        self._flush_requests = 0
+    
+    def _ensure_worker(self):
+        """تشغيل العامل الخلفي داخل حلقة الأحداث الحالية"""
+        loop = asyncio.get_running_loop()
+        
+        if self._loop is not loop:
+            # حلقة أحداث جديدة (مثلاً استدعاء asyncio.run آخر): نقل الصفوف المتبقية
+            leftover = []
+            if self._queue is not None:
+                while not self._queue.empty():
+                    leftover.append(self._queue.get_nowait())
+            
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._batch_ready = asyncio.Event()
+            self._worker = None
+            
+            for item in leftover:
+                self._queue.put_nowait(item)
+        
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._run())
+    
+    def enqueue(self, sql: str, params: Tuple):
+        """إضافة صف للكتابة دون حجب حلقة الأحداث"""
+        self._ensure_worker()
+        self._queue.put_nowait((sql, params))
+        
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+    
+    async def _run(self):
+        """تجميع الصفوف في دفعات وكتابتها"""
+        # الصفوف المأخوذة من الطابور ولم تحفظ بعد، وعددها الأصلي (لـ task_done)
+        batch = []
+        taken = 0
+        try:
+            while True:
+                batch = [await self._queue.get()]
+                taken = 1
+                
+                # انتظار اكتمال الدفعة أو انتهاء مهلة التجميع (إلا عند طلب التفريغ)
+                if self._flush_requests == 0 and self._queue.qsize() < self.batch_size - 1:
+                    try:
+                        await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                self._batch_ready.clear()
+                
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                taken = len(batch)
+                
+                await self._write_with_retry(batch)
+                for _ in range(taken):
+                    self._queue.task_done()
+                batch = []
+                taken = 0
+        
+        except asyncio.CancelledError:
+            self._write_remaining(batch, taken)
+            raise
+    
+    async def _write_with_retry(self, batch: List[Tuple[str, Tuple]]):
+        """
+        كتابة دفعة مع إعادة المحاولة بتأخير متزايد
+        
+        عند الإلغاء يتم تفريغ batch إذا كانت الكتابة الجارية قد نجحت
+        """
+        for attempt in range(self.max_retries + 1):
+            # خيط الكتابة يكمل عمله حتى لو ألغي العامل أثناء الانتظار
+            write = asyncio.ensure_future(asyncio.to_thread(self._write_batch, batch))
+            try:
+                await asyncio.shield(write)
+                return
+            except asyncio.CancelledError:
+                await asyncio.wait([write])
+                if write.exception() is None:
+                    batch.clear()
+                raise
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self.logger.error(f"فشلت كتابة دفعة من {len(batch)} سجل بعد {attempt + 1} محاولات: {e}")
+                    return
+                self.logger.warning(f"خطأ في كتابة دفعة إلى قاعدة البيانات: {e}، إعادة المحاولة")
+                await asyncio.sleep(self.retry_delay * 2 ** attempt)
+    
+    def _write_remaining(self, batch: List[Tuple[str, Tuple]], taken: int):
+        """كتابة الصفوف المعلقة والمتبقية في الطابور مباشرة عند إلغاء العامل"""
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+            taken += 1
+        
+        if batch:
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self.logger.error(f"خطأ في كتابة {len(batch)} سجل عند إيقاف الكتابة المؤجلة: {e}")
+        
+        for _ in range(taken):
+            self._queue.task_done()
+    
+    def _write_batch(self, batch: List[Tuple[str, Tuple]]):
+        """كتابة دفعة واحدة (تعمل داخل خيط العامل)"""
+        # تجميع الصفوف حسب الاستعلام مع الحفاظ على الترتيب
+        statements = {}
+        for sql, params in batch:
+            statements.setdefault(sql, []).append(params)
+        
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            cursor = conn.cursor()
+            for sql, rows in statements.items():
+                cursor.executemany(sql, rows)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        self.logger.info(f"تم حفظ {len(batch)} سجل في قاعدة البيانات")
+    
+    async def flush(self):
+        """انتظار كتابة جميع الصفوف الموجودة في الطابور"""
+        if self._queue is None or self._loop is not asyncio.get_running_loop():
+            return
+        
+        self._flush_requests += 1
+        self._batch_ready.set()
+        try:
+            await self._queue.join()
+        finally:
+            self._flush_requests -= 1
+    
+    async def close(self):
+        """كتابة الصفوف المتبقية وإيقاف العامل"""
+        await self.flush()
+        
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None